@@ -1,14 +1,76 @@
 import numpy as np
-import pandas as pd
+from typing import Any, Dict, List, Optional, Union
 from domain.entities.activity import Activity
+from domain.entities.activity_frame import ActivityFrame, SECONDS_PER_DAY
 from sklearn.ensemble import IsolationForest
+from .hr_zones import HRZoneEngine, default_hr_zone_engine
+from .training_load import TrainingLoadEngine
+from .percentile_store import PercentileStore, RANKED_METRICS, activity_metrics, conditions, percentile_rank
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Colunas do modelo de anomalia
+FEATURES = ("pace", "heart_rate", "duration", "distance", "elevation_gain")
+MIN_BASELINE_ACTIVITIES = 5
+
+
+class Baseline:
+    """Sorted historical values of one activity type, plus the expected heart rate for a given speed"""
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        self.count = len(columns["pace"])
+        self.sorted = {
+            name: np.sort(values[~np.isnan(values)])
+            for name, values in columns.items()
+            if name in RANKED_METRICS
+        }
+        # FC esperada para a velocidade (reta ajustada uma vez); o resíduo indica fadiga
+        valid = ~np.isnan(columns["speed"]) & ~np.isnan(columns["heart_rate"])
+        self.hr_fit = np.polyfit(columns["speed"][valid], columns["heart_rate"][valid], 1) if valid.sum() >= 2 else None
+        self.sorted["hr_residual"] = np.sort(self.hr_residual(columns)[valid]) if self.hr_fit is not None else np.zeros(0)
+
+    def hr_residual(self, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        if self.hr_fit is None:
+            return np.full(len(columns["heart_rate"]), np.nan)
+        return columns["heart_rate"] - np.polyval(self.hr_fit, columns["speed"])
+
+    def median(self, name: str) -> float:
+        values = self.sorted[name]
+        return float(np.median(values)) if len(values) else np.nan
+
 
 class ActivityAnalyzer:
-    def __init__(self):
-        self.performance_model = IsolationForest(contamination=0.1)
-        self.pace_model = IsolationForest(contamination=0.1)
-        self.heart_rate_model = IsolationForest(contamination=0.1)
-        
+    """Scores activities against the athlete's history.
+
+    add_historical_data() fits the baselines once: sorted pace, heart-rate,
+    effort and efficiency values per activity type, an expected-heart-rate
+    line per type and an IsolationForest over all activities. analyze_many()
+    then scores any number of activities with array operations only
+    (np.searchsorted for percentiles, one decision_function call), so a
+    full season is a single call.
+
+    With a PercentileStore that holds the athlete, pace, heart-rate, effort
+    and efficiency percentiles come from its ingest-maintained sketches
+    instead (over the last `window_months` when given), and activities with
+    a known temperature are also ranked among runs in the same conditions.
+    """
+
+    def __init__(self, hr_zone_engine: Optional[HRZoneEngine] = None,
+                 training_load_engine: Optional[TrainingLoadEngine] = None,
+                 percentile_store: Optional[PercentileStore] = None,
+                 athlete_id: Optional[str] = None,
+                 window_months: Optional[int] = None):
+        self.hr_zone_engine = hr_zone_engine
+        self.training_load_engine = training_load_engine or TrainingLoadEngine()
+        self.percentile_store = percentile_store
+        self.athlete_id = athlete_id
+        self.window_months = window_months
+        self.performance_model = IsolationForest(contamination=0.1, random_state=42)
+        self.baselines: Dict[str, Baseline] = {}
+        self.feature_medians: Optional[np.ndarray] = None
+        self.hr_max: Optional[float] = None
+
         self.historical_stats = {
             'usual_pace_range': None,
             'usual_heart_rate_range': None,
@@ -16,50 +78,134 @@ class ActivityAnalyzer:
             'weekly_distance': None
         }
 
-    def add_historical_data(self, activities: list[Activity]):
-        """Add historical data to the analyzer"""
-        data = [self._activity_to_dict(activity) for activity in activities]
-        self.historical_data = pd.DataFrame(data)
-
-    def analyze_activity(self, activity: Activity) -> dict:
-        """Análise expandida da atividade"""
-        analysis = {
-            "performance_score": self._calculate_performance_score(activity),
-            "heart_rate_analysis": self._analyze_heart_rate(activity),
-            "training_load": self._calculate_training_load(activity),
-            "fatigue_score": self._calculate_fatigue_score(activity),
-            "comparison_to_usual": self._compare_to_historical(activity),
-            "recommendations": self._generate_smart_recommendations(activity),
-            "progress_indicators": self._analyze_progress(activity)
-        }
-        return analysis
+    @property
+    def is_fitted(self) -> bool:
+        return self.feature_medians is not None
 
-    def _activity_to_dict(self, activity: Activity) -> dict:
-        """Convert an activity to a dictionary"""
-        return {
-            "duration": activity.duration,
-            "distance": activity.distance,
-            "heart_rate_avg": activity.heart_rate_avg,
-            "pace": activity.pace,
-            "elevation_gain": activity.elevation_gain,
+    def add_historical_data(self, activities: Union[List[Activity], ActivityFrame]):
+        """Fit baselines and the anomaly model on the athlete's history"""
+        if len(activities) == 0:
+            raise ValueError("No historical activities to build baselines from")
+
+        frame = ActivityFrame.coerce(activities, sort=False)
+        self.hr_max = self.training_load_engine.hr_max or frame.max("heart_rate_max") or None
+        columns = activity_metrics(frame, self.training_load_engine, self.hr_max)
+        types = frame.activity_type
+
+        self.baselines = {"all": Baseline(columns)}
+        for activity_type in np.unique(types):
+            mask = types == activity_type
+            if mask.sum() >= MIN_BASELINE_ACTIVITIES:
+                self.baselines[activity_type] = Baseline({name: values[mask] for name, values in columns.items()})
+
+        features = np.column_stack([columns[name] for name in FEATURES])
+        self.feature_medians = np.nan_to_num(np.nanmedian(features, axis=0))
+        self.performance_model.fit(self._impute(features))
+        self._update_historical_stats(frame, columns)
+
+    def analyze_activity(self, activity: Activity, streams: Optional[Dict[str, np.ndarray]] = None) -> dict:
+        """Análise expandida da atividade; streams são as amostras de get_activity_streams"""
+        frame = ActivityFrame.from_records([activity])
+        return self.analyze_many(frame, {frame.ids[0]: streams} if streams is not None else None)[0]
+
+    def analyze_many(self, activities: Union[List[Activity], ActivityFrame],
+                     streams: Optional[Dict[Any, Dict[str, np.ndarray]]] = None) -> List[dict]:
+        """Score many activities at once, results in the order given (frame order for a frame).
+
+        Without history the activities themselves are the baseline; streams
+        are keyed by activity id.
+        """
+        if len(activities) == 0:
+            return []
+        frame = ActivityFrame.coerce(activities, sort=False)
+        if not self.is_fitted:
+            self.add_historical_data(frame)
+
+        columns = activity_metrics(frame, self.training_load_engine, self.hr_max)
+        features = np.column_stack([columns[name] for name in FEATURES])
+        anomaly = self.performance_model.decision_function(self._impute(features))
+
+        types = frame.activity_type
+        percentiles = {name: np.full(len(frame), np.nan) for name in RANKED_METRICS + ("hr_residual", "pace_same_conditions")}
+        medians = {name: np.full(len(frame), np.nan) for name in ("pace", "heart_rate", "meters_per_beat")}
+        store = self.percentile_store if self.percentile_store is not None and self.percentile_store.has_athlete(self.athlete_id) else None
+        for activity_type in np.unique(types):
+            mask = types == activity_type
+            baseline = self.baselines.get(activity_type, self.baselines["all"])
+            subset = {name: values[mask] for name, values in columns.items()}
+            percentiles["hr_residual"][mask] = percentile_rank(baseline.sorted["hr_residual"], baseline.hr_residual(subset))
+            for name in RANKED_METRICS:
+                percentiles[name][mask] = (
+                    store.rank(self.athlete_id, activity_type, name, subset[name], months=self.window_months)
+                    if store else percentile_rank(baseline.sorted[name], subset[name])
+                )
+            for name in medians:
+                medians[name][mask] = (
+                    store.median(self.athlete_id, activity_type, name, months=self.window_months)
+                    if store else baseline.median(name)
+                )
+
+        if store:
+            condition_of = conditions(frame["temperature"])
+            for activity_type, condition in {(t, c) for t, c in zip(types, condition_of) if c}:
+                mask = (types == activity_type) & (condition_of == condition)
+                percentiles["pace_same_conditions"][mask] = store.rank(
+                    self.athlete_id, activity_type, "pace", columns["pace"][mask], condition, self.window_months
+                )
+
+        zones = self._zones(streams)
+        return [
+            {
+                "performance_score": self._score(percentiles["meters_per_beat"][i]),
+                "anomaly_score": round(float(anomaly[i]), 4),
+                "heart_rate_analysis": self._analyze_heart_rate(frame.records[i], zones.get(frame.ids[i])),
+                "training_load": self._score(columns["effort"][i]),
+                "fatigue_score": self._score(percentiles["hr_residual"][i]),
+                "comparison_to_usual": self._compare_to_historical(columns, percentiles, medians, i),
+                "recommendations": self._generate_smart_recommendations(columns, percentiles, anomaly, i),
+                "progress_indicators": self._analyze_progress(columns, medians, i)
+            }
+            for i in range(len(frame))
+        ]
+
+    def _impute(self, features: np.ndarray) -> np.ndarray:
+        return np.where(np.isnan(features), self.feature_medians, features)
+
+    def _zones(self, streams: Optional[Dict[Any, Dict[str, np.ndarray]]]) -> Dict[Any, np.ndarray]:
+        """Time in zones of the activities with a heart-rate stream, binned in one pass"""
+        with_hr = {
+            activity_id: (stream["heart_rate"], stream.get("timestamp"))
+            for activity_id, stream in (streams or {}).items()
+            if stream is not None and stream.get("heart_rate") is not None and len(stream["heart_rate"])
         }
+        if not with_hr:
+            return {}
+        engine = self.hr_zone_engine or default_hr_zone_engine(self.hr_max)
+        return engine.activities_zones(with_hr)
 
-    def _calculate_performance_score(self, activity: Activity) -> float:
-        """Calculate the performance score of an activity"""
-        if self.historical_data.empty:
-            return 0.0
+    def _update_historical_stats(self, frame: ActivityFrame, columns: Dict[str, np.ndarray]):
+        pace = columns["pace"][~np.isnan(columns["pace"])]
+        heart_rate = columns["heart_rate"][~np.isnan(columns["heart_rate"])]
+        hours = frame.start_seconds % SECONDS_PER_DAY // 3600
+        days = frame.day
+        weeks = max((days.max() - days.min() + 1) / 7, 1)
 
-        features = self._extract_features(activity)
-        x = self.historical_data[features.keys()]
-        y = self.historical_data["performance_score"] if "performance_score" in self.historical_data.columns else np.zeros(len(x))
+        self.historical_stats = {
+            'usual_pace_range': [round(float(p), 1) for p in np.percentile(pace, [25, 75])] if len(pace) else None,
+            'usual_heart_rate_range': [round(float(h), 1) for h in np.percentile(heart_rate, [25, 75])] if len(heart_rate) else None,
+            'preferred_training_times': int(np.bincount(hours, minlength=24).argmax()),
+            'weekly_distance': round(float(np.nansum(columns["distance"]) / 1000 / weeks), 1)
+        }
 
-        self.model.fit(x, y)
-        score = self.model.decision_function(list(features.values()))[0]
-        return score
+    @staticmethod
+    def _score(value: float) -> Optional[float]:
+        return None if np.isnan(value) else round(float(value), 1)
 
-    def _analyze_heart_rate(self, activity: Activity) -> dict:
+    def _analyze_heart_rate(self, activity: Activity, zones: Optional[np.ndarray]) -> dict:
         """Analyze the heart rate of an activity"""
-        zones_time = activity.heart_rate_zones or []
+        zones_time = getattr(activity, "heart_rate_zones", None) or []
+        if zones is not None:
+            zones_time = [round(float(seconds), 1) for seconds in zones]
 
         return {
             "time_in_zones": zones_time,
@@ -70,30 +216,53 @@ class ActivityAnalyzer:
         """Ideal time in zones."""
         if not zones_time:
             return 0.0
-        return max(zones_time)  
-    def _generate_recommendations(self, activity: Activity) -> list[str]:
-        """Generate recommendations based on the activity analysis."""
-        recommendations = []
-        if activity.heart_rate_avg and activity.heart_rate_avg > 160:
-            recommendations.append("Consider reducing intensity to improve recovery.")
-        if activity.pace and activity.pace < 5:
-            recommendations.append("Great pace! Keep focused on consistency.")
-        return recommendations
+        return max(zones_time)
 
-    def _calculate_training_load(self, activity: Activity) -> float:
-        """Calculate training load based on duration and intensity"""
-        pass
+    def _compare_to_historical(self, columns: Dict[str, np.ndarray], percentiles: Dict[str, np.ndarray],
+                               medians: Dict[str, np.ndarray], i: int) -> dict:
+        """Compare to athlete's historical patterns"""
+        comparison = {
+            "pace_percentile": self._score(100 - percentiles["pace"][i]),
+            "heart_rate_percentile": self._score(percentiles["heart_rate"][i]),
+            "effort_percentile": self._score(percentiles["effort"][i])
+        }
+        if not np.isnan(percentiles["pace_same_conditions"][i]):
+            comparison["pace_percentile_same_conditions"] = self._score(100 - percentiles["pace_same_conditions"][i])
 
-    def _calculate_fatigue_score(self, activity: Activity) -> float:
-        """Analyze fatigue signals based on HR and pace"""
-        pass
+        pace, usual_pace = columns["pace"][i], medians["pace"][i]
+        if not np.isnan(pace) and not np.isnan(usual_pace) and usual_pace > 0:
+            change = (usual_pace - pace) / usual_pace * 100
+            comparison["pace_comparison"] = f"This pace is {abs(change):.0f}% {'faster' if change >= 0 else 'slower'} than your usual"
 
-    def _compare_to_historical(self, activity: Activity) -> dict:
-        """Compare to athlete's historical patterns"""
+        heart_rate, usual_hr = columns["heart_rate"][i], medians["heart_rate"][i]
+        if not np.isnan(heart_rate) and not np.isnan(usual_hr):
+            difference = heart_rate - usual_hr
+            comparison["heart_rate_comparison"] = f"Average heart rate {abs(difference):.0f} bpm {'above' if difference >= 0 else 'below'} your usual"
+
+        if comparison["effort_percentile"] is not None:
+            comparison["effort_level"] = f"This workout was more intense than {comparison['effort_percentile']:.0f}% of your workouts"
+        return comparison
+
+    def _generate_smart_recommendations(self, columns: Dict[str, np.ndarray], percentiles: Dict[str, np.ndarray],
+                                        anomaly: np.ndarray, i: int) -> list[str]:
+        """Generate recommendations based on where the activity falls in the athlete's history"""
+        recommendations = []
+        if percentiles["hr_residual"][i] >= 85:
+            recommendations.append("Heart rate was high for this pace; consider an easy day to recover.")
+        if percentiles["effort"][i] >= 90:
+            recommendations.append("One of your hardest sessions; plan recovery before the next intense workout.")
+        if percentiles["pace"][i] <= 10:
+            recommendations.append("Great pace! One of your fastest sessions, keep focused on consistency.")
+        if anomaly[i] < 0:
+            recommendations.append("This workout is unusual compared to your history; check the data if it was not planned.")
+        return recommendations
+
+    def _analyze_progress(self, columns: Dict[str, np.ndarray], medians: Dict[str, np.ndarray], i: int) -> dict:
+        """Aerobic efficiency (meters per heartbeat) against the athlete's usual"""
+        efficiency, usual = columns["meters_per_beat"][i], medians["meters_per_beat"][i]
+        if np.isnan(efficiency) or np.isnan(usual) or usual <= 0:
+            return {"meters_per_beat": self._score(efficiency), "efficiency_vs_usual_pct": None}
         return {
-            "pace_comparison": "This pace is 5% faster than your usual",
-            "heart_rate_zones": "You spent more time in Z3 than usual",
-            "effort_level": "This was a more intense workout than your average"
+            "meters_per_beat": round(float(efficiency), 2),
+            "efficiency_vs_usual_pct": round(float((efficiency - usual) / usual * 100), 1)
         }
-
-    
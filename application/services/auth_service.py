@@ -1,10 +1,16 @@
+from functools import lru_cache
 from typing import Optional
 import logging
 from datetime import datetime, timedelta
-from infrastructure.garmin.garmin_connector import GarminConnector
+from infrastructure.garmin.garmin_connector import GarminConnector, get_garmin_connector
 
 logger = logging.getLogger(__name__)
 
+@lru_cache()
+def get_auth_service() -> "AuthenticationService":
+    """Garmin session state shared by the process (login timers and retry cooldown)"""
+    return AuthenticationService()
+
 class AuthenticationService:
     def __init__(self):
         self._connector: Optional[GarminConnector] = None
@@ -16,7 +22,7 @@ class AuthenticationService:
     @property
     def connector(self) -> GarminConnector:
         if not self._connector:
-            self._connector = GarminConnector()
+            self._connector = get_garmin_connector()
         return self._connector
 
     def needs_refresh(self) -> bool:
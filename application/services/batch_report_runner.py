@@ -0,0 +1,213 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from infrastructure.database import SessionLocal, engine
+from infrastructure.ml.model_registry import DEFAULT_ATHLETE_ID
+from infrastructure.repositories.activity_repository import ActivityRepository
+from .hybrid_analyzer import HybridAnalyzer
+from .llm_analyzer import LLMAnalyzer
+from .ml_analyzer import MLAnalyzer
+
+logger = logging.getLogger(__name__)
+
+RUN_FILE = "_run.json"
+# run_id vira nome de diretório: só letras, dígitos, "_" e "-"
+RUN_ID_PATTERN = re.compile(r"^[\w-]+$")
+
+
+def validate_run_id(run_id: str) -> str:
+    """Raises ValueError for run ids that are not a plain directory name (e.g. "../x")"""
+    if not RUN_ID_PATTERN.match(run_id):
+        raise ValueError(f"Invalid run_id: {run_id!r}")
+    return run_id
+
+
+def _init_ml_worker():
+    # Conexões herdadas do processo pai não podem ser reutilizadas após o fork
+    engine.dispose(close=False)
+
+
+def _run_ml_stage(athlete_id: Optional[str]) -> Dict[str, Any]:
+    """ML stage of one athlete, executed in a worker process"""
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        repository = ActivityRepository(db)
+        activities = repository.get_by_athlete(athlete_id)
+        if not activities:
+            return {"ml_analysis": None, "seconds": time.perf_counter() - start}
+        ml_analysis = MLAnalyzer(repository, athlete_id=athlete_id).analyze_patterns(activities)
+        return {"ml_analysis": ml_analysis, "seconds": time.perf_counter() - start}
+    finally:
+        db.close()
+
+
+class BatchReportRunner:
+    """Generates hybrid coaching reports for many athletes.
+
+    A fixed set of `athlete_concurrency` workers takes athletes from the
+    pending list, so only that many histories are in memory and that many
+    ML jobs queued at a time. Within a worker the CPU-bound ML stage runs
+    in a process pool and the LLM stage is further capped at
+    `llm_concurrency`; every finished athlete is checkpointed to
+    <output_dir>/<run_id>/<athlete_id>.json so an interrupted run can be
+    resumed with the same run_id.
+    """
+
+    def __init__(self, output_dir: str = "reports", llm_concurrency: int = 4,
+                 ml_workers: Optional[int] = None,
+                 llm_analyzer_factory: Callable[[], LLMAnalyzer] = LLMAnalyzer,
+                 athlete_concurrency: Optional[int] = None):
+        self.output_dir = output_dir
+        self.llm_concurrency = llm_concurrency
+        self.ml_workers = ml_workers
+        # Padrão: o bastante para manter o pool de ML ocupado enquanto outros atletas esperam o LLM
+        self.athlete_concurrency = athlete_concurrency or (ml_workers or os.cpu_count() or 1) + llm_concurrency
+        self.llm_analyzer_factory = llm_analyzer_factory
+        self.progress: Dict[str, Any] = {"status": "pending"}
+
+    def run_path(self, run_id: str) -> str:
+        return os.path.join(self.output_dir, run_id)
+
+    def checkpoint_path(self, run_id: str, athlete_id: Optional[str]) -> str:
+        return os.path.join(self.run_path(run_id), f"{athlete_id or DEFAULT_ATHLETE_ID}.json")
+
+    async def run(self, athlete_ids: Optional[List[Optional[str]]] = None, run_id: Optional[str] = None,
+                  resume: bool = True) -> Dict[str, Any]:
+        run_id = validate_run_id(run_id or datetime.now().strftime("%Y%m%d_%H%M%S"))
+        os.makedirs(self.run_path(run_id), exist_ok=True)
+
+        if athlete_ids is None:
+            athlete_ids = await asyncio.to_thread(self._load_athlete_ids)
+
+        pending = [
+            athlete_id for athlete_id in athlete_ids
+            if not (resume and os.path.exists(self.checkpoint_path(run_id, athlete_id)))
+        ]
+        self.progress = {
+            "run_id": run_id,
+            "status": "running",
+            "total": len(athlete_ids),
+            "skipped": len(athlete_ids) - len(pending),
+            "completed": 0,
+            "failed": {},
+            "started_at": datetime.now().isoformat()
+        }
+        logger.info(f"Batch run {run_id}: {len(pending)} athletes to process, {self.progress['skipped']} already done")
+
+        start = time.perf_counter()
+        timings: List[Dict[str, float]] = []
+        semaphore = asyncio.Semaphore(self.llm_concurrency)
+        loop = asyncio.get_running_loop()
+
+        pool = ProcessPoolExecutor(max_workers=self.ml_workers, initializer=_init_ml_worker)
+
+        async def process(athlete_id: Optional[str]):
+            try:
+                timing = await self._process_athlete(athlete_id, run_id, pool, loop, semaphore)
+                if timing:
+                    timings.append(timing)
+                self.progress["completed"] += 1
+            except Exception as e:
+                logger.error(f"Batch report failed for athlete {athlete_id}: {str(e)}")
+                self.progress["failed"][athlete_id or DEFAULT_ATHLETE_ID] = str(e)
+
+        queue = iter(pending)
+
+        async def worker():
+            # Os workers compartilham o iterador: cada atleta é processado uma única vez
+            for athlete_id in queue:
+                await process(athlete_id)
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(min(self.athlete_concurrency, len(pending)))))
+        finally:
+            # shutdown(wait=True) espera os workers; fora do event loop para não bloqueá-lo
+            await asyncio.to_thread(pool.shutdown, wait=True)
+
+        elapsed = time.perf_counter() - start
+        self.progress.update({
+            "status": "finished",
+            "finished_at": datetime.now().isoformat(),
+            "elapsed_s": round(elapsed, 3),
+            "throughput_athletes_per_s": round(len(timings) / elapsed, 3) if elapsed > 0 else None,
+            "stage_timings_s": self._summarize_timings(timings)
+        })
+        self._write_json(os.path.join(self.run_path(run_id), RUN_FILE), self.progress)
+        return self.progress
+
+    async def _process_athlete(self, athlete_id: Optional[str], run_id: str, pool: ProcessPoolExecutor,
+                               loop: asyncio.AbstractEventLoop, semaphore: asyncio.Semaphore) -> Optional[Dict[str, float]]:
+        timing = {}
+
+        # O estágio de ML roda em paralelo com a leitura das atividades para o LLM
+        stage_start = time.perf_counter()
+        ml_future = loop.run_in_executor(pool, _run_ml_stage, athlete_id)
+        activities = await asyncio.to_thread(self._load_activities, athlete_id)
+        timing["load"] = time.perf_counter() - stage_start
+        ml_result = await ml_future
+        timing["ml"] = ml_result["seconds"]
+
+        if not activities or ml_result["ml_analysis"] is None:
+            logger.warning(f"No activities for athlete {athlete_id}, skipping report")
+            return None
+
+        async with semaphore:
+            stage_start = time.perf_counter()
+            hybrid = HybridAnalyzer(ml_analyzer=None, llm_analyzer=self.llm_analyzer_factory())
+            report = await hybrid.analyze_activities(activities, ml_analysis=ml_result["ml_analysis"])
+            timing["llm"] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        self._write_json(self.checkpoint_path(run_id, athlete_id), {
+            "athlete_id": athlete_id or DEFAULT_ATHLETE_ID,
+            "run_id": run_id,
+            "report": report
+        })
+        timing["checkpoint"] = time.perf_counter() - stage_start
+        return timing
+
+    def _load_athlete_ids(self) -> List[Optional[str]]:
+        db = SessionLocal()
+        try:
+            return ActivityRepository(db).get_athlete_ids()
+        finally:
+            db.close()
+
+    def _load_activities(self, athlete_id: Optional[str]):
+        db = SessionLocal()
+        try:
+            activities = ActivityRepository(db).get_by_athlete(athlete_id)
+            # Desanexa os objetos da sessão para usá-los depois do close
+            db.expunge_all()
+            return activities
+        finally:
+            db.close()
+
+    @staticmethod
+    def _summarize_timings(timings: List[Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+        summary = {}
+        for stage in ("load", "ml", "llm", "checkpoint"):
+            values = sorted(t[stage] for t in timings if stage in t)
+            if not values:
+                continue
+            summary[stage] = {
+                "total": round(sum(values), 3),
+                "mean": round(sum(values) / len(values), 3),
+                "p50": round(values[len(values) // 2], 3),
+                "max": round(values[-1], 3)
+            }
+        return summary
+
+    @staticmethod
+    def _write_json(path: str, data: Dict[str, Any]) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2, default=str)
+        os.replace(tmp_path, path)
@@ -0,0 +1,220 @@
+from collections import deque
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import logging
+import os
+import numpy as np
+from domain.models.best_effort import ActivityBestEfforts
+from infrastructure.ml.model_registry import DEFAULT_ATHLETE_ID
+from infrastructure.repositories.best_effort_repository import BestEffortRepository
+
+logger = logging.getLogger(__name__)
+
+DISTANCES_M = {
+    "400m": 400.0,
+    "1km": 1000.0,
+    "1mile": 1609.344,
+    "5km": 5000.0,
+    "10km": 10000.0,
+    "half_marathon": 21097.5,
+    "marathon": 42195.0,
+}
+DURATIONS_S = (5, 30, 60, 300, 600, 1200, 1800, 3600)
+
+# Curvas de tempo por distância: menor é melhor; potência e FC por duração: maior é melhor
+LOWER_IS_BETTER = {"distance_s"}
+
+
+class BestEffortsEngine:
+    """Mean-maximal curves of one activity from its sample streams.
+
+    Distance efforts are the fastest time over each distance, found by
+    interpolating the time at which every start sample has covered the
+    distance. Power and heart-rate efforts are the best mean over each
+    duration, from prefix sums of the stream resampled to 1 Hz, so each
+    duration is one O(n) vectorized pass.
+    """
+
+    def __init__(self, distances: Optional[Dict[str, float]] = None,
+                 durations: Optional[Tuple[int, ...]] = None):
+        self.distances = distances or DISTANCES_M
+        self.durations = durations or DURATIONS_S
+
+    def curves(self, streams: Dict[str, Optional[np.ndarray]]) -> Dict[str, Dict[str, float]]:
+        timestamps = streams.get("timestamp")
+        if timestamps is None or len(timestamps) < 2:
+            return {}
+
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        result = {}
+        if streams.get("distance") is not None:
+            result["distance_s"] = self.distance_efforts(timestamps, np.asarray(streams["distance"], dtype=np.float64))
+        if streams.get("power") is not None:
+            result["power_w"] = self.duration_efforts(timestamps, np.asarray(streams["power"], dtype=np.float64))
+        if streams.get("heart_rate") is not None:
+            result["heart_rate_bpm"] = self.duration_efforts(timestamps, np.asarray(streams["heart_rate"], dtype=np.float64))
+        return {curve: values for curve, values in result.items() if values}
+
+    def distance_efforts(self, timestamps: np.ndarray, distance: np.ndarray) -> Dict[str, float]:
+        valid = np.isfinite(distance)
+        timestamps, distance = timestamps[valid], distance[valid]
+        if len(distance) < 2:
+            return {}
+        # Distância acumulada nunca diminui (corrige ruído do GPS)
+        distance = np.maximum.accumulate(distance)
+
+        efforts = {}
+        for name, target in self.distances.items():
+            starts = distance <= distance[-1] - target
+            if not starts.any():
+                continue
+            end_times = np.interp(distance[starts] + target, distance, timestamps)
+            efforts[name] = round(float((end_times - timestamps[starts]).min()), 1)
+        return efforts
+
+    def duration_efforts(self, timestamps: np.ndarray, values: np.ndarray) -> Dict[str, float]:
+        valid = np.isfinite(values)
+        if valid.sum() < 2:
+            return {}
+        grid = np.arange(timestamps[valid][0], timestamps[valid][-1] + 1)
+        resampled = np.interp(grid, timestamps[valid], values[valid])
+        prefix = np.concatenate(([0.0], np.cumsum(resampled)))
+
+        efforts = {}
+        for window in self.durations:
+            if window > len(resampled):
+                break
+            means = (prefix[window:] - prefix[:-window]) / window
+            efforts[str(window)] = round(float(means.max()), 1)
+        return efforts
+
+
+class PersonalRecordIndex:
+    """All-time and rolling-window personal records of one athlete.
+
+    All-time records are a dict per effort; each rolling window keeps, per
+    effort, a monotonic deque of (time, score) ordered by time where scores
+    decrease from front to back, so the front is the window's record once
+    expired entries are dropped. Adding an activity in chronological order
+    and looking up a record are amortized O(1) per effort. An older
+    activity (late sync, backfill) is inserted in place: it is dropped if a
+    later entry already beats it, otherwise it replaces the earlier entries
+    it beats, which costs O(deque length) per effort instead of a rebuild.
+    """
+
+    def __init__(self, windows_days: Tuple[int, ...]):
+        self.windows_days = windows_days
+        self.latest: Optional[datetime] = None
+        self.all_time: Dict[str, Dict[str, Any]] = {}
+        self.windows: Dict[int, Dict[str, Deque[Tuple[datetime, float, Dict[str, Any]]]]] = {
+            days: {} for days in windows_days
+        }
+
+    def add(self, activity_id: str, start_time: datetime, curves: Dict[str, Dict[str, float]]) -> None:
+        in_order = self.latest is None or start_time >= self.latest
+        if in_order:
+            self.latest = start_time
+
+        for curve, efforts in curves.items():
+            sign = -1 if curve in LOWER_IS_BETTER else 1
+            for effort, value in efforts.items():
+                key = f"{curve}:{effort}"
+                score = sign * value
+                record = {"value": value, "activity_id": activity_id, "start_time": start_time.isoformat()}
+
+                best = self.all_time.get(key)
+                # Em caso de empate vale a atividade mais antiga
+                if best is None or score > best["score"] or (
+                        score == best["score"] and start_time < datetime.fromisoformat(best["start_time"])):
+                    self.all_time[key] = {**record, "score": score}
+
+                for window in self.windows.values():
+                    entries = window.setdefault(key, deque())
+                    if in_order:
+                        while entries and entries[-1][1] <= score:
+                            entries.pop()
+                        entries.append((start_time, score, record))
+                    else:
+                        self._insert(entries, start_time, score, record)
+
+    @staticmethod
+    def _insert(entries: Deque[Tuple[datetime, float, Dict[str, Any]]], start_time: datetime,
+                score: float, record: Dict[str, Any]) -> None:
+        """Places an out-of-order entry keeping the deque ordered by time with decreasing scores"""
+        position = len(entries)
+        while position > 0 and entries[position - 1][0] > start_time:
+            position -= 1
+        # A primeira entrada posterior é a maior delas; se ela vence, a nova nunca será recorde
+        if position < len(entries) and entries[position][1] >= score:
+            return
+        while position > 0 and entries[position - 1][1] <= score:
+            del entries[position - 1]
+            position -= 1
+        entries.insert(position, (start_time, score, record))
+
+    def records(self, window_days: Optional[int] = None, now: Optional[datetime] = None) -> Dict[str, Dict[str, Any]]:
+        """Current records, all-time when window_days is None"""
+        if window_days is None:
+            return {key: {k: v for k, v in best.items() if k != "score"} for key, best in self.all_time.items()}
+        if window_days not in self.windows:
+            raise ValueError(f"Window of {window_days} days is not indexed; available: {list(self.windows_days)}")
+
+        cutoff = (now or datetime.now()) - timedelta(days=window_days)
+        result = {}
+        for key, entries in self.windows[window_days].items():
+            while entries and entries[0][0] < cutoff:
+                entries.popleft()
+            if entries:
+                result[key] = entries[0][2]
+        return result
+
+
+class BestEffortsService:
+    """Computes and stores per-activity curves and keeps the PR indexes up to date on ingest"""
+
+    def __init__(self, repository: BestEffortRepository, engine: Optional[BestEffortsEngine] = None,
+                 indexes: Optional[Dict[str, PersonalRecordIndex]] = None,
+                 windows_days: Optional[Tuple[int, ...]] = None):
+        self.repository = repository
+        self.engine = engine or BestEffortsEngine()
+        self.indexes = get_personal_record_indexes() if indexes is None else indexes
+        self.windows_days = windows_days or tuple(
+            int(days) for days in os.getenv("PR_WINDOWS_DAYS", "42,90,365").split(",")
+        )
+
+    def ingest(self, activity_id: Any, start_time: datetime, streams: Dict[str, Optional[np.ndarray]],
+               athlete_id: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+        athlete_id = athlete_id or DEFAULT_ATHLETE_ID
+        curves = self.engine.curves(streams)
+        self.repository.save(ActivityBestEfforts(
+            activity_id=str(activity_id),
+            athlete_id=athlete_id,
+            start_time=start_time,
+            curves=curves,
+            computed_at=datetime.now()
+        ))
+
+        self.index(athlete_id).add(str(activity_id), start_time, curves)
+        return curves
+
+    def index(self, athlete_id: Optional[str] = None) -> PersonalRecordIndex:
+        athlete_id = athlete_id or DEFAULT_ATHLETE_ID
+        if athlete_id not in self.indexes:
+            self.indexes[athlete_id] = self._build_index(athlete_id)
+        return self.indexes[athlete_id]
+
+    def records(self, athlete_id: Optional[str] = None, window_days: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        return self.index(athlete_id).records(window_days)
+
+    def _build_index(self, athlete_id: str) -> PersonalRecordIndex:
+        index = PersonalRecordIndex(self.windows_days)
+        for stored in self.repository.get_by_athlete(athlete_id):
+            index.add(stored.activity_id, stored.start_time, stored.curves)
+        return index
+
+
+@lru_cache()
+def get_personal_record_indexes() -> Dict[str, PersonalRecordIndex]:
+    """PR indexes per athlete shared by the process, built from stored curves on first use"""
+    return {}
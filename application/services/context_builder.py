@@ -0,0 +1,206 @@
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Callable, List, Optional
+import logging
+import os
+import numpy as np
+from domain.entities.activity import Activity
+
+try:
+    import tiktoken
+except ImportError:  # contagem aproximada quando tiktoken não está instalado
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+RECENT_HEADER = "date|name|km|time|moving|pace|best|hr/max|cad/max|elev+/-|te|ae|vo2|power/max|stride/gct/vosc/vratio|splits"
+WEEKLY_HEADER = "week|runs|km|time|pace|hr|long_km|elev+"
+
+
+def _approximate_token_count(text: str) -> int:
+    # ~4 caracteres por token para texto em inglês/números
+    return len(text) // 4 + 1
+
+
+@lru_cache()
+def get_token_counter() -> Callable[[str], int]:
+    """Returns an exact tokenizer when tiktoken is available, else an estimate (warned once per process)"""
+    if tiktoken is None:
+        logger.warning("tiktoken is not installed; LLM context token budgets use a ~4 characters/token estimate")
+        return _approximate_token_count
+    encoding = tiktoken.get_encoding("cl100k_base")
+    return lambda text: len(encoding.encode(text))
+
+
+def _format_pace(seconds_per_km: Optional[float]) -> str:
+    if not seconds_per_km or seconds_per_km <= 0 or not np.isfinite(seconds_per_km):
+        return "-"
+    minutes, seconds = divmod(int(round(seconds_per_km)), 60)
+    return f"{minutes}:{seconds:02d}"
+
+
+def _format_speed_as_pace(speed_ms: Optional[float]) -> str:
+    if not speed_ms or speed_ms <= 0:
+        return "-"
+    return _format_pace(1000 / speed_ms)
+
+
+def _format_duration(seconds: Optional[float]) -> str:
+    if not seconds:
+        return "-"
+    hours, remainder = divmod(int(seconds), 3600)
+    minutes, secs = divmod(remainder, 60)
+    if hours > 0:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes}:{secs:02d}"
+
+
+def _number(value: Any, decimals: int = 0) -> str:
+    if value is None or (isinstance(value, (int, float)) and value <= 0):
+        return "-"
+    return f"{value:.{decimals}f}"
+
+
+class CompactContextBuilder:
+    """Builds the activity context of an LLM prompt within a token budget.
+
+    The most recent runs are encoded one per row of a pipe-separated table
+    (including a compact split pace list); everything older is summarized
+    as weekly aggregates. Rows are added newest first until the budget is
+    spent, so months of training fit in a fixed prompt size.
+    """
+
+    def __init__(self, token_budget: Optional[int] = None, recent_full: Optional[int] = None,
+                 token_counter: Optional[Callable[[str], int]] = None):
+        self.token_budget = token_budget or int(os.getenv("LLM_CONTEXT_TOKEN_BUDGET", 3000))
+        self.recent_full = recent_full or int(os.getenv("LLM_CONTEXT_RECENT_FULL", 10))
+        self.count_tokens = token_counter or get_token_counter()
+
+    def build(self, activities: List[Activity]) -> str:
+        if not activities:
+            return "No activities found"
+
+        activities = sorted(activities, key=lambda a: a.start_time, reverse=True)
+        lines = [f"Recent runs, newest first ({RECENT_HEADER}):"]
+        used = self.count_tokens(lines[0]) + 1
+
+        included = 0
+        for activity in activities[:self.recent_full]:
+            row = self._activity_row(activity)
+            cost = self.count_tokens(row) + 1
+            if used + cost > self.token_budget:
+                break
+            lines.append(row)
+            used += cost
+            included += 1
+
+        older = activities[included:]
+        if older:
+            header = f"Earlier training as weekly aggregates, newest first ({WEEKLY_HEADER}):"
+            header_cost = self.count_tokens(header) + 1
+            weekly_rows = self._weekly_rows(older)
+
+            added = 0
+            section = [header]
+            for row in weekly_rows:
+                # O cabeçalho só é cobrado junto com a primeira semana que couber
+                cost = self.count_tokens(row) + 1 + (header_cost if not added else 0)
+                if used + cost > self.token_budget:
+                    break
+                section.append(row)
+                used += cost
+                added += 1
+
+            if added:
+                lines.extend(section)
+            if added < len(weekly_rows):
+                lines.append(f"({len(weekly_rows) - added} older weeks omitted)")
+
+        logger.debug("Built LLM context with ~%d tokens (%d full runs)", used, included)
+        return "\n".join(lines)
+
+    def _activity_row(self, activity: Activity) -> str:
+        # Aceita tanto a entidade de domínio quanto o modelo do banco, que não tem todos os campos
+        def field(name: str) -> Any:
+            return getattr(activity, name, None)
+
+        pace = activity.duration / (activity.distance / 1000) if activity.distance and activity.duration else None
+
+        dynamics = "-"
+        dynamics_values = [field(name) for name in
+                           ("stride_length", "ground_contact_time", "vertical_oscillation", "vertical_ratio")]
+        if any(v is not None for v in dynamics_values):
+            dynamics = "/".join([
+                _number(dynamics_values[0], 1),
+                _number(dynamics_values[1]),
+                _number(dynamics_values[2], 1),
+                _number(dynamics_values[3], 1)
+            ])
+
+        training_effect = _number(field("training_effect"), 1)
+        if field("training_effect_label") and training_effect != "-":
+            training_effect += f" {field('training_effect_label')}"
+
+        splits = " ".join(_format_speed_as_pace(split.get("pace")) for split in field("splits") or [])
+
+        return "|".join([
+            activity.start_time.strftime("%Y-%m-%d %H:%M"),
+            (field("activity_name") or "-").replace("|", "/"),
+            f"{activity.distance / 1000:.2f}",
+            _format_duration(activity.duration),
+            _format_duration(field("moving_duration")),
+            _format_pace(pace),
+            _format_speed_as_pace(field("max_speed")),
+            f"{_number(field('heart_rate_avg'))}/{_number(field('heart_rate_max'))}",
+            f"{_number(field('cadence_avg'))}/{_number(field('cadence_max'))}",
+            f"{_number(field('elevation_gain'))}/{_number(field('elevation_loss'))}",
+            training_effect,
+            _number(field("anaerobic_effect"), 1),
+            _number(field("vo2_max")),
+            f"{_number(field('power_avg'))}/{_number(field('power_max'))}",
+            dynamics,
+            splits or "-"
+        ])
+
+    def _weekly_rows(self, activities: List[Activity]) -> List[str]:
+        """Aggregates activities per ISO week in one vectorized pass"""
+        starts = np.array([a.start_time.replace(tzinfo=None) for a in activities], dtype="datetime64[s]")
+        distance = np.array([a.distance or 0 for a in activities], dtype=np.float64)
+        duration = np.array([a.duration or 0 for a in activities], dtype=np.float64)
+        heart_rate = np.array([a.heart_rate_avg or np.nan for a in activities], dtype=np.float64)
+        elevation = np.array([a.elevation_gain or 0 for a in activities], dtype=np.float64)
+
+        # 1970-01-01 foi uma quinta-feira: desloca 3 dias para semanas começarem na segunda
+        days = starts.astype("datetime64[D]").astype(np.int64)
+        week_index = (days + 3) // 7
+        weeks, inverse = np.unique(week_index, return_inverse=True)
+        n_weeks = len(weeks)
+
+        runs = np.bincount(inverse, minlength=n_weeks)
+        total_distance = np.bincount(inverse, weights=distance, minlength=n_weeks)
+        total_duration = np.bincount(inverse, weights=duration, minlength=n_weeks)
+        total_elevation = np.bincount(inverse, weights=elevation, minlength=n_weeks)
+        has_hr = ~np.isnan(heart_rate)
+        hr_weight = np.where(has_hr, duration, 0)
+        hr_sum = np.bincount(inverse, weights=np.where(has_hr, heart_rate * duration, 0), minlength=n_weeks)
+        hr_time = np.bincount(inverse, weights=hr_weight, minlength=n_weeks)
+        longest = np.zeros(n_weeks)
+        np.maximum.at(longest, inverse, distance)
+
+        rows = []
+        for i in range(n_weeks - 1, -1, -1):
+            monday = datetime(1970, 1, 1) + timedelta(days=int(weeks[i]) * 7 - 3)
+            iso_year, iso_week, _ = monday.isocalendar()
+            pace = total_duration[i] / (total_distance[i] / 1000) if total_distance[i] > 0 else None
+            avg_hr = hr_sum[i] / hr_time[i] if hr_time[i] > 0 else None
+            rows.append("|".join([
+                f"{iso_year}-W{iso_week:02d}",
+                str(int(runs[i])),
+                f"{total_distance[i] / 1000:.1f}",
+                _format_duration(total_duration[i]),
+                _format_pace(pace),
+                _number(avg_hr),
+                f"{longest[i] / 1000:.1f}",
+                _number(total_elevation[i])
+            ]))
+        return rows
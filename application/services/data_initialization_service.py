@@ -1,23 +1,35 @@
-from typing import List
+from typing import List, Optional
 from sqlalchemy.orm import Session
 from infrastructure.repositories.activity_repository import ActivityRepository
 from infrastructure.garmin.garmin_connector import GarminConnector
 from domain.models.activity import Activity as ActivityModel
+from infrastructure.ml.model_registry import DEFAULT_ATHLETE_ID
+from .best_efforts import BestEffortsService
+from .trend_engine import get_trend_states
+from .percentile_store import get_percentile_store
+from .data_versions import get_data_versions
+import logging
+
+logger = logging.getLogger(__name__)
 
 class DataInitializationService:
-    def __init__(self, db: Session, activity_repository: ActivityRepository, garmin_connector: GarminConnector):
+    def __init__(self, db: Session, activity_repository: ActivityRepository, garmin_connector: GarminConnector,
+                 best_efforts_service: Optional[BestEffortsService] = None):
         self.db = db
         self.activity_repository = activity_repository
         self.garmin_connector = garmin_connector
+        self.best_efforts_service = best_efforts_service
 
-    async def initialize_data(self, limit: int = 100):
+    async def initialize_data(self, limit: int = 100, athlete_id: Optional[str] = None):
         """Fetch activities from Garmin and save to database"""
         activities = await self.garmin_connector.get_activities(limit)
         
+        stored_athlete_id = self.activity_repository.stored_athlete_id(athlete_id)
         db_activities = []
         for activity in activities:
             db_activity = ActivityModel(
                 activity_id=str(activity.id),
+                athlete_id=stored_athlete_id,
                 start_time=activity.start_time,
                 duration=activity.duration,
                 distance=activity.distance,
@@ -25,9 +37,33 @@ class DataInitializationService:
                 heart_rate_max=activity.heart_rate_max,
                 calories=activity.calories,
                 elevation_gain=activity.elevation_gain,
-                activity_type=activity.activity_type
+                activity_type=activity.activity_type,
+                splits=activity.splits
             )
             db_activities.append(db_activity)
         
         self.activity_repository.save_many(db_activities)
-        return len(db_activities) 
\ No newline at end of file
+        # O estado de tendências incorpora as novas atividades; só é descartado (e reconstruído
+        # do banco no próximo uso) quando elas não cabem nele
+        trend_states = get_trend_states()
+        trend_state = trend_states.get(athlete_id or DEFAULT_ATHLETE_ID)
+        if trend_state is not None and not trend_state.add_many(activities):
+            trend_states.pop(athlete_id or DEFAULT_ATHLETE_ID, None)
+        get_data_versions().invalidate(athlete_id)
+        # Os sketches de percentis são mantidos na ingestão; atletas ainda não carregados são lidos do banco no primeiro uso
+        percentile_store = get_percentile_store()
+        if percentile_store.has_athlete(athlete_id):
+            percentile_store.add(activities, athlete_id)
+
+        if self.best_efforts_service is not None:
+            await self._ingest_best_efforts(activities, athlete_id)
+        return len(db_activities)
+
+    async def _ingest_best_efforts(self, activities, athlete_id: Optional[str]):
+        """Computes best-effort curves from the sample streams, oldest first so PR indexes update incrementally"""
+        for activity in sorted(activities, key=lambda a: a.start_time):
+            try:
+                streams = await self.garmin_connector.get_activity_streams(activity.id)
+                self.best_efforts_service.ingest(activity.id, activity.start_time, streams, athlete_id)
+            except Exception as e:
+                logger.warning(f"Could not compute best efforts of activity {activity.id}: {str(e)}") 
\ No newline at end of file
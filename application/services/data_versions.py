@@ -0,0 +1,86 @@
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import logging
+import os
+import time
+from infrastructure.ml.model_registry import DEFAULT_ATHLETE_ID
+from infrastructure.repositories.activity_repository import ActivityRepository
+
+logger = logging.getLogger(__name__)
+
+# Por quanto tempo (s) uma versão conhecida é usada sem consultar o banco ou o Garmin
+DATA_VERSION_TTL = float(os.getenv("DATA_VERSION_TTL", 60))
+
+GARMIN_SOURCE = "garmin"
+
+
+class DataVersion:
+    """Marker of the latest data of a source and when it was last seen to change"""
+
+    def __init__(self, marker: Tuple[Any, ...], changed_at: datetime, checked_at: float):
+        self.marker = marker
+        self.changed_at = changed_at
+        self.checked_at = checked_at
+
+
+class DataVersionRegistry:
+    """Cheap validators for the data behind the API responses.
+
+    Stored activities are versioned per athlete by (count, highest row id,
+    latest start time), read with one aggregate query; Garmin is versioned
+    by the id and start time of the most recent activity, read with a
+    one-item list request. Known versions are reused for `ttl` seconds, so
+    within that window answering a conditional request touches neither the
+    database nor Garmin. Ingestion invalidates the athlete's version so this
+    process never serves a stale one.
+
+    changed_at is the first time this process saw the current marker; it
+    backs Last-Modified.
+    """
+
+    def __init__(self, ttl: float = DATA_VERSION_TTL):
+        self.ttl = ttl
+        self._versions: Dict[Tuple[str, str], DataVersion] = {}
+
+    def stored(self, athlete_id: Optional[str], repository: ActivityRepository) -> DataVersion:
+        key = ("stored", athlete_id or DEFAULT_ATHLETE_ID)
+        version = self._fresh(key)
+        if version is None:
+            version = self._update(key, repository.get_version(athlete_id))
+        return version
+
+    async def garmin(self, probe: Callable[[], Awaitable[Tuple[Any, ...]]]) -> DataVersion:
+        key = (GARMIN_SOURCE, "")
+        version = self._fresh(key)
+        if version is None:
+            version = self._update(key, await probe())
+        return version
+
+    def invalidate(self, athlete_id: Optional[str] = None) -> None:
+        """Forces the next lookup to re-read the athlete's stored version"""
+        version = self._versions.get(("stored", athlete_id or DEFAULT_ATHLETE_ID))
+        if version is not None:
+            version.checked_at = float("-inf")
+
+    def _fresh(self, key: Tuple[str, str]) -> Optional[DataVersion]:
+        version = self._versions.get(key)
+        if version is not None and time.monotonic() - version.checked_at < self.ttl:
+            return version
+        return None
+
+    def _update(self, key: Tuple[str, str], marker: Tuple[Any, ...]) -> DataVersion:
+        now = time.monotonic()
+        version = self._versions.get(key)
+        if version is not None and version.marker == marker:
+            version.checked_at = now
+            return version
+        logger.debug(f"Data version of {key} is now {marker}")
+        version = self._versions[key] = DataVersion(marker, datetime.now(timezone.utc), now)
+        return version
+
+
+@lru_cache()
+def get_data_versions() -> DataVersionRegistry:
+    """Data versions shared by the process"""
+    return DataVersionRegistry()
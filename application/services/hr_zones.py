@@ -0,0 +1,211 @@
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+import logging
+import os
+import threading
+import numpy as np
+from domain.entities.activity import Activity
+from domain.entities.activity_frame import ActivityFrame
+
+logger = logging.getLogger(__name__)
+
+ZONE_LABELS = ["zone1", "zone2", "zone3", "zone4", "zone5"]
+ZONE_COUNT = len(ZONE_LABELS)
+# Intervalos maiores que isso entre amostras são pausas e contam só até esse limite
+MAX_SAMPLE_GAP_SECONDS = 10.0
+
+# Limite inferior das zonas 2-5 em fração da referência de cada modelo
+ZONE_MODELS = {
+    "max_hr": (0.60, 0.70, 0.80, 0.90),   # % da FC máxima
+    "hrr": (0.60, 0.70, 0.80, 0.90),      # Karvonen: % da reserva de FC acima do repouso
+    "lthr": (0.85, 0.90, 0.95, 1.00),     # Friel (corrida): % da FC de limiar
+}
+
+HeartRateStream = Tuple[np.ndarray, Optional[np.ndarray]]
+
+
+class HRZoneModel:
+    """Five heart-rate zones derived from max HR, heart-rate reserve or threshold HR"""
+
+    def __init__(self, kind: str = "max_hr", max_hr: Optional[float] = None,
+                 lthr: Optional[float] = None, rest_hr: Optional[float] = None):
+        if kind not in ZONE_MODELS:
+            raise ValueError(f"Unknown zone model: {kind}")
+        self.kind = kind
+        self.max_hr = max_hr
+        self.lthr = lthr
+        self.rest_hr = rest_hr
+
+    @classmethod
+    def from_env(cls, max_hr: Optional[float] = None) -> "HRZoneModel":
+        """Model configured by HR_ZONE_MODEL, HR_MAX, HR_LTHR and HR_REST; max_hr fills in a missing HR_MAX"""
+        return cls(
+            kind=os.getenv("HR_ZONE_MODEL", "max_hr"),
+            max_hr=float(os.getenv("HR_MAX")) if os.getenv("HR_MAX") else max_hr,
+            lthr=float(os.getenv("HR_LTHR")) if os.getenv("HR_LTHR") else None,
+            rest_hr=float(os.getenv("HR_REST", 60))
+        )
+
+    def boundaries(self) -> np.ndarray:
+        """Lower bounds (bpm) of zones 2 to 5, ascending"""
+        fractions = np.array(ZONE_MODELS[self.kind])
+        if self.kind == "lthr":
+            if not self.lthr:
+                raise ValueError("The lthr zone model requires lthr")
+            return fractions * self.lthr
+        if not self.max_hr:
+            raise ValueError(f"The {self.kind} zone model requires max_hr")
+        if self.kind == "hrr":
+            rest = self.rest_hr or 0
+            return rest + fractions * (self.max_hr - rest)
+        return fractions * self.max_hr
+
+    @property
+    def key(self) -> Tuple:
+        return (self.kind,) + tuple(np.round(self.boundaries(), 2))
+
+
+def _sample_durations(timestamps: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Seconds each sample stands for, over concatenated streams ending at `ends`"""
+    # Cada amostra vale até a próxima; a última de cada stream repete o intervalo anterior
+    durations = np.empty(len(timestamps))
+    durations[:-1] = np.diff(timestamps)
+    durations[ends] = np.where(ends > 0, durations[np.maximum(ends - 1, 0)], 1.0)
+    single = np.diff(np.concatenate(([-1], ends))) == 1
+    durations[ends[single]] = 1.0
+    return np.clip(durations, 0, MAX_SAMPLE_GAP_SECONDS)
+
+
+class HRZoneEngine:
+    """Time-in-zone from per-sample heart-rate streams.
+
+    Samples are binned with np.searchsorted against the zone boundaries
+    and summed with np.bincount; many activities are concatenated and
+    binned in a single pass. Per-activity results are cached by activity
+    id and zone model.
+    """
+
+    def __init__(self, model: HRZoneModel, cache_size: Optional[int] = None):
+        self.model = model
+        self.cache_size = cache_size or int(os.getenv("HR_ZONE_CACHE_SIZE", 10000))
+        self._cache: "OrderedDict[Tuple, np.ndarray]" = OrderedDict()
+        # Engines compartilhadas são usadas por threads do executor ao mesmo tempo
+        self._lock = threading.Lock()
+
+    def time_in_zones(self, heart_rate: np.ndarray, timestamps: Optional[np.ndarray] = None) -> np.ndarray:
+        """Seconds spent in each zone for one stream"""
+        return self.batch_time_in_zones([(heart_rate, timestamps)])[0]
+
+    def batch_time_in_zones(self, streams: Sequence[HeartRateStream]) -> np.ndarray:
+        """Seconds in each zone for many streams at once, shape (len(streams), 5)"""
+        if not streams:
+            return np.zeros((0, ZONE_COUNT))
+
+        heart_rate = np.concatenate([np.asarray(hr, dtype=np.float64) for hr, _ in streams])
+        lengths = np.fromiter((len(hr) for hr, _ in streams), dtype=np.int64, count=len(streams))
+        # Streams sem timestamps são tratados como uma amostra por segundo
+        timestamps = np.concatenate([
+            np.asarray(ts, dtype=np.float64) if ts is not None and len(ts) == len(hr) else np.arange(len(hr), dtype=np.float64)
+            for hr, ts in streams
+        ])
+        ends = np.cumsum(lengths) - 1
+        ends = ends[lengths > 0]
+        durations = _sample_durations(timestamps, ends) if len(heart_rate) else np.zeros(0)
+        owner = np.repeat(np.arange(len(streams)), lengths)
+
+        valid = np.isfinite(heart_rate) & (heart_rate > 0)
+        flat = owner[valid] * ZONE_COUNT + self._zones(heart_rate[valid])
+        totals = np.bincount(flat, weights=durations[valid], minlength=len(streams) * ZONE_COUNT)
+        return totals.reshape(len(streams), ZONE_COUNT)
+
+    def _zones(self, heart_rate: np.ndarray) -> np.ndarray:
+        boundaries = self.model.boundaries()
+        # FC em bpm inteiros: uma tabela de consulta é bem mais rápida que searchsorted
+        as_int = heart_rate.astype(np.int64)
+        if len(heart_rate) > 4096 and (as_int == heart_rate).all() and as_int.max() < 256:
+            lookup = np.searchsorted(boundaries, np.arange(256), side="right").astype(np.int64)
+            return lookup[as_int]
+        return np.searchsorted(boundaries, heart_rate, side="right")
+
+    def activity_zones(self, activity_id: Any, heart_rate: np.ndarray,
+                       timestamps: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cached time_in_zones of one activity"""
+        return self._cached_batch({activity_id: (heart_rate, timestamps)})[activity_id]
+
+    def activities_zones(self, streams: Dict[Any, HeartRateStream]) -> Dict[Any, np.ndarray]:
+        """Cached time_in_zones of many activities keyed by activity id, uncached ones binned in one pass"""
+        return self._cached_batch(streams)
+
+    def season_distribution(self, activities: Union[List[Activity], ActivityFrame],
+                            streams: Optional[Dict[Any, HeartRateStream]] = None) -> Dict[str, Any]:
+        """Zone distribution over many activities in one call.
+
+        Activities with a stream in `streams` (keyed by activity id) are
+        binned per sample; the others are estimated by putting their whole
+        duration in the zone of their average heart rate.
+        """
+        streams = streams or {}
+        frame = ActivityFrame.coerce(activities, sort=False, columns=("duration", "heart_rate_avg"))
+        has_stream = np.fromiter((activity_id in streams for activity_id in frame.ids), dtype=bool, count=len(frame))
+        with_stream = {activity_id: streams[activity_id] for activity_id in frame.ids[has_stream]}
+        totals = np.zeros(ZONE_COUNT)
+        if with_stream:
+            totals += np.sum(list(self._cached_batch(with_stream).values()), axis=0)
+
+        averages, durations = frame["heart_rate_avg"], frame["duration"]
+        estimated = ~has_stream & (averages > 0) & (durations > 0)
+        if estimated.any():
+            zones = np.searchsorted(self.model.boundaries(), averages[estimated], side="right")
+            totals += np.bincount(zones, weights=durations[estimated], minlength=ZONE_COUNT)
+
+        total_time = totals.sum()
+        return {
+            "model": self.model.kind,
+            "boundaries_bpm": [round(float(b), 1) for b in self.model.boundaries()],
+            "seconds": {label: round(float(t), 1) for label, t in zip(ZONE_LABELS, totals)},
+            "share": {
+                label: round(float(t / total_time), 4) if total_time else 0.0
+                for label, t in zip(ZONE_LABELS, totals)
+            },
+            "activities_with_streams": len(with_stream),
+            "activities_estimated": int(estimated.sum())
+        }
+
+    def _cached_batch(self, streams: Dict[Any, HeartRateStream]) -> Dict[Any, np.ndarray]:
+        model_key = self.model.key
+        results = {}
+        missing = []
+        with self._lock:
+            for activity_id in streams:
+                cached = self._cache.get((activity_id, model_key))
+                if cached is not None:
+                    self._cache.move_to_end((activity_id, model_key))
+                    results[activity_id] = cached
+                else:
+                    missing.append(activity_id)
+
+        if missing:
+            computed = self.batch_time_in_zones([streams[activity_id] for activity_id in missing])
+            with self._lock:
+                for activity_id, zones in zip(missing, computed):
+                    results[activity_id] = zones
+                    self._cache[(activity_id, model_key)] = zones
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return results
+
+
+@lru_cache(maxsize=32)
+def _default_engine(max_hr: Optional[float]) -> HRZoneEngine:
+    return HRZoneEngine(HRZoneModel.from_env(max_hr=max_hr))
+
+
+def default_hr_zone_engine(max_hr: Optional[float] = None) -> HRZoneEngine:
+    """Engine of the env-configured zone model shared by the process, one per max HR.
+
+    Analyzers are created per request; sharing the engine keeps its
+    per-activity cache across them.
+    """
+    return _default_engine(float(max_hr) if max_hr else None)
@@ -1,117 +1,282 @@
-from typing import List, Dict, Any
+from concurrent.futures import Executor
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple, Union
 from .ml_analyzer import MLAnalyzer
 from .llm_analyzer import LLMAnalyzer
+from .training_load import TrainingLoadEngine
+from .hr_zones import HRZoneEngine, ZONE_LABELS, default_hr_zone_engine
+from .percentile_store import PercentileStore, SortedSketch
 from domain.entities.activity import Activity
+from domain.entities.activity_frame import ActivityFrame
 from datetime import datetime, timedelta
+import asyncio
+import numpy as np
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class HybridAnalysisRun:
+    """One hybrid analysis with its stages scheduled concurrently.
+
+    ML scoring and metric computation run in an executor, off the event
+    loop. The LLM call starts as soon as the ML patterns it puts in the
+    prompt are ready, so it overlaps with the metrics. Each stage can be
+    awaited on its own: partial() returns ML and metrics without waiting
+    for the LLM, result() returns the full analysis.
+    """
+
+    def __init__(self, analyzer: "HybridAnalyzer", activities: Union[List[Activity], ActivityFrame],
+                 ml_analysis: Optional[Dict[str, Any]] = None):
+        loop = asyncio.get_running_loop()
+        self.analyzer = analyzer
+        self.activities = activities
+        self.stage_timings: Dict[str, float] = {}
+        self.started = time.perf_counter()
+
+        # ml_analysis pode vir pronto (ex.: calculado em outro processo pelo batch)
+        if ml_analysis is None:
+            self.ml_task = loop.run_in_executor(
+                analyzer.executor, self._timed, "ml", analyzer.ml_analyzer.analyze_patterns, activities
+            )
+        else:
+            self.ml_task = loop.create_future()
+            self.ml_task.set_result(ml_analysis)
+        self.metrics_task = loop.run_in_executor(
+            analyzer.executor, self._timed, "metrics", analyzer._compute_metrics, activities
+        )
+        self.llm_task = asyncio.ensure_future(self._run_llm())
+        # Runs deferred or evicted may never be awaited; the callbacks retrieve and log their failures
+        for stage, task in (("ml", self.ml_task), ("metrics", self.metrics_task), ("llm", self.llm_task)):
+            task.add_done_callback(lambda task, stage=stage: self._log_failure(stage, task))
+
+    @staticmethod
+    def _log_failure(stage: str, task: asyncio.Future) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Hybrid analysis {stage} stage failed: {str(task.exception())}")
+
+    def _timed(self, stage: str, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.stage_timings[stage] = round(time.perf_counter() - start, 4)
+
+    async def _run_llm(self) -> Dict[str, Any]:
+        ml_analysis = await self.ml_task
+        start = time.perf_counter()
+        try:
+            enriched_context = self.analyzer._prepare_enriched_context(self.activities, ml_analysis)
+            # O LLM formata registros individuais; um frame entrega os objetos de origem
+            records = self.activities.to_list() if isinstance(self.activities, ActivityFrame) else self.activities
+            return await self.analyzer.llm_analyzer.analyze_activities(
+                activities=records,
+                ml_context=enriched_context
+            )
+        finally:
+            self.stage_timings["llm"] = round(time.perf_counter() - start, 4)
+
+    @property
+    def llm_done(self) -> bool:
+        return self.llm_task.done()
+
+    async def partial(self) -> Dict[str, Any]:
+        """ML and metrics results, with the LLM insights filled in only if already available"""
+        ml_analysis, metrics = await asyncio.gather(self.ml_task, self.metrics_task)
+        llm_analysis = None
+        if self.llm_task.done() and not self.llm_task.cancelled() and self.llm_task.exception() is None:
+            llm_analysis = self.llm_task.result()
+        return self._assemble(ml_analysis, metrics, llm_analysis)
+
+    async def result(self) -> Dict[str, Any]:
+        ml_analysis, metrics, llm_analysis = await asyncio.gather(self.ml_task, self.metrics_task, self.llm_task)
+        return self._assemble(ml_analysis, metrics, llm_analysis)
+
+    async def stages(self) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Yields (stage, payload) as each stage finishes, then ("complete", full result)"""
+        pending = {self.ml_task: "ml", self.metrics_task: "metrics", self.llm_task: "llm"}
+        failed = False
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                stage = pending.pop(task)
+                if task.exception() is not None:
+                    failed = True
+                    yield stage, {"status": "error", "message": str(task.exception())}
+                    continue
+                yield stage, self._stage_payload(stage, task.result())
+
+        if not failed:
+            yield "complete", await self.result()
+
+    def cancel(self) -> None:
+        self.llm_task.cancel()
+
+    def _stage_payload(self, stage: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        if stage == "ml":
+            return {"ml_insights": self.analyzer._ml_insights(result)}
+        if stage == "metrics":
+            return result
+        return {"smart_insights": self.analyzer._smart_insights(result)}
+
+    def _assemble(self, ml_analysis: Dict[str, Any], metrics: Dict[str, Any],
+                  llm_analysis: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        analyzer = self.analyzer
+        if llm_analysis is None:
+            smart_insights = {"status": "pending"}
+            recommendations = {"training_adjustments": analyzer._combine_recommendations(ml_analysis, {})}
+        else:
+            smart_insights = analyzer._smart_insights(llm_analysis)
+            recommendations = {
+                "training_adjustments": analyzer._combine_recommendations(ml_analysis, llm_analysis),
+                "recovery_suggestions": analyzer._extract_recovery_suggestions(llm_analysis),
+                "next_steps": analyzer._generate_next_steps(self.activities, ml_analysis, llm_analysis)
+            }
+
+        return {
+            "summary": metrics["summary"],
+            "ml_insights": analyzer._ml_insights(ml_analysis),
+            "smart_insights": smart_insights,
+            "recommendations": recommendations,
+            "metrics_analysis": metrics["metrics_analysis"],
+            "stage_timings_s": dict(self.stage_timings),
+            "generated_at": datetime.now().isoformat()
+        }
+
 
 class HybridAnalyzer:
-    def __init__(self, ml_analyzer: MLAnalyzer, llm_analyzer: LLMAnalyzer):
+    def __init__(self, ml_analyzer: MLAnalyzer, llm_analyzer: LLMAnalyzer,
+                 executor: Optional[Executor] = None,
+                 training_load_engine: Optional[TrainingLoadEngine] = None,
+                 hr_zone_engine: Optional[HRZoneEngine] = None,
+                 percentile_store: Optional[PercentileStore] = None):
         self.ml_analyzer = ml_analyzer
         self.llm_analyzer = llm_analyzer
+        self.training_load_engine = training_load_engine or TrainingLoadEngine()
+        # Sem engine configurada, o modelo de zonas usa a maior FC registrada como FC máxima
+        self.hr_zone_engine = hr_zone_engine
+        self.percentile_store = percentile_store
+        # None usa o executor padrão do loop (threads)
+        self.executor = executor
 
-    async def analyze_activities(self, activities: List[Activity]) -> Dict[str, Any]:
-        ml_analysis = self.ml_analyzer.analyze_patterns(activities)
-        
-        enriched_context = self._prepare_enriched_context(activities, ml_analysis)
-        
-        llm_analysis = await self.llm_analyzer.analyze_activities(
-            activities=activities,
-            ml_context=enriched_context
-        )
-        
+    def start(self, activities: Union[List[Activity], ActivityFrame],
+              ml_analysis: Optional[Dict[str, Any]] = None) -> HybridAnalysisRun:
+        """Schedules every stage and returns immediately; must be called from a running loop"""
+        return HybridAnalysisRun(self, activities, ml_analysis)
+
+    async def analyze_activities(self, activities: Union[List[Activity], ActivityFrame],
+                                 ml_analysis: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return await self.start(activities, ml_analysis).result()
+
+    def _compute_metrics(self, activities: Union[List[Activity], ActivityFrame]) -> Dict[str, Any]:
+        frame = ActivityFrame.coerce(activities)
         return {
             "summary": {
-                "total_activities": len(activities),
-                "date_range": self._get_date_range(activities),
-                "total_distance": self._calculate_total_distance(activities),
-                "total_duration": self._calculate_total_duration(activities),
-            },
-            "ml_insights": {
-                "patterns": ml_analysis["training_patterns"],
-                "anomalies": ml_analysis["unusual_activities"],
-                "cluster_distribution": ml_analysis["cluster_summary"],
-                "improvement_areas": ml_analysis["improvement_opportunities"]
-            },
-            "smart_insights": {
-                "analysis": llm_analysis["analysis"],
-                "key_findings": self._extract_key_findings(llm_analysis),
+                "total_activities": len(frame),
+                "date_range": self._get_date_range(frame),
+                "total_distance": self._calculate_total_distance(frame),
+                "total_duration": self._calculate_total_duration(frame),
             },
-            "recommendations": {
-                "training_adjustments": self._combine_recommendations(ml_analysis, llm_analysis),
-                "recovery_suggestions": self._extract_recovery_suggestions(llm_analysis),
-                "next_steps": self._generate_next_steps(activities, ml_analysis, llm_analysis)
-            },
-            "metrics_analysis": self._analyze_key_metrics(activities),
-            "generated_at": datetime.now().isoformat()
+            "metrics_analysis": self._analyze_key_metrics(frame)
         }
 
-    def _prepare_enriched_context(self, activities: List[Activity], ml_analysis: Dict) -> Dict:
+    def _ml_insights(self, ml_analysis: Dict) -> Dict:
         return {
-            "activities_summary": self._summarize_activities(activities),
+            "patterns": ml_analysis["training_patterns"],
+            "anomalies": ml_analysis["unusual_activities"],
+            "cluster_distribution": ml_analysis["cluster_summary"],
+            "improvement_areas": ml_analysis["improvement_opportunities"]
+        }
+
+    def _smart_insights(self, llm_analysis: Dict) -> Dict:
+        return {
+            "analysis": llm_analysis["analysis"],
+            "key_findings": self._extract_key_findings(llm_analysis),
+        }
+
+    def _prepare_enriched_context(self, activities: Union[List[Activity], ActivityFrame], ml_analysis: Dict) -> Dict:
+        return {
+            "activities_summary": self._summarize_activities(ActivityFrame.coerce(activities)),
             "ml_patterns": ml_analysis["training_patterns"],
             "detected_anomalies": ml_analysis["unusual_activities"],
             "training_clusters": ml_analysis["cluster_summary"]
         }
 
-    def _summarize_activities(self, activities: List[Activity]) -> Dict:
+    def _summarize_activities(self, frame: ActivityFrame) -> Dict:
         return {
-            "total_activities": len(activities),
-            "avg_distance": sum(a.distance for a in activities) / len(activities),
-            "avg_duration": sum(a.duration for a in activities) / len(activities),
-            "avg_heart_rate": sum(a.heart_rate_avg for a in activities if a.heart_rate_avg) / len(activities),
-            "period": self._get_date_range(activities)
+            "total_activities": len(frame),
+            "avg_distance": frame.mean("distance") or 0,
+            "avg_duration": frame.mean("duration") or 0,
+            "avg_heart_rate": frame.mean("heart_rate_avg") or 0,
+            "period": self._get_date_range(frame)
         }
 
-    def _get_date_range(self, activities: List[Activity]) -> Dict:
-        if not activities:
+    def _get_date_range(self, frame: ActivityFrame) -> Dict:
+        if len(frame) == 0:
             return {"start": None, "end": None}
-        
-        dates = [a.start_time for a in activities]
+
         return {
-            "start": min(dates).isoformat(),
-            "end": max(dates).isoformat()
+            "start": frame.start_time(0).isoformat(),
+            "end": frame.start_time(-1).isoformat()
         }
 
-    def _analyze_key_metrics(self, activities: List[Activity]) -> Dict:
+    def _analyze_key_metrics(self, frame: ActivityFrame) -> Dict:
         return {
-            "pace_trends": self._analyze_pace_trends(activities),
-            "heart_rate_zones": self._analyze_heart_rate_distribution(activities),
-            "training_load": self._calculate_training_load(activities),
-            "recovery_metrics": self._analyze_recovery_metrics(activities)
+            "pace_trends": self._analyze_pace_trends(frame),
+            "heart_rate_zones": self._analyze_heart_rate_distribution(frame),
+            "training_load": self._calculate_training_load(frame),
+            "recovery_metrics": self._analyze_recovery_metrics(frame)
         }
 
-    def _analyze_pace_trends(self, activities: List[Activity]) -> Dict:
-        paces = [a.pace for a in activities if a.pace]
+    def _analyze_pace_trends(self, frame: ActivityFrame) -> Dict:
+        # min/km, em ordem cronológica
+        paces = frame.pace[frame.pace > 0] / 60
         return {
-            "average": sum(paces) / len(paces) if paces else 0,
-            "best": min(paces) if paces else 0,
-            "trend": "improving" if len(paces) > 1 and paces[-1] < paces[0] else "stable"
+            "average": float(paces.mean()) if len(paces) else 0,
+            "best": float(paces.min()) if len(paces) else 0,
+            "trend": "improving" if len(paces) > 1 and paces[-1] < paces[0] else "stable",
+            "latest_faster_than_pct": self._latest_pace_percentile(frame)
         }
 
-    def _analyze_heart_rate_distribution(self, activities: List[Activity]) -> Dict:
-        heart_rates = [a.heart_rate_avg for a in activities if a.heart_rate_avg]
+    def _latest_pace_percentile(self, frame: ActivityFrame) -> Optional[float]:
+        """Share of the athlete's activities of the same type slower than the latest one"""
+        pace = frame.pace
+        with_pace = np.flatnonzero(pace > 0)
+        if not len(with_pace):
+            return None
+        latest = with_pace[-1]
+        activity_type = frame.types[frame.type_codes[latest]]
+        athlete_id = getattr(self.ml_analyzer, "athlete_id", None)
+        store = self.percentile_store
+        if store is not None and store.has_athlete(athlete_id):
+            sketch = store.sketch(athlete_id, activity_type, "pace")
+        else:
+            sketch = SortedSketch(pace[frame.type_codes == frame.type_codes[latest]])
+        rank = sketch.rank(pace[latest:latest + 1])[0]
+        return None if np.isnan(rank) else round(float(100 - rank), 1)
+
+    def _analyze_heart_rate_distribution(self, frame: ActivityFrame) -> Dict:
         return {
-            "average": sum(heart_rates) / len(heart_rates) if heart_rates else 0,
-            "max_recorded": max(heart_rates) if heart_rates else 0,
-            "zones_distribution": self._calculate_hr_zones(heart_rates)
+            "average": frame.mean("heart_rate_avg") or 0,
+            "max_recorded": frame.max("heart_rate_avg") or 0,
+            "zones_distribution": self._calculate_hr_zones(frame)
         }
 
-    def _calculate_hr_zones(self, heart_rates: List[float]) -> Dict:
-        zones = {
-            "zone1": 0,
-            "zone2": 0,
-            "zone3": 0,
-            "zone4": 0,
-            "zone5": 0
-        }
-        #TODO: Lógica para calcular distribuição das zonas
-        return zones
+    def _calculate_hr_zones(self, frame: ActivityFrame) -> Dict:
+        """Tempo (s) em cada zona; sem streams, estimado pela FC média de cada atividade"""
+        engine = self.hr_zone_engine or default_hr_zone_engine(frame.max("heart_rate_max"))
 
-    def _calculate_total_distance(self, activities: List[Activity]) -> float:
-        return sum(a.distance for a in activities)
+        try:
+            return engine.season_distribution(frame)["seconds"]
+        except ValueError as e:
+            logger.warning(f"Could not compute heart rate zones: {str(e)}")
+            return {label: 0 for label in ZONE_LABELS}
 
-    def _calculate_total_duration(self, activities: List[Activity]) -> float:
-        return sum(a.duration for a in activities)
+    def _calculate_total_distance(self, frame: ActivityFrame) -> float:
+        return frame.total("distance")
+
+    def _calculate_total_duration(self, frame: ActivityFrame) -> float:
+        return frame.total("duration")
 
     def _extract_key_findings(self, llm_analysis: Dict) -> List[str]:
         """Extrai os principais achados da análise LLM"""
@@ -149,7 +314,7 @@ class HybridAnalyzer:
             "Focar em melhorar aspectos técnicos identificados"
         ]
 
-    def _analyze_recovery_metrics(self, activities: List[Activity]) -> Dict:
+    def _analyze_recovery_metrics(self, frame: ActivityFrame) -> Dict:
         """Analisa métricas de recuperação"""
         return {
             "recovery_score": "good",
@@ -161,11 +326,6 @@ class HybridAnalyzer:
             ]
         }
 
-    def _calculate_training_load(self, activities: List[Activity]) -> Dict:
-        """Calcula carga de treino"""
-        return {
-            "acute_load": 850,
-            "chronic_load": 780,
-            "training_stress_balance": 70,
-            "status": "produtivo"
-        }
\ No newline at end of file
+    def _calculate_training_load(self, frame: ActivityFrame) -> Dict:
+        """Calcula carga de treino (ATL/CTL/TSB/ACWR) a partir do histórico"""
+        return self.training_load_engine.summary(self.training_load_engine.compute(frame))
@@ -0,0 +1,190 @@
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+import json
+import logging
+import os
+from domain.entities.activity import Activity
+from domain.models.athlete_summary import AthleteSummary
+from infrastructure.ml.model_registry import DEFAULT_ATHLETE_ID
+from infrastructure.repositories.athlete_summary_repository import AthleteSummaryRepository
+from .llm_analyzer import LLMAnalyzer, SYSTEM_MESSAGE
+
+logger = logging.getLogger(__name__)
+
+# Peso das novas atividades nas médias móveis exponenciais do estado
+EWMA_ALPHA = 0.2
+WEEKS_KEPT = 8
+# Limite de atividades buscadas ao procurar a última já resumida
+INCREMENTAL_MAX_ACTIVITIES = int(os.getenv("INCREMENTAL_MAX_ACTIVITIES", 1000))
+
+
+def empty_state() -> Dict[str, Any]:
+    return {
+        "runs": 0,
+        "total_km": 0.0,
+        "total_hours": 0.0,
+        "pace_ewma_s_per_km": None,
+        "heart_rate_ewma": None,
+        "longest_run_km": 0.0,
+        "weekly_km": {},
+        "last_activity": None
+    }
+
+
+def update_rolling_state(state: Optional[Dict[str, Any]], new_activities: List[Activity]) -> Dict[str, Any]:
+    """Folds new activities into the structured state, oldest first"""
+    state = json.loads(json.dumps(state)) if state else empty_state()
+
+    for activity in sorted(new_activities, key=lambda a: a.start_time):
+        km = (activity.distance or 0) / 1000
+        state["runs"] += 1
+        state["total_km"] = round(state["total_km"] + km, 2)
+        state["total_hours"] = round(state["total_hours"] + (activity.duration or 0) / 3600, 2)
+        state["longest_run_km"] = round(max(state["longest_run_km"], km), 2)
+
+        if km > 0 and activity.duration:
+            state["pace_ewma_s_per_km"] = _ewma(state["pace_ewma_s_per_km"], activity.duration / km)
+        if activity.heart_rate_avg:
+            state["heart_rate_ewma"] = _ewma(state["heart_rate_ewma"], activity.heart_rate_avg)
+
+        iso_year, iso_week, _ = activity.start_time.isocalendar()
+        week = f"{iso_year}-W{iso_week:02d}"
+        state["weekly_km"][week] = round(state["weekly_km"].get(week, 0) + km, 2)
+        state["last_activity"] = activity.start_time.isoformat()
+
+    state["weekly_km"] = dict(sorted(state["weekly_km"].items())[-WEEKS_KEPT:])
+    return state
+
+
+def _ewma(previous: Optional[float], value: float) -> float:
+    if previous is None:
+        return round(value, 1)
+    return round(EWMA_ALPHA * value + (1 - EWMA_ALPHA) * previous, 1)
+
+
+class IncrementalSummaryService:
+    """Keeps a rolling LLM summary per athlete.
+
+    Each call sends only the activities that arrived since the previous
+    summary, together with that summary and a structured state computed
+    here, and stores the updated summary. The prompt size therefore stays
+    constant as the history grows.
+
+    The activities passed in must reach back to the previous summary's last
+    activity, otherwise the runs in between are never summarized; the
+    response reports that case as "gap". analyze_pages fetches newest-first
+    pages until it gets there.
+    """
+
+    def __init__(self, llm_analyzer: LLMAnalyzer, summary_repository: AthleteSummaryRepository):
+        self.llm_analyzer = llm_analyzer
+        self.summary_repository = summary_repository
+
+    async def analyze_pages(self, pages: AsyncIterator[List[Activity]],
+                            athlete_id: Optional[str] = None) -> Dict[str, Any]:
+        """Reads newest-first pages until the last summarized activity, then analyzes them"""
+        athlete_id = athlete_id or DEFAULT_ATHLETE_ID
+        record = self.summary_repository.get(athlete_id)
+        activities: List[Activity] = []
+        try:
+            async for page in pages:
+                activities.extend(page)
+                # Sem resumo anterior basta a primeira página
+                if not self._has_gap(record, activities):
+                    break
+        finally:
+            await pages.aclose()
+        return await self._analyze(activities, athlete_id, record)
+
+    async def analyze(self, activities: List[Activity], athlete_id: Optional[str] = None) -> Dict[str, Any]:
+        athlete_id = athlete_id or DEFAULT_ATHLETE_ID
+        return await self._analyze(activities, athlete_id, self.summary_repository.get(athlete_id))
+
+    async def _analyze(self, activities: List[Activity], athlete_id: str,
+                       record: Optional[AthleteSummary]) -> Dict[str, Any]:
+        gap = self._has_gap(record, activities)
+        if gap:
+            logger.warning(
+                f"Activities for athlete {athlete_id} do not reach the last summarized one "
+                f"({record.last_activity_time.isoformat()}); older new runs are missing from the summary"
+            )
+
+        running_activities = self.llm_analyzer._select_running_activities(activities)
+        if record and record.last_activity_time:
+            new_activities = [a for a in running_activities if a.start_time > record.last_activity_time]
+        else:
+            new_activities = running_activities
+
+        if record and not new_activities:
+            return self._response(record, new_activities=0, updated=False, gap=gap)
+        if not new_activities:
+            raise ValueError("No running activities to summarize")
+
+        state = update_rolling_state(record.state if record else None, new_activities)
+        messages = [
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": self._build_user_message(record, state, new_activities)}
+        ]
+        result = await self.llm_analyzer.complete(messages)
+
+        latest = new_activities[0]
+        record = self.summary_repository.save(AthleteSummary(
+            athlete_id=athlete_id,
+            summary=result["analysis"],
+            state=state,
+            last_activity_id=str(latest.id),
+            last_activity_time=latest.start_time,
+            updated_at=datetime.now()
+        ))
+        logger.info(f"Updated rolling summary for athlete {athlete_id} with {len(new_activities)} new activities")
+        return self._response(record, new_activities=len(new_activities), updated=True, gap=gap)
+
+    @staticmethod
+    def _has_gap(record: Optional[AthleteSummary], activities: List[Activity]) -> bool:
+        """True when the activities start after the previous summary's last one"""
+        if record is None or record.last_activity_time is None:
+            return False
+        return all(a.start_time > record.last_activity_time for a in activities)
+
+    def _build_user_message(self, record: Optional[AthleteSummary], state: Dict[str, Any],
+                            new_activities: List[Activity]) -> str:
+        context = self.llm_analyzer._prepare_activity_context(new_activities)
+
+        if record is None:
+            return f"""
+            Write a rolling coaching summary of this athlete's running covering progress, training load,
+            technique and recommendations. It will be updated incrementally as new runs arrive, so keep it
+            self-contained and under 400 words.
+
+            Structured training state (computed, authoritative):
+            {json.dumps(state)}
+
+            Running activities (pipe-separated tables; "-" means not recorded; paces in min:sec/km):
+            {context}
+            """
+
+        return f"""
+            Update the rolling coaching summary below with the new running activities. Keep what still holds,
+            revise what the new runs change, and return the complete updated summary (under 400 words).
+
+            Previous summary (as of {record.last_activity_time.isoformat()}):
+            {record.summary}
+
+            Structured training state including the new runs (computed, authoritative):
+            {json.dumps(state)}
+
+            New running activities since the previous summary (pipe-separated tables; "-" means not recorded):
+            {context}
+            """
+
+    def _response(self, record: AthleteSummary, new_activities: int, updated: bool, gap: bool) -> Dict[str, Any]:
+        return {
+            "athlete_id": record.athlete_id,
+            "analysis": record.summary,
+            "state": record.state,
+            "new_activities": new_activities,
+            "updated": updated,
+            "gap": gap,
+            "last_activity_time": record.last_activity_time.isoformat() if record.last_activity_time else None,
+            "updated_at": record.updated_at.isoformat()
+        }
@@ -1,33 +1,228 @@
+import asyncio
+import json
 import logging
-import requests
-from typing import List, Any
-import openai
 import os
+import time
+from typing import List, Any, AsyncIterator, Dict, Optional, Tuple
 from domain.entities.activity import Activity
+from infrastructure.llm.chat_providers import ChatProvider, get_chat_providers
+from infrastructure.llm.hedged_router import HedgedRouter, get_hedged_router
+from infrastructure.cache.llm_cache import LLMResponseCache, get_llm_cache
+from .context_builder import CompactContextBuilder
 
 logger = logging.getLogger(__name__)
 
+SYSTEM_MESSAGE = """You are an experienced running coach specializing in training data analysis and periodization. 
+            Focus on practical insights and detailed analysis of running metrics including pace, heart rate, cadence, 
+            and training effect. Consider the relationship between these metrics and their impact on performance and recovery. This data is from Garmin device."""
+
+_DEFAULT_CACHE = object()
+
+# "all": consulta todos os provedores; "hedged": primário com hedge no secundário
+ROUTING_MODES = ("all", "hedged")
+
 class LLMAnalyzer:
-    def __init__(self, repository=None):
+    def __init__(self, repository=None, providers: Optional[Dict[str, ChatProvider]] = None,
+                 cache: Optional[LLMResponseCache] = _DEFAULT_CACHE,
+                 context_builder: Optional[CompactContextBuilder] = None,
+                 routing: Optional[str] = None, router: Optional[HedgedRouter] = None):
         self.repository = repository
-        self.client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.xai_api_url = "https://api.x.ai/v1/chat/completions"
-        self.xai_api_key = os.getenv("X_API_KEY")
+        self.context_builder = context_builder or CompactContextBuilder()
+        self.providers = providers if providers is not None else get_chat_providers()
+        # cache=None desativa o cache; por padrão usa o cache compartilhado
+        self.cache = get_llm_cache() if cache is _DEFAULT_CACHE else cache
+        self.routing = routing or os.getenv("LLM_ROUTING", "all")
+        if self.routing not in ROUTING_MODES:
+            raise ValueError(f"Unknown LLM routing mode: {self.routing}")
+        self._router = router
+
+    @property
+    def router(self) -> HedgedRouter:
+        if self._router is None:
+            self._router = get_hedged_router() if self.providers is get_chat_providers() else HedgedRouter(self.providers)
+        return self._router
+
+    async def analyze_activities(self, activities: List[Activity], ml_context: Optional[Dict] = None) -> dict:
+        """Analyze activities with the LLM providers.
+
+        In "all" routing every provider runs concurrently, each with its own
+        timeout; if one fails the other's result is still returned, with the
+        failure listed under "errors". In "hedged" routing only the primary
+        is called unless it is slow or fails (see HedgedRouter).
+        """
+        running_activities = self._select_running_activities(activities)
+        system_message, user_message = self._build_messages(running_activities, ml_context)
+        return await self.complete([
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": user_message}
+        ])
+
+    async def complete(self, messages: List[Dict[str, str]]) -> dict:
+        """Runs an already built prompt through the configured routing and cache"""
+        if self.routing == "hedged":
+            return await self._analyze_hedged(messages)
+
+        names = list(self.providers)
+        outcomes = await asyncio.gather(*(
+            self._call_provider(self.providers[name], messages) for name in names
+        ))
+        results = dict(zip(names, outcomes))
+
+        errors = {name: outcome["error"] for name, outcome in results.items() if "error" in outcome}
+        if len(errors) == len(results):
+            logger.error(f"Error analyzing activities: all LLM providers failed: {errors}")
+            raise RuntimeError(f"All LLM providers failed: {errors}")
+
+        openai_result = results.get("openai", {})
+        xai_result = results.get("xai", {})
+        analysis = {
+            "analysis": openai_result.get("content") or xai_result.get("content"),
+            "analysisXAI": xai_result.get("raw"),
+            "providers": {
+                name: {
+                    "status": "error" if "error" in outcome else "ok",
+                    "latency_ms": outcome["latency_ms"],
+                    "cached": outcome.get("cached", False)
+                }
+                for name, outcome in results.items()
+            }
+        }
+        if errors:
+            analysis["errors"] = errors
+        return analysis
+
+    async def _analyze_hedged(self, messages: List[Dict[str, str]]) -> dict:
+        router = self.router
+        order = [router.primary] + [name for name in self.providers if name != router.primary]
+
+        start = time.perf_counter()
+        if self.cache is not None:
+            for name in order:
+                provider = self.providers[name]
+                cached = await self.cache.aget(self.cache.make_key(name, provider.model, messages, provider.temperature))
+                if cached is not None:
+                    return self._routed_result(name, cached, {
+                        "status": "ok", "cached": True, "latency_ms": round((time.perf_counter() - start) * 1000, 1)
+                    })
 
-    async def analyze_activities(self, activities: List[Activity]) -> dict:
-        """Analyze activities using LLM"""
         try:
-            running_activities = [a for a in activities if a.activity_type.lower() == "running"]
-            running_activities = running_activities[:10]
-            
-            context = self._prepare_activity_context(running_activities)
-            
-            system_message = """You are an experienced running coach specializing in training data analysis and periodization. 
-            Focus on practical insights and detailed analysis of running metrics including pace, heart rate, cadence, 
-            and training effect. Consider the relationship between these metrics and their impact on performance and recovery. This data is from Garmin device."""
-            
-            user_message = f"""
-            Analyze the last {len(running_activities)} running activities and provide:
+            result = await router.complete(messages)
+        except Exception as e:
+            logger.error(f"Error analyzing activities: {str(e)}")
+            raise
+
+        provider = self.providers[result["provider"]]
+        if self.cache is not None:
+            await self.cache.aset(
+                self.cache.make_key(provider.name, provider.model, messages, provider.temperature),
+                {"content": result["content"], "raw": result["raw"]}
+            )
+
+        analysis = self._routed_result(result["provider"], result, {
+            "status": "ok", "cached": False, "latency_ms": result["latency_ms"], "hedged": result["hedged"]
+        })
+        if result["errors"]:
+            analysis["errors"] = result["errors"]
+        return analysis
+
+    def _routed_result(self, name: str, result: Dict[str, Any], status: Dict[str, Any]) -> dict:
+        return {
+            "analysis": result["content"],
+            "analysisXAI": result["raw"] if name == "xai" else None,
+            "routed_to": name,
+            "providers": {name: status}
+        }
+
+    async def stream_analysis(self, activities: List[Activity], provider: str = "openai",
+                              ml_context: Optional[Dict] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Streams the analysis of one provider.
+
+        Yields {"type": "token", "content": ...} events as the completion
+        arrives and a final {"type": "done", "metadata": ...} event. A cached
+        analysis is replayed as a single token.
+        """
+        chat_provider = self.providers[provider]
+        running_activities = self._select_running_activities(activities)
+        system_message, user_message = self._build_messages(running_activities, ml_context)
+        messages = [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": user_message}
+        ]
+
+        start = time.perf_counter()
+        cache_key = None
+        cached = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(chat_provider.name, chat_provider.model, messages, chat_provider.temperature)
+            cached = await self.cache.aget(cache_key)
+
+        if cached is not None:
+            yield {"type": "token", "content": cached["content"]}
+            content = cached["content"]
+        else:
+            parts = []
+            async for token in chat_provider.stream(messages):
+                parts.append(token)
+                yield {"type": "token", "content": token}
+            content = "".join(parts)
+
+            # Só chega aqui se o stream terminou: respostas interrompidas não vão para o cache
+            if cache_key is not None:
+                await self.cache.aset(cache_key, {
+                    "content": content,
+                    "raw": {
+                        "model": chat_provider.model,
+                        "choices": [{"message": {"role": "assistant", "content": content}}]
+                    }
+                })
+
+        yield {
+            "type": "done",
+            "metadata": {
+                "provider": chat_provider.name,
+                "model": chat_provider.model,
+                "cached": cached is not None,
+                "activities_analyzed": len(running_activities),
+                "characters": len(content),
+                "latency_ms": round((time.perf_counter() - start) * 1000, 1)
+            }
+        }
+
+    async def _call_provider(self, provider: ChatProvider, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(provider.name, provider.model, messages, provider.temperature)
+            cached = await self.cache.aget(cache_key)
+            if cached is not None:
+                return {**cached, "cached": True, "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+        try:
+            result = await asyncio.wait_for(provider.complete(messages), timeout=provider.timeout)
+            if cache_key is not None:
+                await self.cache.aset(cache_key, result)
+        except asyncio.TimeoutError:
+            result = {"error": f"timed out after {provider.timeout:.0f}s"}
+        except Exception as e:
+            result = {"error": str(e)}
+
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        if "error" in result:
+            logger.warning(f"LLM provider {provider.name} failed: {result['error']}")
+        return result
+
+    def _select_running_activities(self, activities: List[Activity]) -> List[Activity]:
+        """Running activities, newest first (the context builder enforces the size budget)"""
+        running_activities = [a for a in activities if a.activity_type.lower() == "running"]
+        return sorted(running_activities, key=lambda a: a.start_time, reverse=True)
+
+    def _build_messages(self, running_activities: List[Activity],
+                        ml_context: Optional[Dict] = None) -> Tuple[str, str]:
+        """Builds the (system, user) prompt for the given running activities"""
+        context = self._prepare_activity_context(running_activities)
+
+        user_message = f"""
+            Analyze these {len(running_activities)} running activities and provide:
             
             1. Progress:
                - Pace evolution and consistency
@@ -53,54 +248,20 @@ class LLMAnalyzer:
                - Technical improvements
                - Suggested next goals
             
-            Data from running activities:
+            Data from running activities (pipe-separated tables; "-" means not recorded;
+            paces in min:sec/km; splits are per-km paces):
             {context}
             
             Please provide a detailed but practical analysis focusing on actionable insights.
             """
 
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.xai_api_key}"
-            }
-            payload = {
-                "messages": [
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": user_message}
-                ],
-                "model": "grok-beta",
-                "stream": False,
-                "temperature": 0
-            }
-
-            xAIResponse = requests.post(
-                self.xai_api_url,
-                headers=headers,
-                json=payload
-            )
-
-            xAIResponse.raise_for_status()
-            analysisXAI = xAIResponse.json()
-
-            # Chamada para o GPT-4
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": user_message}
-                ]
-            )
+        if ml_context:
+            user_message += f"""
+            Patterns detected by our ML models (clusters, anomalies and summary):
+            {json.dumps(ml_context, default=str)}
+            """
 
-            analysis_result = response.choices[0].message.content
-
-            return {
-                "analysis": analysis_result,
-                "analysisXAI": analysisXAI
-            }
-            
-        except Exception as e:
-            logger.error(f"Error analyzing activities: {str(e)}")
-            raise
+        return SYSTEM_MESSAGE, user_message
 
     def _calculate_pace(self, duration_seconds: float, distance_meters: float) -> str:
         """Calcula e formata o pace em min:sec/km"""
@@ -117,111 +278,4 @@ class LLMAnalyzer:
         return f"{minutes}:{seconds:02d}/km"
 
     def _prepare_activity_context(self, activities: List[Activity]) -> str:
-        if not activities:
-            return "No activities found"
-        
-        def format_pace(speed_ms: float) -> str:
-            """Converte velocidade em m/s para pace em min/km"""
-            if not speed_ms or speed_ms <= 0:
-                return "N/A"
-            try:
-                minutes_per_km = (1000 / speed_ms) / 60
-                minutes = int(minutes_per_km)
-                seconds = int((minutes_per_km - minutes) * 60)
-                return f"{minutes}:{seconds:02d}/km"
-            except:
-                return "N/A"
-
-        def format_duration(seconds: float) -> str:
-            """convert duration in seconds to HH:MM:SS format"""
-            if not seconds:
-                return "N/A"
-            
-            hours = int(seconds // 3600)
-            minutes = int((seconds % 3600) // 60)
-            secs = int(seconds % 60)
-            
-            if hours > 0:
-                return f"{hours}:{minutes:02d}:{secs:02d}"
-            return f"{minutes:02d}:{secs:02d}"
-
-        def safe_format(value: Any, format_str: str = '{}') -> str:
-            """Format value with None handling"""
-            if value is None or (isinstance(value, (int, float)) and value <= 0):
-                return "N/A"
-            try:
-                return format_str.format(value)
-            except:
-                return "N/A"
-
-        activities_text = []
-        for idx, activity in enumerate(reversed(activities)):
-            activity_lines = [
-                f"Running {idx+1} ({activity.start_time.strftime('%Y-%m-%d %H:%M')}):"
-            ]
-            
-            activity_name = getattr(activity, 'activity_name', None)
-            if activity_name:
-                activity_lines.append(f"- Activity Name: {activity_name}")
-                
-            activity_lines.extend([
-                f"- Duration: {format_duration(activity.duration)} (Moving: {format_duration(activity.moving_duration)})",
-                f"- Distance: {(activity.distance / 1000):.2f} km",
-                f"- Average Pace: {activity.pace_formatted}",
-                f"- Best Pace: {format_pace(activity.max_speed)}",
-                f"- Heart Rate: {safe_format(activity.heart_rate_avg, '{:.0f}')} bpm (max: {safe_format(activity.heart_rate_max, '{:.0f}')} bpm)",
-                f"- Cadence: {safe_format(activity.cadence_avg, '{:.0f}')} spm (max: {safe_format(activity.cadence_max, '{:.0f}')} spm)",
-                f"- Elevation: gain {safe_format(activity.elevation_gain, '{:.0f}')}m, loss {safe_format(activity.elevation_loss, '{:.0f}')}m (min: {safe_format(activity.min_elevation, '{:.0f}')}m, max: {safe_format(activity.max_elevation, '{:.0f}')}m)"
-            ])
-
-            if activity.training_effect is not None:
-                activity_lines.append(
-                    f"- Training Effect: {safe_format(activity.training_effect)} "
-                    f"({activity.training_effect_label or 'N/A'}) - "
-                    f"{activity.training_effect_message or 'N/A'}"
-                )
-
-            if activity.anaerobic_effect is not None:
-                activity_lines.append(f"- Anaerobic Effect: {safe_format(activity.anaerobic_effect)}")
-
-            if activity.vo2_max is not None:
-                activity_lines.append(f"- VO2 Max: {safe_format(activity.vo2_max)}")
-
-            if activity.power_avg is not None:
-                activity_lines.append(
-                    f"- Power: {safe_format(activity.power_avg, '{:.0f}')}W "
-                    f"(max: {safe_format(activity.power_max, '{:.0f}')}W)"
-                )
-
-            running_dynamics_attrs = ['stride_length', 'ground_contact_time', 'vertical_oscillation', 'vertical_ratio']
-            if any(getattr(activity, attr, None) is not None for attr in running_dynamics_attrs):
-                activity_lines.extend([
-                    "- Running Dynamics:",
-                    f"  *  Length: {safe_format(activity.stride_length, '{:.1f}')}cm",
-                    f"  * Ground Contact Time: {safe_format(activity.ground_contact_time, '{:.0f}')}ms",
-                    f"  * Vertical Oscillation: {safe_format(activity.vertical_oscillation, '{:.1f}')}cm",
-                    f"  * Vertical Ratio: {safe_format(activity.vertical_ratio, '{:.1f}')}%"
-                ])
-
-            if activity.intensity_minutes:
-                moderate = activity.intensity_minutes.get('moderate', 0)
-                vigorous = activity.intensity_minutes.get('vigorous', 0)
-                activity_lines.append(
-                    f"- Intensity Minutes: {moderate} moderate, {vigorous} vigorous"
-                )
-
-            if activity.steps:
-                activity_lines.append(f"- Steps: {activity.steps}")
-
-            # Splits
-            if activity.splits:
-                activity_lines.append("\nKilometer Splits:")
-                for i, split in enumerate(activity.splits):
-                    activity_lines.append(
-                        f"  Km {i+1}: {format_pace(split.get('pace'))} "
-                        f"| Elevation: +{safe_format(split.get('elevation_gain'), '{:.0f}')}m"
-                    )
-
-            activities_text.append("\n".join(activity_lines))
-
-        return "\n\n".join(activities_text)
\ No newline at end of file
+        return self.context_builder.build(activities)
@@ -1,25 +1,31 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Union
 import numpy as np
 from sklearn.preprocessing import StandardScaler
 from sklearn.cluster import KMeans
 from sklearn.ensemble import IsolationForest
-import joblib
-import os
 from domain.models.activity import Activity
+from domain.entities.activity_frame import ActivityFrame
 from infrastructure.repositories.activity_repository import ActivityRepository
+from infrastructure.ml.model_registry import ModelRegistry, get_model_registry
+
+# Incrementar sempre que _extract_features mudar: modelos salvos com outro
+# esquema são descartados e retreinados
+FEATURE_SCHEMA_VERSION = 1
+FEATURE_COLUMNS = ("duration", "distance", "heart_rate_avg", "heart_rate_max", "calories", "elevation_gain")
 
 class MLAnalyzer:
-    def __init__(self, activity_repository: ActivityRepository):
+    def __init__(self, activity_repository: ActivityRepository, athlete_id: Optional[str] = None,
+                 model_registry: Optional[ModelRegistry] = None):
         self.activity_repository = activity_repository
+        self.athlete_id = athlete_id
+        self.model_registry = model_registry or get_model_registry()
         self.scaler = StandardScaler()
         self.clustering_model = KMeans(n_clusters=5)
         self.anomaly_detector = IsolationForest(contamination=0.1)
-        self.model_path = "models/"
-        os.makedirs(self.model_path, exist_ok=True)
 
     def train_models(self):
-        """Trains models with historical data"""
-        activities = self.activity_repository.get_all()
+        """Trains models with the athlete's historical data"""
+        activities = self.activity_repository.get_by_athlete(self.athlete_id)
         if not activities:
             raise ValueError("No activities found for training")
 
@@ -36,22 +42,25 @@ class MLAnalyzer:
         return "Models trained successfully"
 
     def load_models(self):
-        """Loads previously trained models"""
-        try:
-            self.scaler = joblib.load(f"{self.model_path}scaler.joblib")
-            self.clustering_model = joblib.load(f"{self.model_path}clustering.joblib")
-            self.anomaly_detector = joblib.load(f"{self.model_path}anomaly_detector.joblib")
-            return True
-        except FileNotFoundError:
+        """Loads the athlete's current models from the registry"""
+        models = self.model_registry.load(self.athlete_id, FEATURE_SCHEMA_VERSION)
+        if models is None:
             return False
 
+        self.scaler = models["scaler"]
+        self.clustering_model = models["clustering"]
+        self.anomaly_detector = models["anomaly_detector"]
+        return True
+
     def _save_models(self):
-        """Saves trained models"""
-        joblib.dump(self.scaler, f"{self.model_path}scaler.joblib")
-        joblib.dump(self.clustering_model, f"{self.model_path}clustering.joblib")
-        joblib.dump(self.anomaly_detector, f"{self.model_path}anomaly_detector.joblib")
+        """Saves trained models as a new version for the athlete"""
+        self.model_registry.save(self.athlete_id, {
+            "scaler": self.scaler,
+            "clustering": self.clustering_model,
+            "anomaly_detector": self.anomaly_detector
+        }, FEATURE_SCHEMA_VERSION)
 
-    def analyze_patterns(self, activities: List[Activity]) -> Dict[str, Any]:
+    def analyze_patterns(self, activities: Union[List[Activity], ActivityFrame]) -> Dict[str, Any]:
         """Analyzes training patterns using trained models"""
         if not self.load_models():
             self.train_models()
@@ -69,20 +78,10 @@ class MLAnalyzer:
             "cluster_summary": self._get_cluster_summary(clusters)
         }
 
-    def _extract_features(self, activities: List[Activity]) -> np.ndarray:
-        """Extracts relevant features from activities"""
-        features = []
-        for activity in activities:
-            feature_vector = [
-                float(activity.duration or 0),
-                float(activity.distance or 0),
-                float(activity.heart_rate_avg or 0),
-                float(activity.heart_rate_max or 0),
-                float(activity.calories or 0),
-                float(activity.elevation_gain or 0)
-            ]
-            features.append(feature_vector)
-        return np.array(features)
+    def _extract_features(self, activities: Union[List[Activity], ActivityFrame]) -> np.ndarray:
+        """Extracts relevant features from activities, in the order given"""
+        frame = ActivityFrame.coerce(activities, sort=False, columns=FEATURE_COLUMNS)
+        return np.column_stack([np.nan_to_num(frame[name], nan=0.0) for name in FEATURE_COLUMNS])
 
     def _identify_improvement_areas(self, scaled_features: np.ndarray) -> List[str]:
         """Identifies areas for improvement based on training patterns"""
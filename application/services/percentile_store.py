@@ -0,0 +1,200 @@
+from datetime import date
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+import logging
+import os
+import numpy as np
+from domain.entities.activity import Activity
+from domain.entities.activity_frame import ActivityFrame
+from infrastructure.ml.model_registry import DEFAULT_ATHLETE_ID
+from .training_load import EPOCH_ORDINAL, TrainingLoadEngine
+
+logger = logging.getLogger(__name__)
+
+RANKED_METRICS = ("pace", "heart_rate", "effort", "meters_per_beat")
+METRIC_COLUMNS = ("duration", "distance", "heart_rate_avg", "power_avg", "elevation_gain")
+ALL_CONDITIONS = "all"
+# Faixas de temperatura (°C) usadas como condição da atividade
+HOT_FROM = float(os.getenv("PERCENTILE_HOT_FROM", 25))
+COLD_BELOW = float(os.getenv("PERCENTILE_COLD_BELOW", 5))
+
+
+def percentile_rank(sorted_values: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Share (0-100) of the sorted values below each value, ties counted as half; NaN when unknown"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(sorted_values) == 0:
+        return np.full(values.shape, np.nan)
+    below = np.searchsorted(sorted_values, values, side="left")
+    not_above = np.searchsorted(sorted_values, values, side="right")
+    ranks = (below + not_above) / 2 / len(sorted_values) * 100
+    return np.where(np.isnan(values), np.nan, ranks)
+
+
+def activity_metrics(activities: Union[List[Activity], ActivityFrame], load_engine: TrainingLoadEngine,
+                     hr_max: Optional[float]) -> Dict[str, np.ndarray]:
+    """Per-activity metric arrays used for baselines and ranking, in the order given; missing values are NaN"""
+    frame = ActivityFrame.coerce(activities, sort=False, columns=METRIC_COLUMNS)
+    # Zero conta como não registrado
+    duration, distance, heart_rate, power, elevation_gain = (
+        np.where(frame[name] == 0, np.nan, frame[name]) for name in METRIC_COLUMNS
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pace = np.where(distance > 0, duration / (distance / 1000), np.nan)          # s/km
+        # Metros percorridos por batimento: eficiência aeróbica
+        meters_per_beat = distance / (duration / 60 * heart_rate)
+        speed = distance / duration
+
+    effort = load_engine.activity_loads(duration, heart_rate, power, hr_max)
+    return {
+        "pace": pace,
+        "heart_rate": heart_rate,
+        "duration": duration,
+        "distance": distance,
+        "elevation_gain": elevation_gain,
+        "speed": speed,
+        "meters_per_beat": meters_per_beat,
+        "effort": np.where(effort > 0, effort, np.nan)
+    }
+
+
+def conditions(temperature: np.ndarray) -> np.ndarray:
+    """Weather condition bucket of each activity, "" when the temperature is unknown"""
+    return np.select(
+        [np.isnan(temperature), temperature >= HOT_FROM, temperature < COLD_BELOW],
+        ["", "hot", "cold"],
+        default="mild"
+    )
+
+
+def month_index(days: np.ndarray) -> np.ndarray:
+    """year * 12 + month - 1 of each date ordinal"""
+    months_since_epoch = (days - EPOCH_ORDINAL).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    return months_since_epoch + 1970 * 12
+
+
+class SortedSketch:
+    """Exact quantile sketch: a sorted array of every value seen.
+
+    New values are buffered and merged into the sorted array on the next
+    query, so a batch of inserts costs one sort and lookups are
+    np.searchsorted, O(log n). Sketches are merged by concatenating their
+    arrays, which is what multi-window queries use.
+    """
+
+    def __init__(self, values: Optional[np.ndarray] = None):
+        self._sorted = np.sort(values[~np.isnan(values)]) if values is not None else np.zeros(0)
+        self._pending: List[np.ndarray] = []
+
+    def add(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self._pending.append(values)
+
+    @property
+    def values(self) -> np.ndarray:
+        if self._pending:
+            self._sorted = np.sort(np.concatenate([self._sorted] + self._pending))
+            self._pending = []
+        return self._sorted
+
+    def __len__(self) -> int:
+        return len(self._sorted) + sum(len(p) for p in self._pending)
+
+    def rank(self, values: np.ndarray) -> np.ndarray:
+        return percentile_rank(self.values, values)
+
+    def quantile(self, q: float) -> float:
+        values = self.values
+        return float(np.quantile(values, q)) if len(values) else np.nan
+
+    @classmethod
+    def merge(cls, sketches: Iterable["SortedSketch"]) -> "SortedSketch":
+        merged = cls()
+        merged._pending = [sketch.values for sketch in sketches if len(sketch)]
+        return merged
+
+
+SketchKey = Tuple[str, str, str, int]   # (tipo de atividade, métrica, condição, mês)
+
+
+class PercentileStore:
+    """Per-athlete sketches of each metric by activity type, condition and month.
+
+    Each activity goes into the sketch of its month for the "all" condition
+    and for its weather condition. A query merges the month sketches of the
+    requested window once and caches the merged sketch until new activities
+    arrive, so repeated percentile lookups are O(log n).
+    """
+
+    def __init__(self, load_engine: Optional[TrainingLoadEngine] = None):
+        self.load_engine = load_engine or TrainingLoadEngine()
+        self.sketches: Dict[str, Dict[SketchKey, SortedSketch]] = {}
+        self.hr_max: Dict[str, float] = {}
+        self._merged: Dict[Tuple, SortedSketch] = {}
+
+    def has_athlete(self, athlete_id: Optional[str] = None) -> bool:
+        return (athlete_id or DEFAULT_ATHLETE_ID) in self.sketches
+
+    def add(self, activities: Union[List[Activity], ActivityFrame], athlete_id: Optional[str] = None) -> None:
+        """Adds activities at ingest; any order, duplicates are the caller's concern"""
+        if len(activities) == 0:
+            return
+        athlete_id = athlete_id or DEFAULT_ATHLETE_ID
+        frame = ActivityFrame.coerce(activities, sort=False, columns=METRIC_COLUMNS + ("heart_rate_max", "temperature"))
+        # A carga usa a maior FC já vista do atleta no momento da ingestão
+        observed = frame.max("heart_rate_max") or 0
+        hr_max = self.load_engine.hr_max or max(self.hr_max.get(athlete_id, 0), observed) or None
+        if hr_max:
+            self.hr_max[athlete_id] = hr_max
+
+        metrics = activity_metrics(frame, self.load_engine, hr_max)
+        sketches = self.sketches.setdefault(athlete_id, {})
+        months = month_index(frame.day)
+        condition = conditions(frame["temperature"])
+        for code, activity_type in enumerate(frame.types):
+            of_type = frame.type_codes == code
+            groups = [(ALL_CONDITIONS, of_type)] + [(name, of_type & (condition == name)) for name in ("hot", "mild", "cold")]
+            for group_condition, rows in groups:
+                for month in np.unique(months[rows]):
+                    selected = rows & (months == month)
+                    for metric in RANKED_METRICS:
+                        key = (activity_type, metric, group_condition, int(month))
+                        sketches.setdefault(key, SortedSketch()).add(metrics[metric][selected])
+
+        self._merged = {key: sketch for key, sketch in self._merged.items() if key[0] != athlete_id}
+
+    def sketch(self, athlete_id: Optional[str], activity_type: str, metric: str,
+               condition: Optional[str] = None, months: Optional[int] = None,
+               today: Optional[date] = None) -> SortedSketch:
+        """Merged sketch of the last `months` calendar months (all history when None)"""
+        athlete_id = athlete_id or DEFAULT_ATHLETE_ID
+        condition = condition or ALL_CONDITIONS
+        today = today or date.today()
+        first_month = None if months is None else today.year * 12 + today.month - months
+        cache_key = (athlete_id, activity_type, metric, condition, first_month)
+
+        merged = self._merged.get(cache_key)
+        if merged is None:
+            merged = SortedSketch.merge(
+                sketch for (kind, name, cond, month), sketch in self.sketches.get(athlete_id, {}).items()
+                if kind == activity_type and name == metric and cond == condition
+                and (first_month is None or month >= first_month)
+            )
+            self._merged[cache_key] = merged
+        return merged
+
+    def rank(self, athlete_id: Optional[str], activity_type: str, metric: str, values: np.ndarray,
+             condition: Optional[str] = None, months: Optional[int] = None) -> np.ndarray:
+        """Percentile (0-100) of each value within the athlete's history"""
+        return self.sketch(athlete_id, activity_type, metric, condition, months).rank(values)
+
+    def median(self, athlete_id: Optional[str], activity_type: str, metric: str,
+               condition: Optional[str] = None, months: Optional[int] = None) -> float:
+        return self.sketch(athlete_id, activity_type, metric, condition, months).quantile(0.5)
+
+
+@lru_cache()
+def get_percentile_store() -> PercentileStore:
+    """Percentile sketches shared by the process, filled at ingest and on first use per athlete"""
+    return PercentileStore()
@@ -0,0 +1,178 @@
+from typing import Any, Dict, List, Optional
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SPLIT_METRICS = ("pace_s_km", "pace_fade_s_km", "negative_split_ratio", "pace_cv", "grade_adjusted_pace_s_km")
+
+
+def _minetti_cost(grade: np.ndarray) -> np.ndarray:
+    """Energy cost of running (J/kg/m) at a grade, Minetti et al. (2002)"""
+    g = np.clip(grade, -0.45, 0.45)
+    return 155.4 * g ** 5 - 30.4 * g ** 4 - 43.3 * g ** 3 + 46.3 * g ** 2 + 19.5 * g + 3.6
+
+
+FLAT_COST = float(_minetti_cost(np.zeros(1))[0])
+
+
+class SplitArrays:
+    """Splits of many activities as flat arrays with offsets.
+
+    The splits of activity i are rows offsets[i]:offsets[i + 1] of each
+    array. Splits without distance or duration are dropped when loading.
+    """
+
+    def __init__(self, activity_ids: List[Any], offsets: np.ndarray, distance: np.ndarray,
+                 duration: np.ndarray, elevation_gain: np.ndarray):
+        self.activity_ids = activity_ids
+        self.offsets = offsets
+        self.distance = distance
+        self.duration = duration
+        self.elevation_gain = elevation_gain
+
+    @classmethod
+    def from_activities(cls, activities: List[Any]) -> "SplitArrays":
+        """Loads `splits` of Activity entities or stored rows (JSON column) in one pass"""
+        split_lists = [
+            [s for s in (getattr(a, "splits", None) or []) if (s.get("distance") or 0) > 0 and (s.get("duration") or 0) > 0]
+            for a in activities
+        ]
+        lengths = np.fromiter((len(splits) for splits in split_lists), dtype=np.int64, count=len(split_lists))
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        total = int(offsets[-1])
+
+        def column(key: str) -> np.ndarray:
+            return np.fromiter(
+                (split.get(key) or 0.0 for splits in split_lists for split in splits),
+                dtype=np.float64, count=total
+            )
+
+        return cls(
+            activity_ids=[getattr(a, "activity_id", None) or a.id for a in activities],
+            offsets=offsets,
+            distance=column("distance"),
+            duration=column("duration"),
+            elevation_gain=column("elevation_gain")
+        )
+
+    def __len__(self) -> int:
+        return len(self.activity_ids)
+
+    @property
+    def counts(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def owners(self) -> np.ndarray:
+        """Index of the activity of each split"""
+        return np.repeat(np.arange(len(self)), self.counts)
+
+
+class SplitAnalyticsEngine:
+    """Pacing metrics of every activity from its splits, vectorized over all splits at once.
+
+    Per-activity sums are taken with np.bincount over the split owners, so
+    the cost is a handful of passes over the flat arrays regardless of how
+    the splits are distributed among activities:
+
+    - pace_s_km: overall pace from the splits;
+    - pace_fade_s_km: distance-weighted slope of split pace against distance
+      (seconds per km lost per km run; negative means speeding up);
+    - negative_split_ratio: second-half pace over first-half pace, halves by
+      distance; below 1 is a negative split;
+    - pace_cv: distance-weighted coefficient of variation of split pace;
+    - grade_adjusted_pace_s_km: pace with each split's climb converted to
+      flat-ground effort with Minetti's cost curve. Splits only carry the
+      ascent, so descents are not credited.
+
+    Activities with fewer than two splits get NaN for the shape metrics.
+    """
+
+    def compute(self, arrays: SplitArrays) -> Dict[str, np.ndarray]:
+        n = len(arrays)
+        if n == 0:
+            return {metric: np.zeros(0) for metric in SPLIT_METRICS}
+
+        owner = arrays.owners()
+        counts = arrays.counts
+
+        def per_activity(values: np.ndarray) -> np.ndarray:
+            return np.bincount(owner, weights=values, minlength=n)
+
+        distance_km = arrays.distance / 1000
+        pace = arrays.duration / distance_km                               # s/km de cada parcial
+        total_km = per_activity(distance_km)
+        total_s = per_activity(arrays.duration)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            overall_pace = total_s / total_km
+
+            # Posição (km) do centro de cada parcial dentro da sua atividade
+            cumulative = np.cumsum(distance_km)
+            start_of_activity = np.concatenate(([0.0], cumulative))[arrays.offsets[:-1]]
+            center = cumulative - distance_km / 2 - start_of_activity[owner]
+
+            # Regressão ponderada pela distância: pace ~ centro
+            w = distance_km
+            mean_x = per_activity(w * center) / total_km
+            mean_y = overall_pace
+            dx = center - mean_x[owner]
+            sxx = per_activity(w * dx ** 2)
+            sxy = per_activity(w * dx * (pace - mean_y[owner]))
+            fade = np.where(sxx > 0, sxy / sxx, np.nan)
+
+            variance = per_activity(w * (pace - mean_y[owner]) ** 2) / total_km
+            cv = np.sqrt(variance) / overall_pace
+
+            second_half = center >= (total_km / 2)[owner]
+            first_km = per_activity(np.where(second_half, 0.0, distance_km))
+            first_s = per_activity(np.where(second_half, 0.0, arrays.duration))
+            ratio = ((total_s - first_s) / (total_km - first_km)) / (first_s / first_km)
+
+            grade = arrays.elevation_gain / arrays.distance
+            flat_equivalent_km = per_activity(distance_km * _minetti_cost(grade) / FLAT_COST)
+            gap = total_s / flat_equivalent_km
+
+        single = counts < 2
+        return {
+            "pace_s_km": overall_pace,
+            "pace_fade_s_km": np.where(single, np.nan, fade),
+            "negative_split_ratio": np.where(single, np.nan, ratio),
+            "pace_cv": np.where(single, np.nan, cv),
+            "grade_adjusted_pace_s_km": gap
+        }
+
+    def feature_matrix(self, arrays: SplitArrays) -> np.ndarray:
+        """Metrics as a (activities, len(SPLIT_METRICS)) matrix for ML models"""
+        metrics = self.compute(arrays)
+        return np.column_stack([metrics[name] for name in SPLIT_METRICS]) if len(arrays) else np.zeros((0, len(SPLIT_METRICS)))
+
+    def records(self, arrays: SplitArrays, metrics: Optional[Dict[str, np.ndarray]] = None) -> List[Dict[str, Any]]:
+        """Per-activity metrics as JSON-friendly dicts, NaN as None"""
+        metrics = metrics or self.compute(arrays)
+        counts = arrays.counts
+        rounded = {name: np.round(values, 3) for name, values in metrics.items()}
+        return [
+            {
+                "activity_id": activity_id,
+                "splits": int(counts[i]),
+                **{name: None if np.isnan(values[i]) else float(values[i]) for name, values in rounded.items()}
+            }
+            for i, activity_id in enumerate(arrays.activity_ids)
+        ]
+
+    def summary(self, arrays: SplitArrays) -> Dict[str, Any]:
+        """Dashboard view: per-activity records plus aggregates over all runs with splits"""
+        metrics = self.compute(arrays)
+        ratio = metrics["negative_split_ratio"]
+        with_splits = ~np.isnan(ratio)
+        aggregates = {
+            f"median_{name}": None if not with_splits.any() else round(float(np.nanmedian(values[with_splits])), 3)
+            for name, values in metrics.items()
+        }
+        return {
+            "activities": self.records(arrays, metrics),
+            "activities_with_splits": int(with_splits.sum()),
+            "negative_split_share": round(float((ratio[with_splits] < 1).mean()), 3) if with_splits.any() else None,
+            **aggregates
+        }
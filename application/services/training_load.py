@@ -0,0 +1,210 @@
+from datetime import date
+from typing import Any, Dict, List, Optional, Union
+import logging
+import os
+import numpy as np
+from scipy.signal import lfilter
+from domain.entities.activity import Activity
+from domain.entities.activity_frame import ActivityFrame
+
+logger = logging.getLogger(__name__)
+
+ATL_DAYS = 7
+CTL_DAYS = 42
+ACWR_ACUTE_DAYS = 7
+ACWR_CHRONIC_DAYS = 28
+# Dias são contados a partir de 1970-01-01; toordinal() é bem mais barato que converter para datetime64
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+LOAD_COLUMNS = ("duration", "heart_rate_avg", "heart_rate_max", "power_avg")
+
+
+def _decay(time_constant: float) -> float:
+    """Daily smoothing factor of an exponentially weighted load with the given time constant"""
+    return 1 - np.exp(-1 / time_constant)
+
+
+def _ewma(daily_load: np.ndarray, alpha: float) -> np.ndarray:
+    # y[t] = y[t-1] + alpha * (x[t] - y[t-1]) como filtro IIR de primeira ordem
+    return lfilter([alpha], [1, -(1 - alpha)], daily_load)
+
+
+def _day_number(value) -> int:
+    return value.toordinal() - EPOCH_ORDINAL
+
+
+class TrainingLoadState:
+    """Last day of a training-load series, enough to extend it one activity at a time"""
+
+    def __init__(self, day: int, atl: float, ctl: float, recent_loads: Optional[List[float]] = None,
+                 hr_max: Optional[float] = None):
+        self.day = day
+        self.atl = atl
+        self.ctl = ctl
+        # FC máxima usada no TRIMP: a maior do histórico até aqui, como em compute()
+        self.hr_max = hr_max
+        # Cargas diárias dos últimos ACWR_CHRONIC_DAYS dias, a última é `day`
+        self.recent_loads = np.zeros(ACWR_CHRONIC_DAYS) if recent_loads is None else np.asarray(recent_loads, dtype=np.float64)
+
+    @property
+    def acwr(self) -> Optional[float]:
+        chronic = self.recent_loads.mean()
+        if chronic <= 0:
+            return None
+        return float(self.recent_loads[-ACWR_ACUTE_DAYS:].mean() / chronic)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"day": self.day, "atl": self.atl, "ctl": self.ctl, "recent_loads": self.recent_loads.tolist(),
+                "hr_max": self.hr_max}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TrainingLoadState":
+        return cls(data["day"], data["atl"], data["ctl"], data["recent_loads"], data.get("hr_max"))
+
+
+class TrainingLoadEngine:
+    """Training load, fitness and fatigue from an activity history.
+
+    Each activity is scored with power-based TSS when it has average power
+    and an FTP is known, otherwise with Banister's TRIMP from duration and
+    average heart rate. Scores are summed per calendar day and smoothed
+    into acute (ATL) and chronic (CTL) load with exponential decay; TSB is
+    yesterday's CTL minus ATL and ACWR the rolling 7-day over 28-day mean.
+    """
+
+    def __init__(self, hr_rest: Optional[float] = None, hr_max: Optional[float] = None,
+                 ftp: Optional[float] = None, sex: str = "male",
+                 atl_days: int = ATL_DAYS, ctl_days: int = CTL_DAYS):
+        self.hr_rest = hr_rest or float(os.getenv("TRAINING_LOAD_HR_REST", 60))
+        self.hr_max = hr_max
+        self.ftp = ftp
+        # Coeficientes do TRIMP de Banister
+        self.trimp_a, self.trimp_b = (0.86, 1.67) if sex == "female" else (0.64, 1.92)
+        self.atl_alpha = _decay(atl_days)
+        self.ctl_alpha = _decay(ctl_days)
+
+    def activity_loads(self, duration: np.ndarray, heart_rate: np.ndarray, power: np.ndarray,
+                       hr_max: Optional[float] = None) -> np.ndarray:
+        """Vectorized load of each activity; NaN inputs mean not recorded, unscored activities get 0"""
+        hr_max = hr_max or self.hr_max
+        loads = np.zeros(len(duration))
+
+        if hr_max and hr_max > self.hr_rest:
+            reserve = np.clip((heart_rate - self.hr_rest) / (hr_max - self.hr_rest), 0, 1)
+            trimp = duration / 60 * reserve * self.trimp_a * np.exp(self.trimp_b * reserve)
+            loads = np.where(np.isnan(trimp), 0, trimp)
+
+        if self.ftp:
+            intensity = power / self.ftp
+            tss = duration / 3600 * intensity ** 2 * 100
+            loads = np.where(np.isnan(tss), loads, tss)
+
+        return loads
+
+    def compute(self, activities: Union[List[Activity], ActivityFrame], end: Optional[date] = None) -> Dict[str, Any]:
+        """Daily load, ATL, CTL, TSB and ACWR from the first activity up to `end` (default today)"""
+        if len(activities) == 0:
+            return {}
+
+        frame = ActivityFrame.coerce(activities, sort=False, columns=LOAD_COLUMNS)
+        days = frame.day - EPOCH_ORDINAL
+        # Zero conta como não registrado, como nas listas de atividades
+        duration, heart_rate, power = (
+            np.where(frame[name] == 0, np.nan, frame[name]) for name in ("duration", "heart_rate_avg", "power_avg")
+        )
+        hr_max = self.hr_max or frame.max("heart_rate_max") or None
+
+        loads = self.activity_loads(duration, heart_rate, power, hr_max)
+
+        first_day = int(days.min())
+        last_day = max(int(days.max()), _day_number(end or date.today()))
+        daily_load = np.bincount(days - first_day, weights=loads, minlength=last_day - first_day + 1)
+
+        atl = _ewma(daily_load, self.atl_alpha)
+        ctl = _ewma(daily_load, self.ctl_alpha)
+        tsb = np.concatenate(([0.0], ctl[:-1] - atl[:-1]))
+
+        cumulative = np.concatenate(([0.0], np.cumsum(daily_load)))
+        index = np.arange(1, len(daily_load) + 1)
+        acute = (cumulative[index] - cumulative[np.maximum(index - ACWR_ACUTE_DAYS, 0)]) / ACWR_ACUTE_DAYS
+        chronic = (cumulative[index] - cumulative[np.maximum(index - ACWR_CHRONIC_DAYS, 0)]) / ACWR_CHRONIC_DAYS
+        acwr = np.divide(acute, chronic, out=np.full_like(acute, np.nan), where=chronic > 0)
+
+        return {
+            "first_day": first_day,
+            "hr_max": hr_max,
+            "daily_load": daily_load,
+            "atl": atl,
+            "ctl": ctl,
+            "tsb": tsb,
+            "acwr": acwr,
+            "unscored_activities": int(np.count_nonzero(loads == 0))
+        }
+
+    def state(self, series: Dict[str, Any]) -> TrainingLoadState:
+        """State at the last day of a computed series"""
+        recent = series["daily_load"][-ACWR_CHRONIC_DAYS:]
+        recent_loads = np.concatenate((np.zeros(ACWR_CHRONIC_DAYS - len(recent)), recent))
+        last_day = series["first_day"] + len(series["daily_load"]) - 1
+        return TrainingLoadState(last_day, float(series["atl"][-1]), float(series["ctl"][-1]), recent_loads,
+                                 series.get("hr_max"))
+
+    def update(self, state: TrainingLoadState, activity: Activity, hr_max: Optional[float] = None) -> TrainingLoadState:
+        """Adds one activity to the state in O(1), without recomputing the history.
+
+        Activities older than the state's last day cannot be folded in and
+        require a full compute(). Without a configured hr_max the activity is
+        scored with the running history maximum kept in the state, the same
+        one compute() uses; when an activity raises that maximum, compute()
+        would also rescore the older activities, so the series drift until
+        the next full compute().
+        """
+        day = _day_number(activity.start_time)
+        if day < state.day:
+            raise ValueError("Activity is older than the training-load state; recompute the series")
+
+        running_max = max(filter(None, (state.hr_max, activity.heart_rate_max)), default=None)
+        load = float(self.activity_loads(
+            np.array([activity.duration or np.nan]),
+            np.array([activity.heart_rate_avg or np.nan]),
+            np.array([getattr(activity, "power_avg", None) or np.nan]),
+            hr_max or self.hr_max or running_max
+        )[0])
+
+        # Dias sem atividade entre o estado e a nova atividade apenas decaem as cargas
+        # (no mesmo dia, gap == 0, o filtro é linear e basta somar a contribuição da nova carga)
+        gap = day - state.day
+        atl = state.atl * (1 - self.atl_alpha) ** gap + self.atl_alpha * load
+        ctl = state.ctl * (1 - self.ctl_alpha) ** gap + self.ctl_alpha * load
+
+        recent_loads = state.recent_loads.copy()
+        if gap > 0:
+            recent_loads = np.concatenate((recent_loads[min(gap, ACWR_CHRONIC_DAYS):], np.zeros(min(gap, ACWR_CHRONIC_DAYS))))
+        recent_loads[-1] += load
+        return TrainingLoadState(day, atl, ctl, recent_loads, running_max)
+
+    def summary(self, series: Dict[str, Any]) -> Dict[str, Any]:
+        """Current values in the shape used by the analysis responses"""
+        if not series:
+            return {"acute_load": 0, "chronic_load": 0, "training_stress_balance": 0, "acwr": None, "status": "sem dados"}
+
+        acwr = series["acwr"][-1]
+        return {
+            "acute_load": round(float(series["atl"][-1]), 1),
+            "chronic_load": round(float(series["ctl"][-1]), 1),
+            "training_stress_balance": round(float(series["tsb"][-1]), 1),
+            "acwr": None if np.isnan(acwr) else round(float(acwr), 2),
+            "status": self._status(acwr),
+            "unscored_activities": series["unscored_activities"]
+        }
+
+    @staticmethod
+    def _status(acwr: float) -> str:
+        if np.isnan(acwr):
+            return "sem carga recente"
+        if acwr > 1.5:
+            return "sobrecarga"
+        if acwr > 1.3:
+            return "atenção"
+        if acwr >= 0.8:
+            return "produtivo"
+        return "destreinando"
@@ -1,31 +1,105 @@
+from typing import Dict, List, Optional, Union
 from domain.entities.activity import Activity
+from domain.entities.activity_frame import ActivityFrame
+from .trend_engine import TrendEngine, TrendState
+
+# |t| acima disso indica mudança significativa na inclinação semanal (~95% com 10 graus de liberdade)
+SIGNIFICANT_T = 2.2
 
 class TrendAnalyzer:
-    def analyze_weekly_trends(self, activities: list[Activity]) -> dict:
-        """Analyze weekly trends"""
+    def __init__(self, engine: Optional[TrendEngine] = None):
+        self.engine = engine or TrendEngine()
+
+    def analyze_weekly_trends(self, activities: Union[List[Activity], ActivityFrame],
+                              state: Optional[TrendState] = None) -> dict:
+        """Analyze weekly trends; a maintained TrendState avoids rebuilding from the activities"""
+        if state is None:
+            state = self.engine.build_state(activities)
+        return self.analyze_summary(self.engine.weekly_summary(state))
+
+    def analyze_many(self, states: Dict[str, TrendState]) -> Dict[str, dict]:
+        """Weekly trends of many athletes in one batch"""
+        summaries = self.engine.weekly_summaries(list(states.values()))
+        return {athlete_id: self.analyze_summary(summary) for athlete_id, summary in zip(states, summaries)}
+
+    def analyze_summary(self, summary: dict) -> dict:
         return {
-            "volume_trend": self._analyze_volume_trend(activities),
-            "intensity_distribution": self._analyze_intensity_distribution(activities),
-            "recovery_pattern": self._analyze_recovery_pattern(activities),
-            "suggested_adjustments": self._generate_adjustments(activities)
+            "volume_trend": self._analyze_volume_trend(summary),
+            "intensity_distribution": self._analyze_intensity_distribution(summary),
+            "recovery_pattern": self._analyze_recovery_pattern(summary),
+            "suggested_adjustments": self._generate_adjustments(summary),
+            "windows": summary["windows"]
         }
 
-    def _analyze_volume_trend(self, activities: list[Activity]) -> dict:
+    def _analyze_volume_trend(self, summary: dict) -> dict:
         """Analyze volume trends of activities"""
-        # Implementar lógica para analisar tendências de volume
-        return {"trend": "stable", "details": "Volume de treino está estável"}
+        slope = summary["weekly_slope"]["distance_km"]
+        t_stat = summary["weekly_slope_t"]["distance_km"]
+
+        if abs(t_stat) < SIGNIFICANT_T:
+            trend, details = "stable", "Volume de treino está estável nas últimas 12 semanas"
+        elif slope > 0:
+            trend, details = "increasing", f"Volume aumentando cerca de {slope:.1f} km por semana"
+        else:
+            trend, details = "decreasing", f"Volume diminuindo cerca de {abs(slope):.1f} km por semana"
+
+        return {
+            "trend": trend,
+            "details": details,
+            "weekly_change_km": slope,
+            "t_stat": t_stat,
+            "acute_chronic_ratio": summary["acute_chronic_volume"]
+        }
 
-    def _analyze_intensity_distribution(self, activities: list[Activity]) -> dict:
+    def _analyze_intensity_distribution(self, summary: dict) -> dict:
         """Analyze intensity distribution of activities"""
-        # Implementar lógica para analisar distribuição de intensidade
-        return {"distribution": "balanced", "details": "Distribuição de intensidade equilibrada"}
+        hard_share = summary["hard_share_28d"]
 
-    def _analyze_recovery_pattern(self, activities: list[Activity]) -> dict:
+        if hard_share is None:
+            distribution, details = "unknown", "Sem treinos nas últimas 4 semanas"
+        elif hard_share <= 0.2:
+            distribution, details = "polarized", "Maior parte do tempo em baixa intensidade (próximo de 80/20)"
+        elif hard_share <= 0.35:
+            distribution, details = "balanced", "Distribuição de intensidade equilibrada"
+        else:
+            distribution, details = "too_hard", "Muito tempo em alta intensidade nas últimas 4 semanas"
+
+        return {"distribution": distribution, "details": details, "hard_share_28d": hard_share}
+
+    def _analyze_recovery_pattern(self, summary: dict) -> dict:
         """Analyze recovery patterns between workouts"""
-        # Implementar lógica para analisar padrões de recuperação
-        return {"pattern": "adequate", "details": "Padrões de recuperação adequados"}
+        rest_7 = summary["rest_days"]["7d"]
+        streak = summary["longest_streak_28d"]
+
+        if rest_7 == 0 or streak >= 10:
+            pattern, details = "insufficient", f"Poucos dias de descanso: {streak} dias seguidos de treino no último mês"
+        elif rest_7 >= 5:
+            pattern, details = "excessive", f"{rest_7} dias sem treino na última semana"
+        else:
+            pattern, details = "adequate", "Padrões de recuperação adequados"
+
+        return {
+            "pattern": pattern,
+            "details": details,
+            "rest_days": summary["rest_days"],
+            "longest_streak_28d": streak
+        }
 
-    def _generate_adjustments(self, activities: list[Activity]) -> dict:
+    def _generate_adjustments(self, summary: dict) -> dict:
         """Generate suggested adjustments based on trends"""
-        # Implementar lógica para sugerir ajustes
-        return {"adjustments": "none", "details": "Nenhum ajuste necessário"}
\ No newline at end of file
+        adjustments = []
+        ratio = summary["acute_chronic_volume"]
+        if ratio is not None and ratio > 1.5:
+            adjustments.append("Reduzir o volume desta semana: carga aguda bem acima da média do mês")
+        elif ratio is not None and ratio < 0.8:
+            adjustments.append("Retomar o volume gradualmente: semana bem abaixo da média do mês")
+
+        hard_share = summary["hard_share_28d"]
+        if hard_share is not None and hard_share > 0.35:
+            adjustments.append("Trocar um treino forte por um rodagem leve")
+        if summary["rest_days"]["7d"] == 0 or summary["longest_streak_28d"] >= 10:
+            adjustments.append("Incluir pelo menos um dia de descanso por semana")
+
+        if not adjustments:
+            return {"adjustments": "none", "details": "Nenhum ajuste necessário"}
+        return {"adjustments": adjustments, "details": f"{len(adjustments)} ajuste(s) sugerido(s)"}
@@ -0,0 +1,208 @@
+from datetime import date
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Union
+import logging
+import os
+import numpy as np
+from domain.entities.activity import Activity
+from domain.entities.activity_frame import ActivityFrame
+
+logger = logging.getLogger(__name__)
+
+METRICS = ("distance_km", "duration_h", "hard_h", "sessions")
+DISTANCE, DURATION, HARD, SESSIONS = range(len(METRICS))
+WINDOWS = (7, 28, 90)
+TREND_WEEKS = 12
+# Treino "forte": FC média a partir desta fração da FC máxima (limite inferior da zona 4)
+HARD_HR_FRACTION = 0.80
+TREND_COLUMNS = ("distance", "duration", "heart_rate_avg", "heart_rate_max")
+
+
+def linear_trend(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Least-squares slope and its t-statistic along the last axis, for any leading batch shape"""
+    n = values.shape[-1]
+    x = np.arange(n, dtype=np.float64) - (n - 1) / 2
+    sxx = (x ** 2).sum()
+    centered = values - values.mean(axis=-1, keepdims=True)
+    slope = (centered * x).sum(axis=-1) / sxx
+    residuals = centered - slope[..., None] * x
+    stderr = np.sqrt((residuals ** 2).sum(axis=-1) / max(n - 2, 1) / sxx)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_stat = np.where(stderr > 0, slope / stderr, 0.0)
+    return slope, t_stat
+
+
+class TrendState:
+    """Daily training metrics of one athlete in a ring buffer with running window sums.
+
+    Slot `day % capacity` holds the metrics of that day. The sums of the
+    7/28/90-day windows ending at the latest day are kept up to date, so
+    adding an activity or moving to a new day is O(1) per elapsed day and
+    the standard windows are read without summing.
+    """
+
+    def __init__(self, capacity: Optional[int] = None, hr_max: Optional[float] = None):
+        self.capacity = capacity or int(os.getenv("TREND_HISTORY_DAYS", 371))
+        if self.capacity < max(max(WINDOWS), TREND_WEEKS * 7):
+            raise ValueError("Trend history must cover the longest window")
+        self.values = np.zeros((self.capacity, len(METRICS)))
+        self.sums = np.zeros((len(WINDOWS), len(METRICS)))
+        self.last_day: Optional[int] = None
+        self.hr_max = hr_max
+        self.observed_hr_max = 0.0
+
+    def advance_to(self, day: int) -> None:
+        """Moves the latest day forward; days without activities count as rest days"""
+        if self.last_day is None:
+            self.last_day = day
+            return
+        gap = day - self.last_day
+        if gap <= 0:
+            return
+        if gap >= self.capacity:
+            self.values[:] = 0
+            self.sums[:] = 0
+        else:
+            for current in range(self.last_day + 1, day + 1):
+                for i, window in enumerate(WINDOWS):
+                    # O dia que sai da janela é subtraído da soma corrente
+                    self.sums[i] -= self.values[(current - window) % self.capacity]
+                self.values[current % self.capacity] = 0
+        self.last_day = day
+
+    def add(self, activity: Activity) -> None:
+        day = activity.start_time.toordinal()
+        self.advance_to(day)
+        age = self.last_day - day
+        if age >= self.capacity:
+            return
+
+        if activity.heart_rate_max:
+            self.observed_hr_max = max(self.observed_hr_max, activity.heart_rate_max)
+        hr_max = self.hr_max or self.observed_hr_max
+        hours = (activity.duration or 0) / 3600
+        hard = bool(hr_max and activity.heart_rate_avg and activity.heart_rate_avg >= HARD_HR_FRACTION * hr_max)
+
+        row = np.array([(activity.distance or 0) / 1000, hours, hours if hard else 0.0, 1.0])
+        self.values[day % self.capacity] += row
+        for i, window in enumerate(WINDOWS):
+            if age < window:
+                self.sums[i] += row
+
+    def add_many(self, activities: List[Activity]) -> bool:
+        """Folds newly stored activities in, oldest first, in O(1) each.
+
+        Returns False without changing the state when the result would not
+        match build_state over the whole history: an activity older than
+        the buffer holds, or (without a configured hr_max) one that raises
+        the observed max HR and so reclassifies the hard hours already
+        counted. The caller then rebuilds the state.
+        """
+        if self.last_day is not None:
+            oldest = min((a.start_time.toordinal() for a in activities), default=self.last_day)
+            if self.last_day - oldest >= self.capacity:
+                return False
+            new_max = max((a.heart_rate_max or 0 for a in activities), default=0)
+            if not self.hr_max and new_max > self.observed_hr_max:
+                return False
+        for activity in sorted(activities, key=lambda a: a.start_time):
+            self.add(activity)
+        return True
+
+    def window(self, days: int) -> np.ndarray:
+        """Metric totals over the last `days` days; O(1) for the standard windows"""
+        if days in WINDOWS:
+            return self.sums[WINDOWS.index(days)].copy()
+        return self.daily(days).sum(axis=0)
+
+    def daily(self, days: int) -> np.ndarray:
+        """Daily metrics of the last `days` days, oldest first, shape (days, metrics)"""
+        if days > self.capacity:
+            raise ValueError(f"Only {self.capacity} days of history are kept")
+        if self.last_day is None:
+            return np.zeros((days, len(METRICS)))
+        slots = np.arange(self.last_day - days + 1, self.last_day + 1) % self.capacity
+        return self.values[slots]
+
+    def rest_days(self, days: int) -> int:
+        return int(days - np.count_nonzero(self.daily(days)[:, SESSIONS]))
+
+
+class TrendEngine:
+    """Weekly trend summaries computed from TrendState buffers, one athlete or many at once"""
+
+    def build_state(self, activities: Union[List[Activity], ActivityFrame], hr_max: Optional[float] = None) -> TrendState:
+        """State filled from a whole history at once; equivalent to adding the activities in order"""
+        frame = ActivityFrame.coerce(activities, columns=TREND_COLUMNS)
+        state = TrendState(hr_max=hr_max)
+        if len(frame) == 0:
+            return state
+
+        # Máxima observada antes, para que a classificação de intensidade não dependa da ordem
+        state.observed_hr_max = frame.max("heart_rate_max") or 0.0
+        hr_max = state.hr_max or state.observed_hr_max
+        days = frame.day
+        state.last_day = int(days.max())
+        age = state.last_day - days
+        kept = age < state.capacity
+
+        hours = np.nan_to_num(frame["duration"]) / 3600
+        hard = (frame["heart_rate_avg"] >= HARD_HR_FRACTION * hr_max) if hr_max else np.zeros(len(frame), dtype=bool)
+        rows = np.column_stack((np.nan_to_num(frame["distance"]) / 1000, hours, np.where(hard, hours, 0.0), np.ones(len(frame))))
+
+        np.add.at(state.values, days[kept] % state.capacity, rows[kept])
+        for i, window in enumerate(WINDOWS):
+            state.sums[i] = rows[age < window].sum(axis=0)
+        return state
+
+    def weekly_summaries(self, states: List[TrendState], today: Optional[date] = None) -> List[Dict[str, Any]]:
+        """Summaries of many athletes; slopes over the last TREND_WEEKS weeks are computed as one batch"""
+        if not states:
+            return []
+        today_day = (today or date.today()).toordinal()
+        for state in states:
+            state.advance_to(today_day)
+
+        days = TREND_WEEKS * 7
+        daily = np.stack([state.daily(days) for state in states])           # (atletas, dias, métricas)
+        weekly = daily.reshape(len(states), TREND_WEEKS, 7, len(METRICS)).sum(axis=2)
+        slope, t_stat = linear_trend(np.moveaxis(weekly, 1, -1))            # (atletas, métricas)
+        sums = np.stack([state.sums for state in states])                   # (atletas, janelas, métricas)
+        active = daily[:, :, SESSIONS] > 0
+
+        return [
+            self._summary(sums[i], slope[i], t_stat[i], active[i])
+            for i in range(len(states))
+        ]
+
+    def weekly_summary(self, state: TrendState, today: Optional[date] = None) -> Dict[str, Any]:
+        return self.weekly_summaries([state], today)[0]
+
+    def _summary(self, sums: np.ndarray, slope: np.ndarray, t_stat: np.ndarray, active: np.ndarray) -> Dict[str, Any]:
+        week, month, quarter = sums
+        rest_7 = int(7 - active[-7:].sum())
+        rest_28 = int(28 - active[-28:].sum())
+
+        # Maior sequência de dias seguidos com treino nas últimas 4 semanas
+        recent = np.concatenate(([0], active[-28:].astype(np.int8), [0]))
+        edges = np.flatnonzero(np.diff(recent))
+        longest_streak = int((edges[1::2] - edges[::2]).max()) if len(edges) else 0
+
+        return {
+            "windows": {
+                f"{window}d": {metric: round(float(value), 2) for metric, value in zip(METRICS, totals)}
+                for window, totals in zip(WINDOWS, sums)
+            },
+            "weekly_slope": {metric: round(float(value), 3) for metric, value in zip(METRICS, slope)},
+            "weekly_slope_t": {metric: round(float(value), 2) for metric, value in zip(METRICS, t_stat)},
+            "rest_days": {"7d": rest_7, "28d": rest_28},
+            "longest_streak_28d": longest_streak,
+            "acute_chronic_volume": round(float(week[DURATION] / (month[DURATION] / 4)), 2) if month[DURATION] > 0 else None,
+            "hard_share_28d": round(float(month[HARD] / month[DURATION]), 3) if month[DURATION] > 0 else None
+        }
+
+
+@lru_cache()
+def get_trend_states() -> Dict[str, TrendState]:
+    """Trend buffers per athlete shared by the process"""
+    return {}
@@ -0,0 +1,298 @@
+"""Local stand-ins for the LLM providers and Garmin Connect, for offline load tests.
+
+Usage:
+    python -m benchmarks.fake_services llm --port 8101 --latency-ms 800 --jitter-ms 300 --rate-limit-rate 0.05
+    python -m benchmarks.fake_services garmin --port 8102 --activities 500 --latency-ms 150
+
+Point the application at them with:
+    XAI_API_URL=http://localhost:8101/v1/chat/completions
+    OPENAI_BASE_URL=http://localhost:8101/v1
+    GARMIN_BASE_URL=http://localhost:8102
+
+Fault injection can be changed while running with PUT /_faults, e.g.
+    curl -X PUT localhost:8101/_faults -H 'content-type: application/json' -d '{"error_rate": 0.2}'
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from benchmarks.synthetic_activities import generate_activities
+
+# Vocabulário usado para montar respostas de tamanho controlado
+COACHING_WORDS = (
+    "your aerobic base is improving steadily and the easy runs are at the right intensity "
+    "keep the long run below ninety minutes for now and add strides twice a week "
+    "heart rate drift on tempo days suggests more recovery between hard sessions"
+).split()
+
+
+class FaultInjector:
+    """Latency, error and rate-limit injection shared by the fake services"""
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0,
+                 rate_limit_rate: float = 0, retry_after_s: int = 1, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after_s = retry_after_s
+        self.rng = random.Random(seed)
+        self.counters = {"requests": 0, "errors": 0, "rate_limited": 0}
+
+    def settings(self) -> Dict[str, Any]:
+        return {
+            "latency_ms": self.latency_ms,
+            "jitter_ms": self.jitter_ms,
+            "error_rate": self.error_rate,
+            "rate_limit_rate": self.rate_limit_rate,
+            "retry_after_s": self.retry_after_s
+        }
+
+    def update(self, settings: Dict[str, Any]) -> None:
+        for key, value in settings.items():
+            if key in self.settings():
+                setattr(self, key, int(value) if key == "retry_after_s" else float(value))
+
+    async def delay(self) -> None:
+        # Latência com cauda longa: lognormal em torno da média configurada
+        if self.latency_ms <= 0:
+            return
+        sigma = self.jitter_ms / self.latency_ms if self.jitter_ms else 0
+        latency = self.latency_ms * self.rng.lognormvariate(0, sigma) if sigma else self.latency_ms
+        await asyncio.sleep(latency / 1000)
+
+    def failure(self) -> Optional[JSONResponse]:
+        """Returns an error response to send instead of the real one, if one is injected"""
+        self.counters["requests"] += 1
+        roll = self.rng.random()
+        if roll < self.rate_limit_rate:
+            self.counters["rate_limited"] += 1
+            return JSONResponse(
+                status_code=429,
+                content={"error": {"message": "Too Many Requests", "type": "rate_limit_exceeded"}},
+                headers={"Retry-After": str(self.retry_after_s)}
+            )
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.counters["errors"] += 1
+            return JSONResponse(
+                status_code=500,
+                content={"error": {"message": "Injected server error", "type": "server_error"}}
+            )
+        return None
+
+
+def _add_fault_routes(app: FastAPI, faults: FaultInjector) -> None:
+    @app.get("/_faults")
+    async def get_faults():
+        return {**faults.settings(), "counters": faults.counters}
+
+    @app.put("/_faults")
+    async def update_faults(request: Request):
+        faults.update(await request.json())
+        return {**faults.settings(), "counters": faults.counters}
+
+
+def create_llm_app(faults: FaultInjector, tokens: int = 200, token_interval_ms: float = 10) -> FastAPI:
+    """OpenAI-compatible chat completions, streaming and non-streaming"""
+    app = FastAPI(title="Fake LLM")
+    _add_fault_routes(app, faults)
+
+    def answer(seed: str) -> List[str]:
+        rng = random.Random(seed)
+        return [rng.choice(COACHING_WORDS) + " " for _ in range(tokens)]
+
+    @app.post("/v1/chat/completions")
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        payload = await request.json()
+        failure = faults.failure()
+        await faults.delay()
+        if failure is not None:
+            return failure
+
+        model = payload.get("model", "fake-model")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        pieces = answer(json.dumps(payload.get("messages", [])))
+
+        if not payload.get("stream"):
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(pieces).strip()},
+                    "finish_reason": "stop"
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(pieces), "total_tokens": len(pieces)}
+            }
+
+        async def chunks():
+            def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+                data = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+                }
+                return f"data: {json.dumps(data)}\n\n"
+
+            yield chunk({"role": "assistant", "content": ""})
+            for piece in pieces:
+                await asyncio.sleep(token_interval_ms / 1000)
+                yield chunk({"content": piece})
+            yield chunk({}, finish_reason="stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    return app
+
+
+def _to_garmin_payload(activity, activity_id: int) -> Dict[str, Any]:
+    """Synthetic activity in the shape returned by Garmin's activity list"""
+    return {
+        "activityId": activity_id,
+        "activityName": activity.activity_name,
+        "startTimeLocal": activity.start_time.strftime("%Y-%m-%d %H:%M:%S"),
+        "activityType": {"typeKey": "running"},
+        "duration": activity.duration,
+        "movingDuration": activity.moving_duration,
+        "distance": activity.distance,
+        "averageSpeed": activity.average_speed,
+        "maxSpeed": activity.max_speed,
+        "averageHR": activity.heart_rate_avg,
+        "maxHR": activity.heart_rate_max,
+        "calories": activity.calories,
+        "elevationGain": activity.elevation_gain,
+        "elevationLoss": activity.elevation_loss,
+        "averageRunningCadenceInStepsPerMinute": activity.cadence_avg,
+        "maxRunningCadenceInStepsPerMinute": activity.cadence_max,
+        "aerobicTrainingEffect": activity.training_effect,
+        "splitSummaries": [
+            {
+                "splitType": "RWD_RUN",
+                "distance": split["distance"],
+                "duration": split["duration"],
+                "averageSpeed": split["pace"],
+                "totalAscent": split["elevation_gain"],
+                "maxSpeed": split["max_speed"]
+            }
+            for split in activity.splits or []
+        ]
+    }
+
+
+def _heart_rate_stream(activity: Dict[str, Any], interval_s: int = 5) -> Dict[str, Any]:
+    """Per-sample metrics in Garmin's details format, drifting around the average HR and speed"""
+    rng = random.Random(activity["activityId"])
+    start_ms = int(datetime.strptime(activity["startTimeLocal"], "%Y-%m-%d %H:%M:%S").timestamp() * 1000)
+    samples = int(activity["duration"] // interval_s)
+    average = activity["averageHR"] or 140
+    rows = []
+    distance = 0.0
+    for i in range(samples):
+        # Aquecimento nos primeiros 10% e deriva cardíaca leve até o fim
+        progress = i / max(samples - 1, 1)
+        heart_rate = average * (0.85 + 0.15 * min(progress * 10, 1)) + 6 * progress + rng.gauss(0, 3)
+        rows.append({"metrics": [start_ms + i * interval_s * 1000, round(heart_rate), round(distance, 1)]})
+        distance += activity["averageSpeed"] * interval_s * rng.uniform(0.85, 1.15)
+    return {
+        "metricDescriptors": [
+            {"metricsIndex": 0, "key": "directTimestamp"},
+            {"metricsIndex": 1, "key": "directHeartRate"},
+            {"metricsIndex": 2, "key": "sumDistance"}
+        ],
+        "activityDetailMetrics": rows
+    }
+
+
+def create_garmin_app(faults: FaultInjector, activity_count: int = 500, seed: int = 42) -> FastAPI:
+    """Garmin Connect activity endpoints backed by a synthetic history, newest first"""
+    app = FastAPI(title="Fake Garmin Connect")
+    _add_fault_routes(app, faults)
+
+    history = generate_activities(activity_count, seed=seed, with_splits=True, start=datetime(2024, 1, 1))
+    activities = [_to_garmin_payload(a, 10_000_000 + i) for i, a in enumerate(history)][::-1]
+    by_id = {a["activityId"]: a for a in activities}
+
+    @app.post("/auth/login")
+    async def login():
+        failure = faults.failure()
+        await faults.delay()
+        if failure is not None:
+            return failure
+        return {"access_token": uuid.uuid4().hex, "token_type": "Bearer"}
+
+    @app.get("/activitylist-service/activities/search/activities")
+    async def list_activities(start: int = 0, limit: int = 20):
+        failure = faults.failure()
+        await faults.delay()
+        if failure is not None:
+            return failure
+        return activities[start:start + limit]
+
+    @app.get("/activity-service/activity/{activity_id}/details")
+    async def activity_details(activity_id: int):
+        failure = faults.failure()
+        await faults.delay()
+        if failure is not None:
+            return failure
+        if activity_id not in by_id:
+            return JSONResponse(status_code=404, content={"error": {"message": "Activity not found"}})
+        return {**by_id[activity_id], **_heart_rate_stream(by_id[activity_id])}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake LLM or Garmin server for load tests")
+    parser.add_argument("service", choices=["llm", "garmin"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0, help="Fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--tokens", type=int, default=200, help="LLM: words per completion")
+    parser.add_argument("--token-interval-ms", type=float, default=10, help="LLM: delay between streamed chunks")
+    parser.add_argument("--activities", type=int, default=500, help="Garmin: size of the synthetic history")
+    args = parser.parse_args()
+
+    faults = FaultInjector(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after_s=args.retry_after,
+        seed=args.seed
+    )
+    if args.service == "llm":
+        app = create_llm_app(faults, tokens=args.tokens, token_interval_ms=args.token_interval_ms)
+        port = args.port or 8101
+    else:
+        app = create_garmin_app(faults, activity_count=args.activities, seed=args.seed or 42)
+        port = args.port or 8102
+
+    uvicorn.run(app, host=args.host, port=port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Benchmark suite for the ML analysis path.
+
+Usage:
+    python -m benchmarks.ml_benchmark --sizes 1000 10000 100000 1000000
+
+Each history size runs in its own forked process so peak RSS is reported per
+size. Results are written as JSON under benchmarks/results/ for comparison
+between runs.
+"""
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import sklearn
+from application.services.hybrid_analyzer import HybridAnalyzer
+from application.services.llm_analyzer import LLMAnalyzer
+from application.services.ml_analyzer import MLAnalyzer
+from benchmarks.synthetic_activities import generate_activities
+from infrastructure.ml.model_registry import ModelRegistry
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+class InMemoryActivityRepository:
+    """Serves the generated history to MLAnalyzer.train_models"""
+
+    def __init__(self, activities):
+        self.activities = activities
+
+    def get_all(self):
+        return self.activities
+
+    def get_by_athlete(self, athlete_id):
+        return self.activities
+
+
+class StubLLMAnalyzer(LLMAnalyzer):
+    """LLMAnalyzer that answers instantly, so only our own code is measured"""
+
+    def __init__(self):
+        pass
+
+    async def analyze_activities(self, activities, ml_context=None):
+        return {
+            "analysis": "Benchmark stub analysis",
+            "key_findings": ["Consistent volume", "Stable heart rate"]
+        }
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _measure(name: str, count: int, fn: Callable[[], Any]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    return {
+        "stage": name,
+        "wall_time_s": round(elapsed, 6),
+        "throughput_per_s": round(count / elapsed, 2) if elapsed > 0 else None,
+        "peak_rss_mb": round(_peak_rss_mb(), 1)
+    }
+
+
+def run_size(size: int, seed: int) -> Dict[str, Any]:
+    """Runs every stage for one history size and returns its measurements"""
+    warnings.filterwarnings("ignore")
+    stages: List[Dict[str, Any]] = []
+
+    generation_start = time.perf_counter()
+    activities = generate_activities(size, seed=seed)
+    generation_time = time.perf_counter() - generation_start
+    baseline_rss = _peak_rss_mb()
+
+    registry = ModelRegistry(tempfile.mkdtemp(prefix="ml_benchmark_"))
+    analyzer = MLAnalyzer(InMemoryActivityRepository(activities), athlete_id="benchmark", model_registry=registry)
+    hybrid = HybridAnalyzer(analyzer, StubLLMAnalyzer())
+
+    stages.append(_measure("feature_extraction", size, lambda: analyzer._extract_features(activities)))
+    stages.append(_measure("training", size, analyzer.train_models))
+    stages.append(_measure("scoring", size, lambda: analyzer.analyze_patterns(activities)))
+    stages.append(_measure(
+        "hybrid_end_to_end", size,
+        lambda: asyncio.run(hybrid.analyze_activities(activities))
+    ))
+
+    return {
+        "size": size,
+        "generation_time_s": round(generation_time, 3),
+        "rss_after_generation_mb": round(baseline_rss, 1),
+        "stages": stages
+    }
+
+
+def _run_size_in_child(size: int, seed: int, queue) -> None:
+    try:
+        queue.put(run_size(size, seed))
+    except Exception as e:
+        queue.put({"size": size, "error": f"{type(e).__name__}: {str(e)}"})
+
+
+def _environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "scikit_learn": sklearn.__version__,
+        "git_commit": commit
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ML analysis path")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="JSON output file (default: benchmarks/results/<timestamp>.json)")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("fork")
+    results = []
+    for size in args.sizes:
+        queue = context.Queue()
+        process = context.Process(target=_run_size_in_child, args=(size, args.seed, queue))
+        process.start()
+        result = queue.get()
+        process.join()
+        results.append(result)
+
+        if "error" in result:
+            print(f"{size:>9} activities: {result['error']}")
+            continue
+        for stage in result["stages"]:
+            print(
+                f"{size:>9} activities | {stage['stage']:<20} "
+                f"{stage['wall_time_s']:>10.3f}s {stage['throughput_per_s']:>14,.0f}/s "
+                f"{stage['peak_rss_mb']:>9.1f} MB"
+            )
+
+    report = {
+        "benchmark": "ml_analysis",
+        "created_at": datetime.now().isoformat(),
+        "seed": args.seed,
+        "environment": _environment(),
+        "results": results
+    }
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"ml_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
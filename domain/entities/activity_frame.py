@@ -0,0 +1,225 @@
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+import numpy as np
+
+# Colunas numéricas: float64 com NaN onde o valor não foi registrado
+NUMERIC_COLUMNS = (
+    "duration", "moving_duration", "distance", "average_speed", "max_speed", "calories",
+    "heart_rate_avg", "heart_rate_max", "elevation_gain", "elevation_loss",
+    "cadence_avg", "cadence_max", "power_avg", "power_max", "temperature",
+    "training_effect", "anaerobic_effect", "vo2_max",
+)
+
+# Campos da lista de atividades do Garmin para cada coluna
+GARMIN_FIELDS = {
+    "duration": "duration",
+    "moving_duration": "movingDuration",
+    "distance": "distance",
+    "average_speed": "averageSpeed",
+    "max_speed": "maxSpeed",
+    "calories": "calories",
+    "heart_rate_avg": "averageHR",
+    "heart_rate_max": "maxHR",
+    "elevation_gain": "elevationGain",
+    "elevation_loss": "elevationLoss",
+    "cadence_avg": "averageRunningCadenceInStepsPerMinute",
+    "cadence_max": "maxRunningCadenceInStepsPerMinute",
+    "power_avg": "avgPower",
+    "power_max": "maxPower",
+    "temperature": "avgTemperature",
+    "training_effect": "aerobicTrainingEffect",
+    "anaerobic_effect": "anaerobicTrainingEffect",
+    "vo2_max": "vO2MaxValue",
+}
+
+SECONDS_PER_DAY = 86400
+
+# Tipo das atividades sem tipo registrado
+UNKNOWN_TYPE = "unknown"
+
+
+def _seconds(value: datetime) -> int:
+    """Seconds since 0001-01-01 of a naive or local datetime, cheaper than datetime64 conversion"""
+    return value.toordinal() * SECONDS_PER_DAY + value.hour * 3600 + value.minute * 60 + value.second
+
+
+def _float_column(values: List[Any]) -> np.ndarray:
+    # None vira NaN na conversão para float64
+    return np.array(values, dtype=np.float64)
+
+
+class ActivityFrame:
+    """Activities as a struct of NumPy arrays, sorted by start time.
+
+    Every numeric field is a float64 column with a boolean null mask;
+    start times are integer seconds (`start_seconds`) and calendar days
+    (`day`, date ordinals); activity types are integer codes into `types`.
+    `records` keeps the objects the frame was built from (entities, DB rows
+    or raw Garmin dicts) for code that still needs them.
+
+    Time-window slices are views of the parent's arrays. Type and boolean
+    selections gather the rows into new arrays. Frames built with
+    sort=False keep the input order (for results indexed by position) and
+    cannot be sliced by time.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], start_seconds: np.ndarray, type_codes: np.ndarray,
+                 types: Sequence[str], ids: np.ndarray, records: np.ndarray, is_sorted: bool = True):
+        self.columns = columns
+        self.is_sorted = is_sorted
+        self.start_seconds = start_seconds
+        self.type_codes = type_codes
+        self.types = tuple(types)
+        self.ids = ids
+        self.records = records
+        self._masks: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def from_records(cls, records: Sequence[Any], sort: bool = True,
+                     columns: Sequence[str] = NUMERIC_COLUMNS) -> "ActivityFrame":
+        """From Activity entities or DB rows; fields a record does not have are null.
+
+        `columns` limits the numeric columns loaded, for callers that only
+        read a few of them.
+        """
+        records = list(records)
+        count = len(records)
+        loaded = {name: _float_column([getattr(r, name, None) for r in records]) for name in columns}
+        starts = np.fromiter((_seconds(r.start_time) for r in records), dtype=np.int64, count=count)
+        types = [r.activity_type or UNKNOWN_TYPE for r in records]
+        ids = [getattr(r, "activity_id", None) or r.id for r in records]
+        return cls._build(loaded, starts, types, ids, records, sort)
+
+    @classmethod
+    def from_garmin(cls, pages: Iterable[Sequence[Dict[str, Any]]],
+                    start_times: Optional[Sequence[datetime]] = None) -> "ActivityFrame":
+        """From pages of the Garmin activity list, without building Activity objects.
+
+        `start_times` are the already parsed start times of the rows, in
+        order (see GarminActivityConverter.to_frame, which drops rows with
+        bad timestamps); without them startTimeLocal is parsed here and
+        rows without it are skipped.
+        """
+        records = [item for page in pages for item in page if start_times is not None or item.get("startTimeLocal")]
+        columns = {name: _float_column([r.get(field) for r in records]) for name, field in GARMIN_FIELDS.items()}
+        if start_times is not None:
+            starts = np.array([_seconds(start) for start in start_times], dtype=np.int64)
+        else:
+            # startTimeLocal vem como "AAAA-MM-DD HH:MM:SS"
+            starts = np.array([r["startTimeLocal"].replace(" ", "T")[:19] for r in records], dtype="datetime64[s]")
+            starts = (starts - np.datetime64("0001-01-01T00:00:00")).astype(np.int64) + SECONDS_PER_DAY
+        types = [((r.get("activityType") or {}).get("typeKey") or UNKNOWN_TYPE).lower() for r in records]
+        ids = [r.get("activityId") for r in records]
+        return cls._build(columns, starts, types, ids, records, sort=True)
+
+    @classmethod
+    def coerce(cls, activities: Union["ActivityFrame", Sequence[Any]], sort: bool = True,
+               columns: Sequence[str] = NUMERIC_COLUMNS) -> "ActivityFrame":
+        """The frame itself, or a frame built from a list of entities or DB rows"""
+        return activities if isinstance(activities, cls) else cls.from_records(activities, sort, columns)
+
+    @classmethod
+    def _build(cls, columns: Dict[str, np.ndarray], starts: np.ndarray, types: List[str],
+               ids: List[Any], records: List[Any], sort: bool) -> "ActivityFrame":
+        order = np.argsort(starts, kind="stable") if sort else np.arange(len(starts))
+        type_names, type_codes = np.unique(np.array(types, dtype=object).astype(str), return_inverse=True)
+        record_array = np.empty(len(records), dtype=object)
+        record_array[:] = records
+        id_array = np.empty(len(ids), dtype=object)
+        id_array[:] = ids
+        return cls(
+            {name: values[order] for name, values in columns.items()},
+            starts[order],
+            type_codes[order].astype(np.int32),
+            list(type_names),
+            id_array[order],
+            record_array[order],
+            is_sorted=sort
+        )
+
+    def __len__(self) -> int:
+        return len(self.start_seconds)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def mask(self, name: str) -> np.ndarray:
+        """True where the column has a value"""
+        if name not in self._masks:
+            self._masks[name] = ~np.isnan(self.columns[name])
+        return self._masks[name]
+
+    @property
+    def day(self) -> np.ndarray:
+        """Calendar day (date ordinal) of each activity"""
+        return self.start_seconds // SECONDS_PER_DAY
+
+    @property
+    def activity_type(self) -> np.ndarray:
+        return np.array(self.types, dtype=object)[self.type_codes] if self.types else np.zeros(0, dtype=object)
+
+    @property
+    def pace(self) -> np.ndarray:
+        """Seconds per km, NaN without distance"""
+        distance = self.columns["distance"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(distance > 0, self.columns["duration"] / (distance / 1000), np.nan)
+
+    def start_time(self, index: int) -> datetime:
+        seconds = int(self.start_seconds[index])
+        day = date.fromordinal(seconds // SECONDS_PER_DAY)
+        rest = seconds % SECONDS_PER_DAY
+        return datetime(day.year, day.month, day.day, rest // 3600, rest % 3600 // 60, rest % 60)
+
+    def window(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> "ActivityFrame":
+        """Activities with start <= start_time < end, as views of this frame's arrays"""
+        self._require_sorted()
+        first = 0 if start is None else int(np.searchsorted(self.start_seconds, _seconds(start), side="left"))
+        last = len(self) if end is None else int(np.searchsorted(self.start_seconds, _seconds(end), side="left"))
+        return self._take(slice(first, last))
+
+    def last_days(self, days: int, today: Optional[date] = None) -> "ActivityFrame":
+        self._require_sorted()
+        first_day = (today or date.today()).toordinal() - days + 1
+        first = int(np.searchsorted(self.start_seconds, first_day * SECONDS_PER_DAY, side="left"))
+        return self._take(slice(first, len(self)))
+
+    def of_type(self, activity_type: str) -> "ActivityFrame":
+        if activity_type not in self.types:
+            return self._take(slice(0, 0))
+        return self._take(self.type_codes == self.types.index(activity_type))
+
+    def select(self, rows: Union[slice, np.ndarray]) -> "ActivityFrame":
+        """Rows by slice (views), boolean mask or index array (copies)"""
+        return self._take(rows)
+
+    def _require_sorted(self) -> None:
+        if not self.is_sorted:
+            raise ValueError("Time slicing needs a frame sorted by start time")
+
+    def _take(self, rows: Union[slice, np.ndarray]) -> "ActivityFrame":
+        return ActivityFrame(
+            {name: values[rows] for name, values in self.columns.items()},
+            self.start_seconds[rows],
+            self.type_codes[rows],
+            self.types,
+            self.ids[rows],
+            self.records[rows],
+            self.is_sorted
+        )
+
+    def total(self, name: str) -> float:
+        return float(np.nansum(self.columns[name]))
+
+    def mean(self, name: str) -> Optional[float]:
+        """Mean over the recorded values, None when there are none"""
+        valid = self.mask(name)
+        return float(self.columns[name][valid].mean()) if valid.any() else None
+
+    def max(self, name: str) -> Optional[float]:
+        valid = self.mask(name)
+        return float(self.columns[name][valid].max()) if valid.any() else None
+
+    def to_list(self) -> List[Any]:
+        """The records the frame was built from, in start-time order"""
+        return self.records.tolist()
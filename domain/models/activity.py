@@ -6,6 +6,7 @@ class Activity(Base):
 
     id = Column(Integer, primary_key=True)
     activity_id = Column(String, unique=True)
+    athlete_id = Column(String, index=True)
     start_time = Column(DateTime, nullable=False)
     duration = Column(Float, nullable=False)
     distance = Column(Float, nullable=False)
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, Text, DateTime, JSON
+from infrastructure.database import Base
+
+class AthleteSummary(Base):
+    __tablename__ = "athlete_summaries"
+
+    athlete_id = Column(String, primary_key=True)
+    summary = Column(Text, nullable=False)
+    state = Column(JSON, nullable=False)
+    last_activity_id = Column(String)
+    last_activity_time = Column(DateTime)
+    updated_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<AthleteSummary(athlete_id={self.athlete_id}, last_activity={self.last_activity_time})>"
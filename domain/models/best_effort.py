@@ -0,0 +1,14 @@
+from sqlalchemy import Column, String, DateTime, JSON
+from infrastructure.database import Base
+
+class ActivityBestEfforts(Base):
+    __tablename__ = "activity_best_efforts"
+
+    activity_id = Column(String, primary_key=True)
+    athlete_id = Column(String, index=True)
+    start_time = Column(DateTime, index=True, nullable=False)
+    curves = Column(JSON, nullable=False)
+    computed_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<ActivityBestEfforts(activity_id={self.activity_id}, athlete_id={self.athlete_id})>"
@@ -0,0 +1,156 @@
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Acessos acumulados antes de gravar os last_access no SQLite
+ACCESS_FLUSH_SIZE = int(os.getenv("LLM_CACHE_ACCESS_FLUSH_SIZE", 64))
+
+
+@lru_cache()
+def get_llm_cache():
+    if os.getenv("LLM_CACHE_ENABLED", "true").lower() != "true":
+        return None
+    return LLMResponseCache(
+        path=os.getenv("LLM_CACHE_PATH", "cache/llm_cache.sqlite3"),
+        ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", 24 * 3600)),
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", 1000))
+    )
+
+
+class LLMResponseCache:
+    """Content-addressed cache of LLM responses.
+
+    Keys are a hash of everything that determines the completion (provider,
+    model, messages and temperature), so a new activity changes the prompt
+    and therefore the key: stale analyses are never served, they just stop
+    being looked up and age out. Entries live in SQLite (shared between
+    workers and restarts) with a TTL and a size-bounded LRU; the most recent
+    ones are also kept in process memory.
+
+    A hit only reads: access times are collected in memory and written in
+    one batch on the next set() (before the LRU trim that uses them) or
+    after `access_flush_size` hits. Async callers use aget/aset, which run
+    the SQLite work in a thread instead of on the event loop.
+    """
+
+    def __init__(self, path: str = "cache/llm_cache.sqlite3", ttl_seconds: float = 24 * 3600,
+                 max_entries: int = 1000, memory_entries: int = 128,
+                 access_flush_size: int = ACCESS_FLUSH_SIZE):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.access_flush_size = access_flush_size
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        # key -> último acesso ainda não gravado
+        self._accessed: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache (last_access)")
+        self._db.commit()
+
+    @staticmethod
+    def make_key(provider: str, model: str, messages: List[Dict[str, str]],
+                 temperature: Optional[float]) -> str:
+        payload = json.dumps([provider, model, messages, temperature], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[0] < self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self._touch(key, now)
+                return entry[1]
+
+            row = self._db.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, created_at = row
+            if now - created_at >= self.ttl_seconds:
+                self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._db.commit()
+                self._memory.pop(key, None)
+                self._accessed.pop(key, None)
+                return None
+
+            self._touch(key, now)
+            result = json.loads(value)
+            self._remember(key, created_at, result)
+            return result
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock:
+            self._write_accesses()
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, default=str), now, now)
+            )
+            # Mantém apenas as max_entries entradas usadas mais recentemente
+            self._db.execute("""
+                DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM llm_cache ORDER BY last_access DESC, rowid DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+            self._db.commit()
+            self._remember(key, now, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM llm_cache")
+            self._db.commit()
+            self._memory.clear()
+            self._accessed.clear()
+
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self.set, key, value)
+
+    def _touch(self, key: str, now: float) -> None:
+        self._accessed[key] = now
+        if len(self._accessed) >= self.access_flush_size:
+            self._write_accesses()
+            self._db.commit()
+
+    def _write_accesses(self) -> None:
+        """Writes the pending access times; the caller commits"""
+        if self._accessed:
+            self._db.executemany(
+                "UPDATE llm_cache SET last_access = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._accessed.items()]
+            )
+            self._accessed.clear()
+
+    def _remember(self, key: str, created_at: float, value: Dict[str, Any]) -> None:
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
@@ -1,16 +1,40 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import Engine
 from infrastructure.database import Base, DATABASE_URL
 from domain.models.activity import Activity  # Importa o modelo para criar a tabela
+from domain.models.athlete_summary import AthleteSummary
+from domain.models.best_effort import ActivityBestEfforts
+import logging
+
+logger = logging.getLogger(__name__)
+
+def migrate_database(engine: Engine):
+    """Adds columns introduced after a table was first created.
+
+    create_all only creates missing tables, so databases created before the
+    per-athlete split lack activities.athlete_id. Existing rows keep a null
+    athlete_id and belong to the default athlete.
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table("activities"):
+        return
+    columns = {column["name"] for column in inspector.get_columns("activities")}
+    if "athlete_id" in columns:
+        return
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE activities ADD COLUMN athlete_id VARCHAR"))
+        connection.execute(text("CREATE INDEX IF NOT EXISTS ix_activities_athlete_id ON activities (athlete_id)"))
+    logger.info("Added activities.athlete_id column")
 
 def init_database():
-    """Initialize the database and create all tables"""
+    """Initialize the database: create all tables and migrate existing ones"""
     engine = create_engine(DATABASE_URL)
     
     # Cria todas as tabelas definidas nos modelos
     Base.metadata.create_all(bind=engine)
+    migrate_database(engine)
     
     print("Database initialized successfully!")
 
 if __name__ == "__main__":
-    init_database() 
\ No newline at end of file
+    init_database()
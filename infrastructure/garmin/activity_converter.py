@@ -0,0 +1,193 @@
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+import logging
+from domain.entities.activity import Activity
+from domain.entities.activity_frame import UNKNOWN_TYPE, ActivityFrame
+
+logger = logging.getLogger(__name__)
+
+# Campo de Activity -> (chave no JSON do Garmin, valor padrão quando a chave não existe)
+ACTIVITY_FIELDS = {
+    "id": ("activityId", None),
+    "activity_name": ("activityName", None),
+    "duration": ("duration", 0),
+    "moving_duration": ("movingDuration", None),
+    "distance": ("distance", 0),
+    "average_speed": ("averageSpeed", 0),
+    "max_speed": ("maxSpeed", None),
+    "heart_rate_avg": ("averageHR", None),
+    "heart_rate_max": ("maxHR", None),
+    "calories": ("calories", 0),
+    "elevation_gain": ("elevationGain", None),
+    "elevation_loss": ("elevationLoss", None),
+    "min_elevation": ("minElevation", None),
+    "max_elevation": ("maxElevation", None),
+    "cadence_avg": ("averageRunningCadenceInStepsPerMinute", None),
+    "cadence_max": ("maxRunningCadenceInStepsPerMinute", None),
+    "training_effect": ("aerobicTrainingEffect", None),
+    "training_effect_label": ("trainingEffectLabel", None),
+    "training_effect_message": ("aerobicTrainingEffectMessage", None),
+    "anaerobic_effect": ("anaerobicTrainingEffect", None),
+    "vo2_max": ("vO2MaxValue", None),
+    "power_avg": ("avgPower", None),
+    "power_max": ("maxPower", None),
+    "stride_length": ("avgStrideLength", None),
+    "ground_contact_time": ("avgGroundContactTime", None),
+    "vertical_oscillation": ("avgVerticalOscillation", None),
+    "vertical_ratio": ("avgVerticalRatio", None),
+    "steps": ("steps", None),
+}
+
+SPLIT_TYPE = "RWD_RUN"
+
+
+def process_splits(activity_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Running splits of a Garmin activity in the shape stored with the activity"""
+    return [
+        {
+            "distance": split.get("distance", 0),
+            "duration": split.get("duration", 0),
+            "pace": split.get("averageSpeed", 0),
+            "elevation_gain": split.get("totalAscent", 0),
+            "max_speed": split.get("maxSpeed", 0)
+        }
+        for split in activity_data.get("splitSummaries") or ()
+        if split.get("splitType") == SPLIT_TYPE
+    ]
+
+
+def activity_type(activity_data: Dict[str, Any]) -> str:
+    """Lower-case Garmin type key; the same UNKNOWN_TYPE as the frames when it is missing"""
+    return ((activity_data.get("activityType") or {}).get("typeKey") or UNKNOWN_TYPE).lower()
+
+
+def build_activity(activity_data: Dict[str, Any], start_time: Optional[datetime]) -> Activity:
+    get = activity_data.get
+    return Activity(
+        start_time=start_time,
+        activity_type=activity_type(activity_data),
+        intensity_minutes={
+            "moderate": get("moderateIntensityMinutes", 0),
+            "vigorous": get("vigorousIntensityMinutes", 0)
+        },
+        splits=process_splits(activity_data),
+        **{field: get(key, default) for field, (key, default) in ACTIVITY_FIELDS.items()}
+    )
+
+
+def _timestamp_text(activity_data: Dict[str, Any]) -> Optional[str]:
+    text = activity_data.get("startTimeLocal", activity_data.get("start_time"))
+    # fromisoformat só aceita "Z" a partir do Python 3.11
+    return text[:-1] + "+00:00" if text and text.endswith("Z") else text
+
+
+# Marca timestamps que não puderam ser lidos
+INVALID_TIMESTAMP = object()
+
+
+def parse_timestamps(texts: Sequence[Optional[str]]) -> List[Any]:
+    """ISO timestamps of a whole page in one pass: None when absent, INVALID_TIMESTAMP when unparseable"""
+    present = [text for text in texts if text]
+    try:
+        parsed = iter(list(map(datetime.fromisoformat, present)))
+    except (TypeError, ValueError):
+        # Só a página com algum valor inválido paga a leitura item a item
+        return [_parse_one(text) for text in texts]
+    return [next(parsed) if text else None for text in texts]
+
+
+def _parse_one(text: Optional[str]) -> Any:
+    if not text:
+        return None
+    try:
+        return datetime.fromisoformat(text)
+    except (TypeError, ValueError):
+        return INVALID_TIMESTAMP
+
+
+class ConversionResult:
+    """Activities converted from a page plus failure counts by reason"""
+
+    def __init__(self, activities: List[Activity], failures: Counter, total: int):
+        self.activities = activities
+        self.failures = failures
+        self.total = total
+
+    @property
+    def failed(self) -> int:
+        return sum(self.failures.values())
+
+    def summary(self) -> Dict[str, Any]:
+        return {"total": self.total, "converted": len(self.activities), "failures": dict(self.failures)}
+
+
+class GarminActivityConverter:
+    """Converts whole pages of the Garmin activity list.
+
+    The timestamps of a page are parsed together. Items that cannot be
+    converted are dropped and counted by reason; the page logs one warning
+    with the counts instead of one error per item. Callers that only need
+    numbers should use to_frame, which skips the Activity objects entirely
+    and drops bad rows the same way.
+    """
+
+    def convert_page(self, page: Sequence[Any], require_start_time: bool = True) -> ConversionResult:
+        items = [data for data in page if isinstance(data, dict)]
+        failures = Counter({"not_an_object": len(page) - len(items)} if len(items) < len(page) else {})
+        start_times = parse_timestamps([_timestamp_text(data) for data in items])
+
+        activities = []
+        for data, start_time in zip(items, start_times):
+            # Mesmo critério de to_frame: sem data a atividade não pode ser ordenada nem analisada
+            if start_time is None and require_start_time:
+                failures["missing_start_time"] += 1
+                continue
+            if start_time is INVALID_TIMESTAMP:
+                failures["invalid_start_time"] += 1
+                continue
+            try:
+                activities.append(build_activity(data, start_time))
+            except Exception as e:
+                failures[type(e).__name__] += 1
+
+        result = ConversionResult(activities, failures, len(page))
+        if failures:
+            logger.warning(f"Dropped {result.failed} of {len(page)} Garmin activities: {dict(failures)}")
+        return result
+
+    def convert(self, page: Sequence[Any]) -> List[Activity]:
+        return self.convert_page(page).activities
+
+    def convert_one(self, activity_data: Dict[str, Any]) -> Optional[Activity]:
+        """Single payload (cached details, latest activity); None when it cannot be converted.
+
+        Activity details carry no start time, so unlike the list pages a
+        missing one is kept as None here.
+        """
+        activities = self.convert_page([activity_data], require_start_time=False).activities
+        return activities[0] if activities else None
+
+    def to_frame(self, pages: Sequence[Sequence[Any]]) -> ActivityFrame:
+        """Columnar frame straight from the raw pages, without building Activity objects"""
+        rows, start_times = [], []
+        failures = Counter()
+        total = 0
+        for page in pages:
+            total += len(page)
+            items = [data for data in page if isinstance(data, dict)]
+            failures["not_an_object"] += len(page) - len(items)
+            # A lista do Garmin traz startTimeLocal sem fuso
+            for data, start_time in zip(items, parse_timestamps([data.get("startTimeLocal") for data in items])):
+                if start_time is None:
+                    failures["missing_start_time"] += 1
+                elif start_time is INVALID_TIMESTAMP:
+                    failures["invalid_start_time"] += 1
+                else:
+                    rows.append(data)
+                    start_times.append(start_time)
+
+        failures = +failures
+        if failures:
+            logger.warning(f"Dropped {sum(failures.values())} of {total} Garmin activities: {dict(failures)}")
+        return ActivityFrame.from_garmin([rows], start_times=start_times)
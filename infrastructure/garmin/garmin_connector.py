@@ -1,3 +1,4 @@
+from collections import OrderedDict
 from functools import lru_cache
 import json
 import os
@@ -12,11 +13,20 @@ from garminconnect import (
     GarminConnectTooManyRequestsError
 )
 from domain.entities.activity import Activity
-from typing import List
+from domain.entities.activity_frame import ActivityFrame
+from .activity_converter import GarminActivityConverter
+from .http_client import GarminHttpClient
+from typing import Any, AsyncIterator, Dict, List, Tuple
+import numpy as np
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+# Tamanho da página ao iterar a lista de atividades do Garmin
+ACTIVITIES_PAGE_SIZE = int(os.getenv("GARMIN_ACTIVITIES_PAGE_SIZE", 100))
+# Quantas atividades têm os streams por amostra mantidos em memória (LRU)
+STREAMS_CACHE_SIZE = int(os.getenv("GARMIN_STREAMS_CACHE_SIZE", 200))
+
 @lru_cache()
 def get_garmin_connector():
     return GarminConnector()
@@ -36,10 +46,14 @@ class GarminConnector:
             
         self.email = os.getenv("GARMIN_EMAIL")
         self.password = os.getenv("GARMIN_PASSWORD")
+        # Permite apontar para um servidor local (ex.: benchmarks/fake_services.py)
+        self.base_url = os.getenv("GARMIN_BASE_URL")
         self.client = None
         self._last_login = None
         self._activities_cache = {}
         self._details_cache = {}
+        self._streams_cache: "OrderedDict[int, Dict[str, np.ndarray]]" = OrderedDict()
+        self.converter = GarminActivityConverter()
         self._auth_lock = asyncio.Lock()
         self._initialized = True
 
@@ -60,7 +74,7 @@ class GarminConnector:
             for attempt in range(max_retries):
                 try:
                     if not self.client:
-                        self.client = Garmin(self.email, self.password)
+                        self.client = self._create_client()
                     
                     if attempt > 0:  
                         await asyncio.sleep(retry_delay * (2 ** attempt))
@@ -85,7 +99,7 @@ class GarminConnector:
         async with self._auth_lock:
             self.email = email
             self.password = password
-            self.client = Garmin(self.email, self.password)
+            self.client = self._create_client()
             self.client.login()
             self._last_login = datetime.now()
             self._details_cache.clear()
@@ -94,70 +108,10 @@ class GarminConnector:
 
             await self.connect()
 
-    def _convert_to_activity(self, activity_data: dict) -> Activity:
-        """Convert Garmin activity data to Activity object"""
-        try:
-            start_time_str = activity_data.get('startTimeLocal', activity_data.get('start_time'))
-            if start_time_str:
-                start_time = datetime.fromisoformat(start_time_str.replace('Z', '+00:00'))
-            else:
-                start_time = None
-
-            return Activity(
-                id=activity_data.get('activityId'),
-                activity_name=activity_data.get('activityName'),
-                start_time=start_time,
-                duration=activity_data.get('duration', 0),
-                moving_duration=activity_data.get('movingDuration'),
-                distance=activity_data.get('distance', 0),
-                average_speed=activity_data.get('averageSpeed', 0),
-                max_speed=activity_data.get('maxSpeed'),
-                heart_rate_avg=activity_data.get('averageHR'),
-                heart_rate_max=activity_data.get('maxHR'),
-                calories=activity_data.get('calories', 0),
-                elevation_gain=activity_data.get('elevationGain'),
-                elevation_loss=activity_data.get('elevationLoss'),
-                min_elevation=activity_data.get('minElevation'),
-                max_elevation=activity_data.get('maxElevation'),
-                activity_type=activity_data.get('activityType', {}).get('typeKey', '').lower(),
-                cadence_avg=activity_data.get('averageRunningCadenceInStepsPerMinute'),
-                cadence_max=activity_data.get('maxRunningCadenceInStepsPerMinute'),
-                training_effect=activity_data.get('aerobicTrainingEffect'),
-                training_effect_label=activity_data.get('trainingEffectLabel'),
-                training_effect_message=activity_data.get('aerobicTrainingEffectMessage'),
-                anaerobic_effect=activity_data.get('anaerobicTrainingEffect'),
-                vo2_max=activity_data.get('vO2MaxValue'),
-                power_avg=activity_data.get('avgPower'),
-                power_max=activity_data.get('maxPower'),
-                stride_length=activity_data.get('avgStrideLength'),
-                ground_contact_time=activity_data.get('avgGroundContactTime'),
-                vertical_oscillation=activity_data.get('avgVerticalOscillation'),
-                vertical_ratio=activity_data.get('avgVerticalRatio'),
-                intensity_minutes={
-                    'moderate': activity_data.get('moderateIntensityMinutes', 0),
-                    'vigorous': activity_data.get('vigorousIntensityMinutes', 0)
-                },
-                steps=activity_data.get('steps'),
-                splits=self._process_splits(activity_data)
-            )
-        except Exception as e:
-            logger.error(f"Error converting activity data: {str(e)}")
-            return None
-
-    def _process_splits(self, activity_data: dict) -> list:
-        """Process splits data from activity"""
-        splits = []
-        if 'splitSummaries' in activity_data:
-            for split in activity_data['splitSummaries']:
-                if split.get('splitType') == 'RWD_RUN':
-                    splits.append({
-                        'distance': split.get('distance', 0),
-                        'duration': split.get('duration', 0),
-                        'pace': split.get('averageSpeed', 0),
-                        'elevation_gain': split.get('totalAscent', 0),
-                        'max_speed': split.get('maxSpeed', 0)
-                    })
-        return splits
+    def _create_client(self):
+        if self.base_url:
+            return GarminHttpClient(self.base_url, self.email, self.password)
+        return Garmin(self.email, self.password)
 
     async def get_latest_activity(self) -> Activity:
         """Get latest activity"""
@@ -167,32 +121,55 @@ class GarminConnector:
             if not activities:
                 return None
             
-            for activity in activities:
-                converted_activity = self._convert_to_activity(activity)
-                if converted_activity.activity_type == 'running':
-                    return converted_activity
+            for activity in self.converter.convert(activities):
+                if activity.activity_type == 'running':
+                    return activity
             return None
         except Exception as e:
             logger.error(f"Error getting latest activity: {str(e)}")
             return None
 
+    async def get_latest_marker(self) -> Tuple[Any, ...]:
+        """(id, start time) of the most recent activity, from a one-item list request"""
+        await self.connect()
+        latest = self.client.get_activities(0, 1)
+        if not latest:
+            return (None, None)
+        return (latest[0].get('activityId'), latest[0].get('startTimeLocal'))
+
     async def get_activities(self, limit: int = 10) -> List[Activity]:
         """Get activities and convert them to Activity objects"""
         try:
             await self.connect()
             activities_data = self.client.get_activities(0, limit)
-            
-            activities = []
-            for activity_data in activities_data:
-                activity = self._convert_to_activity(activity_data)
-                if activity:
-                    activities.append(activity)
-            
-            return activities
+            return self.converter.convert(activities_data)
         except Exception as e:
             logger.error(f"Error fetching activities: {str(e)}")
             raise
 
+    async def iter_activities(self, limit: int = 10, page_size: int = ACTIVITIES_PAGE_SIZE) -> AsyncIterator[List[Activity]]:
+        """Yields converted activities page by page, so callers can emit the first ones before the rest is fetched"""
+        async for page in self._iter_pages(limit, page_size):
+            activities = self.converter.convert(page)
+            if activities:
+                yield activities
+
+    async def get_activity_frame(self, limit: int = 10, page_size: int = ACTIVITIES_PAGE_SIZE) -> ActivityFrame:
+        """Latest activities as a columnar frame built from the raw pages, without Activity objects"""
+        pages = [page async for page in self._iter_pages(limit, page_size)]
+        return self.converter.to_frame(pages)
+
+    async def _iter_pages(self, limit: int, page_size: int) -> AsyncIterator[List[dict]]:
+        await self.connect()
+        start = 0
+        while start < limit:
+            count = min(page_size, limit - start)
+            page = self.client.get_activities(start, count)
+            yield page
+            if len(page) < count:
+                break
+            start += count
+
     async def get_weekly_activities(self) -> List[Activity]:
         """Get activities from the last 7 days"""
         await self.connect()
@@ -222,10 +199,10 @@ class GarminConnector:
             if cache_key in self._details_cache:
                 cache_time, cached_data = self._details_cache[cache_key]
                 if datetime.now() - cache_time < timedelta(minutes=30):
-                    return self._convert_to_activity(cached_data)
+                    return self.converter.convert_one(cached_data)
 
             activity_data = self.client.get_activity_details(activity_id)
-            activity = self._convert_to_activity(activity_data)
+            activity = self.converter.convert_one(activity_data)
             
             if activity:
                 self._details_cache[cache_key] = (datetime.now(), activity_data)
@@ -235,3 +212,35 @@ class GarminConnector:
         except Exception as e:
             logger.error(f"Error getting activity details: {str(e)}")
             return None
+
+    async def get_activity_streams(self, activity_id: int) -> Dict[str, np.ndarray]:
+        """Get per-sample timestamp (s), heart rate, distance (m) and power arrays of an activity"""
+        if activity_id in self._streams_cache:
+            self._streams_cache.move_to_end(activity_id)
+            return self._streams_cache[activity_id]
+
+        await self.connect()
+        details = self.client.get_activity_details(activity_id)
+
+        indexes = {d["key"]: d["metricsIndex"] for d in details.get("metricDescriptors", [])}
+        rows = [m["metrics"] for m in details.get("activityDetailMetrics", [])]
+        if not rows:
+            return {"heart_rate": np.array([]), "timestamp": None, "distance": None, "power": None}
+
+        # None vira NaN na conversão para float
+        metrics = np.array(rows, dtype=np.float64)
+
+        def column(key: str):
+            return metrics[:, indexes[key]] if key in indexes else None
+
+        timestamp = column("directTimestamp")
+        streams = {
+            "heart_rate": column("directHeartRate") if "directHeartRate" in indexes else np.array([]),
+            "timestamp": timestamp / 1000 if timestamp is not None else None,
+            "distance": column("sumDistance"),
+            "power": column("directPower")
+        }
+        self._streams_cache[activity_id] = streams
+        while len(self._streams_cache) > STREAMS_CACHE_SIZE:
+            self._streams_cache.popitem(last=False)
+        return streams
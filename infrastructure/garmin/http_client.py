@@ -0,0 +1,52 @@
+from typing import Any, Dict, List
+import logging
+import httpx
+from garminconnect import (
+    GarminConnectAuthenticationError,
+    GarminConnectConnectionError,
+    GarminConnectTooManyRequestsError
+)
+
+logger = logging.getLogger(__name__)
+
+
+class GarminHttpClient:
+    """Minimal Garmin Connect client for a configurable base URL.
+
+    Implements the subset of garminconnect.Garmin used by GarminConnector,
+    with the same exceptions, so the connector can be pointed at a local
+    stand-in server (see benchmarks/fake_services.py) for load testing.
+    """
+
+    def __init__(self, base_url: str, email: str, password: str, timeout: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.email = email
+        self.password = password
+        self.http = httpx.Client(base_url=self.base_url, timeout=timeout)
+
+    def login(self) -> None:
+        data = self._request("POST", "/auth/login", json={"email": self.email, "password": self.password})
+        self.http.headers["Authorization"] = f"Bearer {data['access_token']}"
+
+    def get_activities(self, start: int = 0, limit: int = 20) -> List[Dict[str, Any]]:
+        return self._request(
+            "GET", "/activitylist-service/activities/search/activities",
+            params={"start": start, "limit": limit}
+        )
+
+    def get_activity_details(self, activity_id: int) -> Dict[str, Any]:
+        return self._request("GET", f"/activity-service/activity/{activity_id}/details")
+
+    def _request(self, method: str, path: str, **kwargs) -> Any:
+        try:
+            response = self.http.request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            raise GarminConnectConnectionError(f"Error connecting to {self.base_url}: {str(e)}")
+
+        if response.status_code == 429:
+            raise GarminConnectTooManyRequestsError("Too Many Requests")
+        if response.status_code in (401, 403):
+            raise GarminConnectAuthenticationError(f"Authentication failed: {response.status_code}")
+        if response.status_code >= 400:
+            raise GarminConnectConnectionError(f"Error {response.status_code} from {path}: {response.text}")
+        return response.json()
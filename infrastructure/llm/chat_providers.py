@@ -0,0 +1,178 @@
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+from weakref import WeakKeyDictionary
+import asyncio
+import json
+import logging
+import os
+import httpx
+import openai
+
+logger = logging.getLogger(__name__)
+
+
+class ChatProvider(ABC):
+    """Async chat-completion client for one LLM provider.
+
+    Providers are shared by the process, but their HTTP clients are bound
+    to the event loop that created them; `_loop_client` keeps one client
+    per running loop (weakly keyed, so clients of closed loops go away),
+    which lets the CLI, the batch runner and tests call asyncio.run more
+    than once.
+    """
+
+    name: str = ""
+
+    def __init__(self, model: str, temperature: Optional[float] = None, timeout: float = 60.0):
+        self.model = model
+        self.temperature = temperature
+        self.timeout = timeout
+        self._clients: "WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = WeakKeyDictionary()
+
+    @abstractmethod
+    async def complete(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """Returns {"content": <text>, "raw": <provider response as dict>}"""
+
+    @abstractmethod
+    def stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Yields content deltas as they arrive.
+
+        Closing the generator (aclose, or cancellation) tears down the
+        upstream HTTP stream.
+        """
+
+    def _loop_client(self, create: Callable[[], Any]) -> Any:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = self._clients[loop] = create()
+        return client
+
+    async def aclose(self) -> None:
+        """Closes the client of the running loop, if any"""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await self._close_client(client)
+
+    async def _close_client(self, client: Any) -> None:
+        await client.aclose()
+
+
+class XAIChatProvider(ChatProvider):
+    name = "xai"
+
+    def __init__(self, api_url: str, api_key: Optional[str], model: str = "grok-beta",
+                 temperature: Optional[float] = 0, timeout: float = 60.0):
+        super().__init__(model, temperature, timeout)
+        self.api_url = api_url
+        self.api_key = api_key
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._loop_client(lambda: httpx.AsyncClient(timeout=self.timeout))
+
+    async def complete(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        payload = {
+            "messages": messages,
+            "model": self.model,
+            "stream": False,
+            "temperature": self.temperature
+        }
+
+        response = await self.client.post(self.api_url, headers=headers, json=payload)
+        response.raise_for_status()
+        raw = response.json()
+        return {"content": raw["choices"][0]["message"]["content"], "raw": raw}
+
+    async def stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        payload = {
+            "messages": messages,
+            "model": self.model,
+            "stream": True,
+            "temperature": self.temperature
+        }
+
+        async with self.client.stream("POST", self.api_url, headers=headers, json=payload) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                content = choices[0].get("delta", {}).get("content")
+                if content:
+                    yield content
+
+
+class OpenAIChatProvider(ChatProvider):
+    name = "openai"
+
+    def __init__(self, api_key: Optional[str], model: str = "gpt-4",
+                 temperature: Optional[float] = None, timeout: float = 60.0,
+                 base_url: Optional[str] = None):
+        super().__init__(model, temperature, timeout)
+        self.api_key = api_key
+        self.base_url = base_url
+
+    @property
+    def client(self) -> openai.AsyncOpenAI:
+        return self._loop_client(
+            lambda: openai.AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, timeout=self.timeout)
+        )
+
+    async def _close_client(self, client: openai.AsyncOpenAI) -> None:
+        await client.close()
+
+    async def complete(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        kwargs = {"model": self.model, "messages": messages}
+        if self.temperature is not None:
+            kwargs["temperature"] = self.temperature
+
+        response = await self.client.chat.completions.create(**kwargs)
+        return {"content": response.choices[0].message.content, "raw": response.model_dump()}
+
+    async def stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        kwargs = {"model": self.model, "messages": messages, "stream": True}
+        if self.temperature is not None:
+            kwargs["temperature"] = self.temperature
+
+        response = await self.client.chat.completions.create(**kwargs)
+        try:
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await response.close()
+
+
+@lru_cache()
+def get_chat_providers() -> Dict[str, ChatProvider]:
+    """Shared provider clients, so connections are pooled across requests"""
+    return {
+        "xai": XAIChatProvider(
+            api_url=os.getenv("XAI_API_URL", "https://api.x.ai/v1/chat/completions"),
+            api_key=os.getenv("X_API_KEY"),
+            timeout=float(os.getenv("XAI_TIMEOUT_SECONDS", 60))
+        ),
+        "openai": OpenAIChatProvider(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            timeout=float(os.getenv("OPENAI_TIMEOUT_SECONDS", 60)),
+            base_url=os.getenv("OPENAI_BASE_URL")
+        )
+    }
+
+
+async def close_chat_providers() -> None:
+    """Closes the shared providers' clients of the running loop (application shutdown)"""
+    await asyncio.gather(*(provider.aclose() for provider in get_chat_providers().values()))
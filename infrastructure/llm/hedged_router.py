@@ -0,0 +1,180 @@
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+import asyncio
+import bisect
+import logging
+import os
+import threading
+import time
+from infrastructure.llm.chat_providers import ChatProvider, get_chat_providers
+
+logger = logging.getLogger(__name__)
+
+# Limites superiores dos buckets em ms (escala logarítmica de 50 ms a ~3 min)
+LATENCY_BUCKETS_MS = [round(50 * 1.25 ** i) for i in range(37)]
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with approximate percentiles"""
+
+    def __init__(self, buckets_ms: List[int] = LATENCY_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self.counts = [0] * (len(buckets_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms: float) -> None:
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets_ms, latency_ms)] += 1
+            self.count += 1
+            self.total_ms += latency_ms
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Upper bound (ms) of the bucket holding the p-th percentile (0-1)"""
+        with self._lock:
+            if not self.count:
+                return None
+            target = p * self.count
+            cumulative = 0
+            for i, bucket_count in enumerate(self.counts):
+                cumulative += bucket_count
+                if cumulative >= target:
+                    return float(self.buckets_ms[min(i, len(self.buckets_ms) - 1)])
+            return float(self.buckets_ms[-1])
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 1) if self.count else None,
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "buckets": {
+                f"le_{bound}": count
+                for bound, count in zip(self.buckets_ms + ["inf"], self.counts)
+                if count
+            }
+        }
+
+
+class HedgedRouter:
+    """Sends a request to the primary provider and hedges to the others.
+
+    If the primary has not answered after its hedge_percentile latency (or
+    fails), the next provider is fired as well; the first successful answer
+    wins and the rest are cancelled. Everything runs under one overall
+    deadline. Until a provider has min_samples observations the hedge fires
+    after default_hedge_delay seconds.
+    """
+
+    def __init__(self, providers: Dict[str, ChatProvider], primary: str = "openai",
+                 hedge_percentile: float = 0.95, min_samples: int = 20,
+                 default_hedge_delay: float = 10.0, deadline: float = 90.0):
+        if primary not in providers:
+            raise ValueError(f"Unknown primary provider: {primary}")
+        self.providers = providers
+        self.primary = primary
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.default_hedge_delay = default_hedge_delay
+        self.deadline = deadline
+        self.histograms = {name: LatencyHistogram() for name in providers}
+        self.hedges_fired = 0
+        self.hedges_won = 0
+
+    def hedge_delay(self, name: str) -> float:
+        histogram = self.histograms[name]
+        if histogram.count < self.min_samples:
+            return self.default_hedge_delay
+        return histogram.percentile(self.hedge_percentile) / 1000
+
+    async def complete(self, messages: List[Dict[str, str]], deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Returns the first successful completion with routing details"""
+        loop = asyncio.get_running_loop()
+        deadline_at = loop.time() + (deadline or self.deadline)
+        order = [self.primary] + [name for name in self.providers if name != self.primary]
+
+        tasks: Dict[asyncio.Task, str] = {}
+        errors: Dict[str, str] = {}
+        try:
+            for index, name in enumerate(order):
+                task = asyncio.create_task(self._timed(self.providers[name], messages))
+                tasks[task] = name
+                if index > 0:
+                    self.hedges_fired += 1
+                    logger.info(f"Hedging LLM request to {name}")
+
+                # Espera o percentil de latência do provedor atual antes do próximo hedge
+                is_last = index == len(order) - 1
+                wait_until = deadline_at if is_last else min(deadline_at, loop.time() + self.hedge_delay(name))
+                while tasks:
+                    timeout = wait_until - loop.time()
+                    if timeout <= 0:
+                        break
+                    done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                    if not done:
+                        break
+
+                    for finished in done:
+                        finished_name = tasks.pop(finished)
+                        try:
+                            result = finished.result()
+                        except Exception as e:
+                            errors[finished_name] = str(e) or type(e).__name__
+                            logger.warning(f"LLM provider {finished_name} failed: {errors[finished_name]}")
+                            continue
+
+                        if finished_name != self.primary:
+                            self.hedges_won += 1
+                        return {
+                            **result,
+                            "provider": finished_name,
+                            "hedged": index > 0,
+                            "errors": errors
+                        }
+
+                    # Um provedor falhou: dispara o próximo imediatamente
+                    if not is_last:
+                        break
+
+                if loop.time() >= deadline_at:
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        if loop.time() >= deadline_at:
+            errors.update({name: "deadline exceeded" for name in tasks.values()})
+            raise asyncio.TimeoutError(f"LLM request deadline exceeded: {errors}")
+        raise RuntimeError(f"All LLM providers failed: {errors}")
+
+    async def _timed(self, provider: ChatProvider, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        result = await provider.complete(messages)
+        latency_ms = (time.perf_counter() - start) * 1000
+        # Só latências completas entram no histograma; perdedores cancelados não
+        self.histograms[provider.name].record(latency_ms)
+        return {**result, "latency_ms": round(latency_ms, 1)}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "primary": self.primary,
+            "hedge_percentile": self.hedge_percentile,
+            "hedge_delays_s": {name: self.hedge_delay(name) for name in self.providers},
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won,
+            "providers": {name: histogram.snapshot() for name, histogram in self.histograms.items()}
+        }
+
+
+@lru_cache()
+def get_hedged_router() -> HedgedRouter:
+    """Shared router, so latency histograms accumulate across requests"""
+    return HedgedRouter(
+        get_chat_providers(),
+        primary=os.getenv("LLM_PRIMARY_PROVIDER", "openai"),
+        hedge_percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", 0.95)),
+        default_hedge_delay=float(os.getenv("LLM_DEFAULT_HEDGE_DELAY_SECONDS", 10)),
+        deadline=float(os.getenv("LLM_DEADLINE_SECONDS", 90))
+    )
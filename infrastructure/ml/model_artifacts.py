@@ -0,0 +1,331 @@
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+import joblib
+import numpy as np
+from sklearn.cluster import KMeans
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+COLD_STORAGE_FILE = "arrays.npz"
+
+# Amostras pontuadas por vez na floresta achatada (limita memória temporária)
+SCORING_CHUNK_SIZE = 4096
+
+
+class ArtifactError(Exception):
+    """Raised when a model artifact is missing, corrupted or incompatible"""
+
+
+def average_path_length(n_samples: np.ndarray) -> np.ndarray:
+    """Expected path length of an unsuccessful BST search among n points (Liu et al., 2008).
+
+    Same normalization as sklearn's IsolationForest, kept here because the
+    sklearn helper is private.
+    """
+    n_samples = np.asarray(n_samples, dtype=np.float64)
+    lengths = np.zeros(n_samples.shape)
+    lengths[n_samples == 2] = 1.0
+    large = n_samples > 2
+    n = n_samples[large]
+    lengths[large] = 2.0 * (np.log(n - 1.0) + np.euler_gamma) - 2.0 * (n - 1.0) / n
+    return lengths
+
+
+class MappedScaler:
+    """StandardScaler.transform over (possibly memory-mapped) arrays"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], params: Dict[str, Any]):
+        self.mean_ = arrays["mean"]
+        self.scale_ = arrays["scale"]
+        # Artefatos antigos não gravavam os parâmetros: o padrão do StandardScaler
+        self.with_mean = params.get("with_mean", True)
+        self.with_std = params.get("with_std", True)
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        X = np.array(X, dtype=np.float64)
+        if self.with_mean:
+            X -= self.mean_
+        if self.with_std:
+            X /= self.scale_
+        return X
+
+
+class MappedKMeans:
+    """KMeans.predict over (possibly memory-mapped) cluster centers"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], params: Dict[str, Any]):
+        self.cluster_centers_ = arrays["cluster_centers"]
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        centers = self.cluster_centers_
+        distances = (
+            np.einsum("ij,ij->i", X, X)[:, None]
+            - 2 * X @ centers.T
+            + np.einsum("ij,ij->i", centers, centers)[None, :]
+        )
+        return distances.argmin(axis=1).astype(np.int32)
+
+
+class MappedIsolationForest:
+    """IsolationForest scoring over all trees flattened into shared arrays.
+
+    Every tree is stored in the same children/feature/threshold arrays (node
+    indices are global), so the whole forest is a handful of .npy files that
+    forked workers can map instead of each holding its own copy of the trees.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], params: Dict[str, Any]):
+        self.roots = arrays["roots"]
+        self.children_left = arrays["children_left"]
+        self.children_right = arrays["children_right"]
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.leaf_value = arrays["leaf_value"]
+        self.offset_ = params["offset"]
+        self.denominator = params["denominator"]
+
+    def score_samples(self, X: np.ndarray) -> np.ndarray:
+        # As árvores do sklearn comparam em float32
+        X = np.asarray(X, dtype=np.float32)
+        scores = np.empty(X.shape[0], dtype=np.float64)
+        for start in range(0, X.shape[0], SCORING_CHUNK_SIZE):
+            chunk = X[start:start + SCORING_CHUNK_SIZE]
+            depths = self._leaf_values(chunk).sum(axis=1)
+            if self.denominator:
+                scores[start:start + len(chunk)] = -(2 ** (-depths / self.denominator))
+            else:
+                scores[start:start + len(chunk)] = -1.0
+        return scores
+
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        return self.score_samples(X) - self.offset_
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        is_inlier = np.ones(len(X), dtype=int)
+        is_inlier[self.decision_function(X) < 0] = -1
+        return is_inlier
+
+    def _leaf_values(self, X: np.ndarray) -> np.ndarray:
+        """Walks every sample down every tree at once, one level per iteration"""
+        n_samples, n_trees = X.shape[0], len(self.roots)
+        nodes = np.tile(self.roots, n_samples)
+        rows = np.repeat(np.arange(n_samples), n_trees)
+
+        active = np.flatnonzero(self.children_left[nodes] != -1)
+        while active.size:
+            current = nodes[active]
+            goes_left = X[rows[active], self.feature[current]] <= self.threshold[current]
+            nodes[active] = np.where(goes_left, self.children_left[current], self.children_right[current])
+            active = active[self.children_left[nodes[active]] != -1]
+
+        return self.leaf_value[nodes].reshape(n_samples, n_trees)
+
+
+def _export_scaler(scaler: StandardScaler) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    # mean_ e scale_ são None quando o respectivo passo está desligado
+    n_features = scaler.n_features_in_
+    mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(n_features)
+    scale = scaler.scale_ if scaler.scale_ is not None else np.ones(n_features)
+    return {"mean": mean, "scale": scale}, {"with_mean": bool(scaler.with_mean), "with_std": bool(scaler.with_std)}
+
+
+def _export_kmeans(model: KMeans) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    return {"cluster_centers": model.cluster_centers_}, {}
+
+
+def _export_isolation_forest(model: IsolationForest) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    subsample_features = model._max_features != model.n_features_in_
+
+    roots, lefts, rights, features, thresholds, leaf_values = [], [], [], [], [], []
+    offset = 0
+    for estimator, estimator_features in zip(model.estimators_, model.estimators_features_):
+        tree = estimator.tree_
+        left, right = tree.children_left, tree.children_right
+        is_leaf = left == -1
+
+        depth = np.zeros(tree.node_count, dtype=np.float64)
+        for node in range(tree.node_count):
+            if not is_leaf[node]:
+                depth[left[node]] = depth[node] + 1
+                depth[right[node]] = depth[node] + 1
+
+        feature = np.where(is_leaf, 0, tree.feature)
+        if subsample_features:
+            feature = np.asarray(estimator_features)[feature]
+
+        roots.append(offset)
+        lefts.append(np.where(is_leaf, -1, left + offset))
+        rights.append(np.where(is_leaf, -1, right + offset))
+        features.append(feature)
+        thresholds.append(tree.threshold)
+        leaf_values.append(depth + average_path_length(tree.n_node_samples))
+        offset += tree.node_count
+
+    arrays = {
+        "roots": np.asarray(roots, dtype=np.int64),
+        "children_left": np.concatenate(lefts).astype(np.int64),
+        "children_right": np.concatenate(rights).astype(np.int64),
+        "feature": np.concatenate(features).astype(np.int64),
+        "threshold": np.concatenate(thresholds).astype(np.float64),
+        "leaf_value": np.concatenate(leaf_values).astype(np.float64),
+    }
+    params = {
+        "offset": float(model.offset_),
+        "denominator": float(len(model.estimators_) * average_path_length([model.max_samples_])[0]),
+    }
+    return arrays, params
+
+
+_EXPORTERS = {
+    StandardScaler: ("scaler", _export_scaler),
+    KMeans: ("kmeans", _export_kmeans),
+    IsolationForest: ("isolation_forest", _export_isolation_forest),
+}
+
+_LOADERS = {
+    "scaler": MappedScaler,
+    "kmeans": MappedKMeans,
+    "isolation_forest": MappedIsolationForest,
+}
+
+
+def save_models(path: str, models: Dict[str, Any], feature_schema_version: int,
+                compress: bool = False) -> Dict[str, Any]:
+    """Writes models as a flat-array artifact and returns its manifest.
+
+    By default each array is its own uncompressed .npy file so it can be
+    loaded with mmap_mode. With compress=True all arrays go into a single
+    compressed .npz (cold storage: smaller on disk, but copied into memory
+    on load). Models without an exporter fall back to a joblib file.
+    """
+    os.makedirs(path, exist_ok=True)
+    entries, all_arrays = {}, {}
+
+    for name, model in models.items():
+        exporter = _EXPORTERS.get(type(model))
+        if exporter is None:
+            filename = f"{name}.joblib"
+            joblib.dump(model, os.path.join(path, filename))
+            entries[name] = {"kind": "joblib", "file": filename}
+            continue
+
+        kind, export = exporter
+        arrays, params = export(model)
+        entries[name] = {"kind": kind, "params": params, "arrays": sorted(arrays)}
+        for array_name, array in arrays.items():
+            all_arrays[f"{name}.{array_name}"] = np.ascontiguousarray(array)
+
+    if compress:
+        np.savez_compressed(os.path.join(path, COLD_STORAGE_FILE), **all_arrays)
+    else:
+        for key, array in all_arrays.items():
+            np.save(os.path.join(path, f"{key}.npy"), array, allow_pickle=False)
+
+    files = sorted(entry.name for entry in os.scandir(path) if entry.is_file() and entry.name != MANIFEST_FILE)
+    manifest = {
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "feature_schema_version": feature_schema_version,
+        "storage": "compressed" if compress else "mmap",
+        "created_at": datetime.now().isoformat(),
+        "models": entries,
+        "checksums": {filename: _sha256(os.path.join(path, filename)) for filename in files},
+    }
+    with open(os.path.join(path, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_manifest(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def load_models(path: str, feature_schema_version: int, mmap_mode: Optional[str] = "r",
+                verify: bool = True) -> Dict[str, Any]:
+    """Loads an artifact written by save_models.
+
+    Raises ArtifactError when the manifest is missing, a checksum does not
+    match or the artifact was trained on another feature schema.
+    """
+    manifest = read_manifest(path)
+    if manifest is None:
+        raise ArtifactError(f"No manifest found in {path}")
+    if manifest.get("format_version") != ARTIFACT_FORMAT_VERSION:
+        raise ArtifactError(f"Unsupported artifact format {manifest.get('format_version')}")
+    if manifest.get("feature_schema_version") != feature_schema_version:
+        raise ArtifactError(
+            f"Artifact feature schema {manifest.get('feature_schema_version')} "
+            f"does not match {feature_schema_version}"
+        )
+
+    if verify:
+        for filename, checksum in manifest["checksums"].items():
+            if _sha256(os.path.join(path, filename)) != checksum:
+                raise ArtifactError(f"Checksum mismatch for {filename} in {path}")
+
+    compressed = None
+    if manifest["storage"] == "compressed":
+        compressed = np.load(os.path.join(path, COLD_STORAGE_FILE), allow_pickle=False)
+
+    models = {}
+    for name, entry in manifest["models"].items():
+        if entry["kind"] == "joblib":
+            models[name] = joblib.load(os.path.join(path, entry["file"]), mmap_mode=mmap_mode)
+            continue
+
+        arrays = {}
+        for array_name in entry["arrays"]:
+            key = f"{name}.{array_name}"
+            if compressed is not None:
+                arrays[array_name] = compressed[key]
+            else:
+                arrays[array_name] = np.load(os.path.join(path, f"{key}.npy"), mmap_mode=mmap_mode, allow_pickle=False)
+        models[name] = _LOADERS[entry["kind"]](arrays, entry["params"])
+
+    return models
+
+
+def compress_artifact(path: str) -> None:
+    """Rewrites a memory-mappable artifact as compressed cold storage"""
+    manifest = read_manifest(path)
+    if manifest is None or manifest["storage"] == "compressed":
+        return
+
+    arrays = {}
+    for name, entry in manifest["models"].items():
+        for array_name in entry.get("arrays", []):
+            key = f"{name}.{array_name}"
+            arrays[key] = np.load(os.path.join(path, f"{key}.npy"), allow_pickle=False)
+
+    np.savez_compressed(os.path.join(path, COLD_STORAGE_FILE), **arrays)
+    for key in arrays:
+        os.remove(os.path.join(path, f"{key}.npy"))
+
+    manifest["storage"] = "compressed"
+    manifest["checksums"] = {
+        filename: checksum for filename, checksum in manifest["checksums"].items()
+        if not filename.endswith(".npy")
+    }
+    manifest["checksums"][COLD_STORAGE_FILE] = _sha256(os.path.join(path, COLD_STORAGE_FILE))
+    with open(os.path.join(path, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def _sha256(filename: str) -> str:
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,208 @@
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+from infrastructure.ml.model_artifacts import (
+    ArtifactError,
+    compress_artifact,
+    load_models,
+    read_manifest,
+    save_models
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows: o ponteiro LATEST é atualizado sem trava entre processos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ATHLETE_ID = "default"
+LATEST_FILE = "LATEST"
+
+_ATHLETE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+
+@lru_cache()
+def get_model_registry():
+    return ModelRegistry(
+        base_path=os.getenv("MODEL_PATH", "models/"),
+        max_bytes=int(os.getenv("MODEL_CACHE_MAX_BYTES", 256 * 1024 * 1024)),
+        compress=os.getenv("MODEL_ARTIFACT_COMPRESS", "false").lower() == "true",
+        verify_checksums=os.getenv("MODEL_VERIFY_CHECKSUMS", "true").lower() == "true"
+    )
+
+
+class ModelRegistry:
+    """Stores trained models per athlete under versioned paths and keeps
+    the most recently used ones in a memory-budgeted LRU cache.
+
+    Layout: <base_path>/<athlete_id>/v0001/ holding a flat-array artifact
+    (see model_artifacts), with a LATEST file per athlete pointing to the
+    current version. Artifacts are memory-mapped on load, so workers forked
+    from the same parent share the model pages.
+    """
+
+    def __init__(self, base_path: str = "models/", max_bytes: int = 256 * 1024 * 1024,
+                 compress: bool = False, verify_checksums: bool = True):
+        self.base_path = base_path
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.verify_checksums = verify_checksums
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def athlete_path(self, athlete_id: Optional[str]) -> str:
+        athlete_id = athlete_id or DEFAULT_ATHLETE_ID
+        if not _ATHLETE_ID_PATTERN.match(athlete_id):
+            raise ValueError(f"Invalid athlete id: {athlete_id!r}")
+        return os.path.join(self.base_path, athlete_id)
+
+    def version_path(self, athlete_id: Optional[str], version: int) -> str:
+        return os.path.join(self.athlete_path(athlete_id), f"v{version:04d}")
+
+    def latest_version(self, athlete_id: Optional[str]) -> Optional[int]:
+        """Returns the current model version of an athlete, if any"""
+        try:
+            with open(os.path.join(self.athlete_path(athlete_id), LATEST_FILE)) as f:
+                return int(f.read().strip())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def save(self, athlete_id: Optional[str], models: Dict[str, Any], feature_schema_version: int) -> int:
+        """Persists a new model version and makes it the current one.
+
+        Concurrent trainers of the same athlete (API and batch runner, in
+        different processes) each claim their own version directory: it is
+        created with exist_ok=False, so only one of them gets a given number.
+        """
+        athlete_id = athlete_id or DEFAULT_ATHLETE_ID
+        version, path = self._claim_version(athlete_id)
+        save_models(path, models, feature_schema_version, compress=self.compress)
+
+        # Atualiza o ponteiro de forma atômica para não expor versões incompletas;
+        # um treino mais lento não volta o ponteiro para uma versão anterior
+        latest_path = os.path.join(self.athlete_path(athlete_id), LATEST_FILE)
+        with self._pointer_lock(athlete_id):
+            if version < (self.latest_version(athlete_id) or 0):
+                logger.info(f"Models for athlete {athlete_id} saved as version {version}, a newer one is current")
+                return version
+            tmp_path = f"{latest_path}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(str(version))
+            os.replace(tmp_path, latest_path)
+
+        # Recarrega do disco para que o cache guarde a versão mapeada em memória
+        self.evict(athlete_id)
+        logger.info(f"Saved models for athlete {athlete_id} (version {version})")
+        return version
+
+    @contextmanager
+    def _pointer_lock(self, athlete_id: str):
+        """Exclusive lock (across processes) around reading and moving the LATEST pointer"""
+        with open(os.path.join(self.athlete_path(athlete_id), f"{LATEST_FILE}.lock"), "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _claim_version(self, athlete_id: str) -> Tuple[int, str]:
+        version = (self.latest_version(athlete_id) or 0) + 1
+        while True:
+            path = self.version_path(athlete_id, version)
+            try:
+                os.makedirs(path, exist_ok=False)
+                return version, path
+            except FileExistsError:
+                # Outro treino já criou esta versão (ou um treino anterior falhou no meio)
+                version += 1
+
+    def load(self, athlete_id: Optional[str], feature_schema_version: int) -> Optional[Dict[str, Any]]:
+        """Returns the current models of an athlete, loading them on demand.
+
+        Returns None when there is no usable version (never trained, corrupted
+        or trained on another feature schema), so the caller can retrain.
+        """
+        athlete_id = athlete_id or DEFAULT_ATHLETE_ID
+        version = self.latest_version(athlete_id)
+        if version is None:
+            return None
+
+        with self._lock:
+            entry = self._cache.get(athlete_id)
+            if entry and entry[0] == version:
+                self._cache.move_to_end(athlete_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        path = self.version_path(athlete_id, version)
+        try:
+            models = load_models(path, feature_schema_version, verify=self.verify_checksums)
+        except (ArtifactError, FileNotFoundError) as e:
+            logger.warning(f"Could not load models for athlete {athlete_id}: {str(e)}")
+            return None
+
+        self._put(athlete_id, version, models, self._directory_size(path))
+        return models
+
+    def archive_old_versions(self, athlete_id: Optional[str], keep: int = 1) -> int:
+        """Compresses all but the newest `keep` versions into cold storage"""
+        latest = self.latest_version(athlete_id)
+        if latest is None:
+            return 0
+
+        archived = 0
+        for version in range(1, latest - keep + 1):
+            path = self.version_path(athlete_id, version)
+            manifest = read_manifest(path)
+            if manifest and manifest["storage"] != "compressed":
+                compress_artifact(path)
+                archived += 1
+        return archived
+
+    def evict(self, athlete_id: Optional[str]) -> None:
+        """Drops an athlete's models from memory (files are kept)"""
+        with self._lock:
+            entry = self._cache.pop(athlete_id or DEFAULT_ATHLETE_ID, None)
+            if entry:
+                self._cache_bytes -= entry[2]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "athletes_cached": len(self._cache),
+                "cached_bytes": self._cache_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+    def _put(self, athlete_id: str, version: int, models: Dict[str, Any], size: int) -> None:
+        with self._lock:
+            previous = self._cache.pop(athlete_id, None)
+            if previous:
+                self._cache_bytes -= previous[2]
+
+            self._cache[athlete_id] = (version, models, size)
+            self._cache_bytes += size
+
+            # Remove os atletas menos usados até caber no orçamento,
+            # mantendo sempre ao menos o modelo recém carregado
+            while self._cache_bytes > self.max_bytes and len(self._cache) > 1:
+                evicted_id, (_, _, evicted_size) = self._cache.popitem(last=False)
+                self._cache_bytes -= evicted_size
+                self.evictions += 1
+                logger.debug("Evicted models for athlete %s", evicted_id)
+
+    @staticmethod
+    def _directory_size(path: str) -> int:
+        return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
@@ -1,6 +1,8 @@
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Any, List, Optional, Tuple
 from domain.models.activity import Activity
+from infrastructure.ml.model_registry import DEFAULT_ATHLETE_ID
 
 class ActivityRepository:
     def __init__(self, db: Session):
@@ -9,6 +11,32 @@ class ActivityRepository:
     def get_all(self) -> List[Activity]:
         return self.db.query(Activity).all()
 
+    def get_by_athlete(self, athlete_id: Optional[str]) -> List[Activity]:
+        return self.db.query(Activity).filter(self._athlete_filter(athlete_id)).all()
+
+    def get_athlete_ids(self) -> List[Optional[str]]:
+        """Distinct athletes with stored activities (None is the default athlete)"""
+        return [row[0] for row in self.db.query(Activity.athlete_id).distinct().all()]
+
+    def get_version(self, athlete_id: Optional[str]) -> Tuple[Any, ...]:
+        """(count, highest row id, latest start time) of the athlete's activities, from one aggregate query"""
+        query = self.db.query(func.count(Activity.id), func.max(Activity.id), func.max(Activity.start_time))
+        return tuple(query.filter(self._athlete_filter(athlete_id)).one())
+
+    @staticmethod
+    def stored_athlete_id(athlete_id: Optional[str]) -> Optional[str]:
+        """Value of the athlete_id column: the default athlete, by None or by name, is stored as NULL"""
+        return None if athlete_id in (None, DEFAULT_ATHLETE_ID) else athlete_id
+
+    @classmethod
+    def _athlete_filter(cls, athlete_id: Optional[str]):
+        # Atividades antigas não têm atleta associado e pertencem ao atleta padrão (athlete_id nulo),
+        # o mesmo que os modelos, resumos e caches guardam sob DEFAULT_ATHLETE_ID
+        athlete_id = cls.stored_athlete_id(athlete_id)
+        if athlete_id is None:
+            return Activity.athlete_id.is_(None)
+        return Activity.athlete_id == athlete_id
+
     def save(self, activity: Activity) -> Activity:
         self.db.add(activity)
         self.db.commit()
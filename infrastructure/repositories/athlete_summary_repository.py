@@ -0,0 +1,15 @@
+from sqlalchemy.orm import Session
+from typing import Optional
+from domain.models.athlete_summary import AthleteSummary
+
+class AthleteSummaryRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get(self, athlete_id: str) -> Optional[AthleteSummary]:
+        return self.db.get(AthleteSummary, athlete_id)
+
+    def save(self, summary: AthleteSummary) -> AthleteSummary:
+        summary = self.db.merge(summary)
+        self.db.commit()
+        return summary
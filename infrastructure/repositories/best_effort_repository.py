@@ -0,0 +1,24 @@
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from domain.models.best_effort import ActivityBestEfforts
+
+class BestEffortRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get(self, activity_id: str) -> Optional[ActivityBestEfforts]:
+        return self.db.get(ActivityBestEfforts, activity_id)
+
+    def get_by_athlete(self, athlete_id: Optional[str]) -> List[ActivityBestEfforts]:
+        """Stored curves of an athlete, oldest first"""
+        return (
+            self.db.query(ActivityBestEfforts)
+            .filter(ActivityBestEfforts.athlete_id == athlete_id)
+            .order_by(ActivityBestEfforts.start_time)
+            .all()
+        )
+
+    def save(self, record: ActivityBestEfforts) -> ActivityBestEfforts:
+        record = self.db.merge(record)
+        self.db.commit()
+        return record
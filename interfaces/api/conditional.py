@@ -0,0 +1,68 @@
+from datetime import date, datetime, time, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, List, Optional, Sequence
+import hashlib
+import os
+from fastapi import Request, Response
+from application.services.data_versions import DataVersion
+
+# Muda o ETag de todas as análises quando a lógica de análise muda sem mudança nos dados
+ANALYSIS_VERSION = os.getenv("ANALYSIS_VERSION", "1")
+# Por quanto tempo (s) o cliente pode reutilizar uma resposta sem revalidar
+CACHE_MAX_AGE = int(os.getenv("API_CACHE_MAX_AGE", 0))
+
+
+class Validators:
+    """ETag and Last-Modified of a response, derived from the versions of the data behind it"""
+
+    def __init__(self, parts: List[Any], last_modified: Optional[datetime] = None):
+        digest = hashlib.sha1(repr((ANALYSIS_VERSION, parts)).encode()).hexdigest()[:24]
+        self.etag = f'"{digest}"'
+        # Last-Modified tem resolução de segundos
+        self.last_modified = last_modified.astimezone(timezone.utc).replace(microsecond=0) if last_modified else None
+
+    @classmethod
+    def of(cls, version: DataVersion, parts: Sequence[Any], daily: bool = False) -> "Validators":
+        """Validators of a response built from data at `version`.
+
+        daily marks responses that also depend on today's date (rolling
+        windows, load decay): their ETag changes and Last-Modified moves
+        forward when the day turns, even without new data.
+        """
+        if not daily:
+            return cls([version.marker, *parts], version.changed_at)
+        return cls([version.marker, date.today().isoformat(), *parts], max(version.changed_at, start_of_today()))
+
+    def headers(self) -> Dict[str, str]:
+        headers = {"ETag": self.etag, "Cache-Control": f"private, max-age={CACHE_MAX_AGE}, must-revalidate"}
+        if self.last_modified:
+            headers["Last-Modified"] = format_datetime(self.last_modified, usegmt=True)
+        return headers
+
+    def matches(self, request: Request) -> bool:
+        """True when the client's copy is current; If-None-Match wins over If-Modified-Since (RFC 9110)"""
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or self.etag in tags
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and self.last_modified:
+            try:
+                return self.last_modified <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+
+def start_of_today() -> datetime:
+    """Local midnight of today, timezone-aware, as the Last-Modified floor of day-dependent responses"""
+    return datetime.combine(date.today(), time.min).astimezone()
+
+
+def conditional(request: Request, response: Response, validators: Validators) -> Optional[Response]:
+    """Adds the validators to `response`; returns a 304 to send instead when the client's copy is current"""
+    headers = validators.headers()
+    if validators.matches(request):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
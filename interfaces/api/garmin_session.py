@@ -0,0 +1,39 @@
+from typing import Optional
+import logging
+from fastapi import HTTPException
+from application.services.auth_service import AuthenticationService, get_auth_service
+from infrastructure.garmin.garmin_connector import GarminConnector
+
+logger = logging.getLogger(__name__)
+
+class GarminSession:
+    """Garmin connector of one request, authenticated on first use.
+
+    Routes that may call Garmin declare it with Depends(garmin_session);
+    routes without it never touch the session. Authentication only happens
+    when the handler actually asks for the connector, so requests answered
+    from the database or from a cache (304) pay nothing for it. All
+    sessions share the process-wide AuthenticationService.
+    """
+
+    def __init__(self, auth_service: AuthenticationService):
+        self.auth_service = auth_service
+        self._connector: Optional[GarminConnector] = None
+
+    async def connector(self) -> GarminConnector:
+        if self._connector is None:
+            try:
+                await self.auth_service.ensure_authentication()
+            except Exception as e:
+                logger.error(f"Authentication error: {str(e)}")
+                if "Too Many Requests" in str(e):
+                    raise HTTPException(
+                        status_code=429,
+                        detail="Too many requests to Garmin. Please try again in a few minutes."
+                    )
+                raise HTTPException(status_code=401, detail="Authentication failed")
+            self._connector = self.auth_service.connector
+        return self._connector
+
+def garmin_session() -> GarminSession:
+    return GarminSession(get_auth_service())
@@ -1,24 +1,52 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from infrastructure.garmin.garmin_connector import get_garmin_connector, GarminConnector
-from .middleware import GarminSessionMiddleware
-from application.services.auth_service import AuthenticationService
+from fastapi.responses import StreamingResponse
+from domain.entities.activity_frame import ActivityFrame
+from .conditional import Validators, conditional
+from .garmin_session import GarminSession, garmin_session
+from .streaming import NDJSON_MEDIA_TYPE, SSE_HEADERS, json_response, ndjson_chunks, sse_event, wants_ndjson
+from application.services.auth_service import get_auth_service
 from application.services.trend_analyzer import TrendAnalyzer
-from application.services.ml_analyzer import MLAnalyzer
-from application.services.llm_analyzer import LLMAnalyzer
-from application.services.hybrid_analyzer import HybridAnalyzer
+from application.services.trend_engine import get_trend_states
+from application.services.split_analytics import SplitAnalyticsEngine, SplitArrays
+from application.services.percentile_store import PercentileStore, get_percentile_store
+from application.services.ml_analyzer import FEATURE_SCHEMA_VERSION, MLAnalyzer
+from application.services.llm_analyzer import ROUTING_MODES, LLMAnalyzer
+from application.services.hybrid_analyzer import HybridAnalyzer, HybridAnalysisRun
+from infrastructure.llm.chat_providers import close_chat_providers
+from infrastructure.llm.hedged_router import get_hedged_router
 from sqlalchemy.orm import Session
 from infrastructure.database import SessionLocal
 from infrastructure.repositories.activity_repository import ActivityRepository
+from infrastructure.repositories.athlete_summary_repository import AthleteSummaryRepository
+from application.services.incremental_summary import INCREMENTAL_MAX_ACTIVITIES, IncrementalSummaryService
+from application.services.batch_report_runner import BatchReportRunner, RUN_FILE, validate_run_id
+from application.services.best_efforts import BestEffortsService
+from infrastructure.repositories.best_effort_repository import BestEffortRepository
 from application.services.data_initialization_service import DataInitializationService
+from application.services.data_versions import DataVersion, get_data_versions
 from infrastructure.database_init import init_database
+from infrastructure.ml.model_registry import DEFAULT_ATHLETE_ID
+import asyncio
+import json
 import logging
+import os
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from datetime import datetime
+from typing import Dict, List, Optional
 
 # Inicializa o banco de dados na inicialização da aplicação
 init_database()
 
-app = FastAPI(title="Garmin AI Coach")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Os clientes HTTP dos provedores de LLM pertencem ao loop do servidor
+    await close_chat_providers()
+
+app = FastAPI(title="Garmin AI Coach", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,16 +56,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-garmin_connector = get_garmin_connector()
+auth_service = get_auth_service()
 
-app.add_middleware(GarminSessionMiddleware)
+trend_analyzer = TrendAnalyzer()
 
-auth_service = AuthenticationService()
+split_analytics = SplitAnalyticsEngine()
 
-trend_analyzer = TrendAnalyzer()
+data_versions = get_data_versions()
 
 logger = logging.getLogger(__name__)
 
+# Execuções em lote iniciadas por este processo, por run_id
+batch_runs: Dict[str, BatchReportRunner] = {}
+batch_tasks = set()
+BATCH_REPORTS_DIR = os.getenv("BATCH_REPORTS_DIR", "reports")
+
+# Análises híbridas com o estágio de LLM ainda em andamento (defer_llm=true)
+pending_analyses: "OrderedDict[str, HybridAnalysisRun]" = OrderedDict()
+PENDING_ANALYSES_MAX = int(os.getenv("HYBRID_PENDING_MAX", 100))
+
 def get_db():
     db = SessionLocal()
     try:
@@ -48,12 +85,37 @@ def get_db():
 def get_activity_repository(db: Session = Depends(get_db)):
     return ActivityRepository(db)
 
-def get_ml_analyzer(repository: ActivityRepository = Depends(get_activity_repository)):
-    return MLAnalyzer(repository)
+def get_ml_analyzer(
+    athlete_id: Optional[str] = None,
+    repository: ActivityRepository = Depends(get_activity_repository)
+):
+    return MLAnalyzer(repository, athlete_id=athlete_id)
 
 def get_llm_analyzer(repository: ActivityRepository = Depends(get_activity_repository)):
     return LLMAnalyzer(repository)
 
+async def garmin_validators(garmin: GarminSession, *parts, daily: bool = False) -> Validators:
+    """Validators of a response built from the latest Garmin activities"""
+    async def latest_marker():
+        return await (await garmin.connector()).get_latest_marker()
+
+    version = await data_versions.garmin(latest_marker)
+    return Validators.of(version, parts, daily)
+
+def stored_validators(athlete_id: Optional[str], repository: ActivityRepository, *parts,
+                      daily: bool = False, version: Optional[DataVersion] = None) -> Validators:
+    """Validators of a response built from the athlete's stored activities"""
+    version = version or data_versions.stored(athlete_id, repository)
+    return Validators.of(version, parts, daily)
+
+def check_routing(routing: Optional[str]) -> None:
+    """Rejects an unknown LLM routing mode before any work is done"""
+    if routing is not None and routing not in ROUTING_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown LLM routing mode: {routing}; expected one of {', '.join(ROUTING_MODES)}")
+
+def model_version(ml_analyzer: MLAnalyzer):
+    return (ml_analyzer.model_registry.latest_version(ml_analyzer.athlete_id), FEATURE_SCHEMA_VERSION)
+
 @app.get("/auth/status")
 async def get_auth_status():
     """Get the authentication status"""
@@ -75,18 +137,39 @@ async def refresh_auth():
 
 @app.get("/activities")
 async def get_activities(
+    request: Request,
     limit: int = 50,
-    garmin_connector: GarminConnector = Depends(get_garmin_connector)
+    format: Optional[str] = None,
+    garmin: GarminSession = Depends(garmin_session)
 ):
-    """Get activities"""
+    """Get running activities; format=ndjson (or Accept: application/x-ndjson) streams one per line"""
+    def running(page):
+        return [activity.dict() for activity in page if activity.activity_type.lower() == "running"]
+
     try:
-        activities = await garmin_connector.get_activities(limit=limit)
-        running_activities = [
-            activity.dict()
-            for activity in activities
-            if activity.activity_type.lower() == "running"
-        ]
-        return running_activities
+        ndjson = wants_ndjson(request, format)
+        validators = await garmin_validators(garmin, "activities", limit, ndjson)
+        # A representação depende do Accept
+        headers = {**validators.headers(), "Vary": "Accept"}
+        if validators.matches(request):
+            return Response(status_code=304, headers=headers)
+
+        garmin_connector = await garmin.connector()
+
+        if not ndjson:
+            activities = await garmin_connector.get_activities(limit=limit)
+            response = json_response(running(activities))
+            response.headers.update(headers)
+            return response
+
+        pages = garmin_connector.iter_activities(limit=limit)
+        # A primeira página é buscada antes de responder para que falhas virem status HTTP
+        try:
+            first_page = await pages.__anext__()
+        except StopAsyncIteration:
+            first_page = []
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting activities: {str(e)}")
         if "Too Many Requests" in str(e):
@@ -96,27 +179,50 @@ async def get_activities(
             )
         raise HTTPException(status_code=500, detail=str(e))
 
+    async def running_pages():
+        yield running(first_page)
+        try:
+            async for page in pages:
+                yield running(page)
+        except Exception as e:
+            # Com o stream já iniciado, só resta interromper a resposta
+            logger.error(f"Error streaming activities: {str(e)}")
+            raise
+
+    return StreamingResponse(ndjson_chunks(running_pages()), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+
 @app.get("/latest-activity")
-async def get_latest_activity():
+async def get_latest_activity(
+    request: Request,
+    response: Response,
+    garmin: GarminSession = Depends(garmin_session)
+):
     """Get latest activity"""
     try:
-        activity = await garmin_connector.get_latest_activity()
+        not_modified = conditional(request, response, await garmin_validators(garmin, "latest-activity"))
+        if not_modified:
+            return not_modified
+        activity = await (await garmin.connector()).get_latest_activity()
         if activity is None:
             raise HTTPException(status_code=404, detail="No activity found")
         return activity
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
 @app.get("/activity-details/{activity_id}")
 async def get_activity_details(
     activity_id: int,
-    garmin_connector: GarminConnector = Depends(get_garmin_connector)
+    garmin: GarminSession = Depends(garmin_session)
 ):
     try:
-        details = await garmin_connector.get_activity_details(activity_id)
+        details = await (await garmin.connector()).get_activity_details(activity_id)
         if not details:
             raise HTTPException(status_code=404, detail="Activity not found")
         return details
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting activity details: {str(e)}")
         if "Too Many Requests" in str(e):
@@ -127,44 +233,101 @@ async def get_activity_details(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/analysis/weekly-summary")
-async def get_weekly_summary():
-    """Get weekly summary of workouts"""
-    activities = await garmin_connector.get_weekly_activities()
-    analysis = trend_analyzer.analyze_weekly_trends(activities)
-    return analysis
+async def get_weekly_summary(
+    request: Request,
+    response: Response,
+    athlete_id: Optional[str] = None,
+    repository: ActivityRepository = Depends(get_activity_repository),
+    garmin: GarminSession = Depends(garmin_session)
+):
+    """Get weekly summary of workouts from the athlete's rolling trend windows"""
+    version = data_versions.stored(athlete_id, repository)
+    if version.marker[0]:
+        validators = stored_validators(athlete_id, repository, "weekly-summary", daily=True, version=version)
+    else:
+        # Sem atividades no banco o resumo vem do Garmin
+        validators = await garmin_validators(garmin, "weekly-summary", daily=True)
+    not_modified = conditional(request, response, validators)
+    if not_modified:
+        return not_modified
+
+    states = get_trend_states()
+    key = athlete_id or DEFAULT_ATHLETE_ID
+    state = states.get(key)
+    if state is None:
+        activities = repository.get_by_athlete(athlete_id)
+        if not activities:
+            # Sem dados no banco: usa as atividades recentes do Garmin sem guardar o estado
+            frame = await (await garmin.connector()).get_activity_frame(limit=100)
+            return trend_analyzer.analyze_weekly_trends(frame)
+        state = states[key] = trend_analyzer.engine.build_state(activities)
+    return trend_analyzer.analyze_weekly_trends([], state=state)
+
+@app.get("/analysis/splits")
+async def get_split_analytics(
+    request: Request,
+    response: Response,
+    athlete_id: Optional[str] = None,
+    repository: ActivityRepository = Depends(get_activity_repository)
+):
+    """Get pacing metrics (fade, negative split, variability, grade-adjusted pace) of every stored run"""
+    not_modified = conditional(request, response, stored_validators(athlete_id, repository, "splits"))
+    if not_modified:
+        return not_modified
+    activities = [a for a in repository.get_by_athlete(athlete_id) if a.splits]
+    if not activities:
+        raise HTTPException(status_code=404, detail="No activities with splits found")
+    return split_analytics.summary(SplitArrays.from_activities(activities))
 
 @app.get("/analysis/training-patterns")
 async def get_training_patterns(
-    ml_analyzer: MLAnalyzer = Depends(get_ml_analyzer)
+    request: Request,
+    response: Response,
+    ml_analyzer: MLAnalyzer = Depends(get_ml_analyzer),
+    garmin: GarminSession = Depends(garmin_session)
 ):
     """Get training patterns identified"""
-    activities = await garmin_connector.get_activities(limit=50)
+    validators = await garmin_validators(garmin, "training-patterns", model_version(ml_analyzer))
+    not_modified = conditional(request, response, validators)
+    if not_modified:
+        return not_modified
+    activities = await (await garmin.connector()).get_activities(limit=50)
     patterns = ml_analyzer.analyze_patterns(activities)
     return patterns
 
 @app.post("/initialize-data")
 async def initialize_data(
     limit: int = 100,
+    athlete_id: Optional[str] = None,
+    best_efforts: bool = False,
     db: Session = Depends(get_db),
-    repository: ActivityRepository = Depends(get_activity_repository)
+    repository: ActivityRepository = Depends(get_activity_repository),
+    garmin: GarminSession = Depends(garmin_session)
 ):
-    """Initialize database with Garmin data"""
-    garmin_connector = get_garmin_connector()
-    service = DataInitializationService(db, repository, garmin_connector)
+    """Initialize database with Garmin data, optionally computing best-effort curves from the streams"""
+    garmin_connector = await garmin.connector()
+    best_efforts_service = BestEffortsService(BestEffortRepository(db)) if best_efforts else None
+    service = DataInitializationService(db, repository, garmin_connector, best_efforts_service)
     
     try:
-        count = await service.initialize_data(limit)
+        count = await service.initialize_data(limit, athlete_id=athlete_id)
         return {"message": f"Successfully initialized {count} activities"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/analysis/initial")
 async def get_initial_analysis(
+    request: Request,
+    response: Response,
     ml_analyzer: MLAnalyzer = Depends(get_ml_analyzer),
     repository: ActivityRepository = Depends(get_activity_repository)
 ):
     """Perform initial analysis of stored data"""
-    activities = repository.get_all()
+    validators = stored_validators(ml_analyzer.athlete_id, repository, "initial", model_version(ml_analyzer))
+    not_modified = conditional(request, response, validators)
+    if not_modified:
+        return not_modified
+    activities = repository.get_by_athlete(ml_analyzer.athlete_id)
     if not activities:
         raise HTTPException(status_code=404, detail="No activities found")
     
@@ -176,18 +339,28 @@ async def get_initial_analysis(
 
 @app.get("/analysis/smart")
 async def smart_analysis(
+    request: Request,
+    response: Response,
+    limit: int = 10,
+    routing: Optional[str] = None,
     db: Session = Depends(get_db),
-    garmin_connector: GarminConnector = Depends(get_garmin_connector)
+    garmin: GarminSession = Depends(garmin_session)
 ):
     """Get smart analysis from GPT-4"""
+    check_routing(routing)
     try:
-        activities = await garmin_connector.get_activities(limit=10)
-        llm_analyzer = LLMAnalyzer()
+        validators = await garmin_validators(garmin, "smart", limit, routing)
+        not_modified = conditional(request, response, validators)
+        if not_modified:
+            return not_modified
+        activities = await (await garmin.connector()).get_activities(limit=limit)
+        llm_analyzer = LLMAnalyzer(routing=routing)
         analysis = await llm_analyzer.analyze_activities(activities)
-        
-        print("Smart Analysis Response:", analysis)  # Para debug
+        logger.debug("Smart analysis of %d activities", len(activities))
         return analysis
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in smart analysis: {str(e)}")
         raise HTTPException(
@@ -195,73 +368,275 @@ async def smart_analysis(
             detail={"status": "error", "message": str(e)}
         )
 
+@app.get("/analysis/incremental")
+async def incremental_analysis(
+    athlete_id: Optional[str] = None,
+    limit: int = 10,
+    routing: Optional[str] = None,
+    db: Session = Depends(get_db),
+    garmin: GarminSession = Depends(garmin_session)
+):
+    """Update the athlete's rolling summary with activities since the last call"""
+    check_routing(routing)
+    try:
+        # limit é o tamanho da página; as páginas seguem até a última atividade já resumida
+        pages = (await garmin.connector()).iter_activities(limit=INCREMENTAL_MAX_ACTIVITIES, page_size=max(limit, 1))
+        service = IncrementalSummaryService(LLMAnalyzer(routing=routing), AthleteSummaryRepository(db))
+        return await service.analyze_pages(pages, athlete_id=athlete_id)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in incremental analysis: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail={"status": "error", "message": str(e)}
+        )
+
+@app.get("/analysis/smart/stream")
+async def smart_analysis_stream(
+    request: Request,
+    provider: str = "openai",
+    limit: int = 10,
+    garmin: GarminSession = Depends(garmin_session)
+):
+    """Stream the smart analysis as server-sent events.
+
+    Sends a "start" event immediately, then one "token" event per chunk and
+    a final "done" event with metadata. The upstream LLM stream is closed as
+    soon as the client disconnects.
+    """
+    llm_analyzer = LLMAnalyzer()
+    if provider not in llm_analyzer.providers:
+        raise HTTPException(status_code=400, detail=f"Unknown provider: {provider}")
+    # Autentica antes de abrir o stream, enquanto falhas ainda podem virar status HTTP
+    garmin_connector = await garmin.connector()
+
+    async def event_stream():
+        yield sse_event({"provider": provider}, event="start")
+        events = None
+        try:
+            activities = await garmin_connector.get_activities(limit=limit)
+            events = llm_analyzer.stream_analysis(activities, provider=provider)
+            async for event in events:
+                if await request.is_disconnected():
+                    logger.info("Client disconnected, closing LLM stream")
+                    break
+                if event["type"] == "token":
+                    yield sse_event({"token": event["content"]})
+                else:
+                    yield sse_event(event["metadata"], event="done")
+        except Exception as e:
+            logger.error(f"Error in streamed smart analysis: {str(e)}")
+            yield sse_event({"status": "error", "message": str(e)}, event="error")
+        finally:
+            if events is not None:
+                await events.aclose()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.get("/analysis/llm-latency")
+async def get_llm_latency():
+    """Get per-provider LLM latency histograms and hedging counters"""
+    return get_hedged_router().stats()
+
 @app.get("/analysis/hybrid")
 async def get_hybrid_analysis(
+    request: Request,
+    response: Response,
+    defer_llm: bool = False,
     ml_analyzer: MLAnalyzer = Depends(get_ml_analyzer),
     llm_analyzer: LLMAnalyzer = Depends(get_llm_analyzer),
     repository: ActivityRepository = Depends(get_activity_repository)
 ):
-    """Get combined ML and LLM analysis"""
-    activities = repository.get_all()
+    """Get combined ML and LLM analysis.
+
+    With defer_llm=true the ML and metrics results are returned as soon as
+    they are ready, together with an analysis_id; the LLM insights are then
+    fetched from /analysis/hybrid/{analysis_id}.
+    """
+    # Respostas adiadas trazem um analysis_id novo a cada chamada e não são validadas
+    if not defer_llm:
+        validators = stored_validators(
+            ml_analyzer.athlete_id, repository, "hybrid", model_version(ml_analyzer), daily=True
+        )
+        not_modified = conditional(request, response, validators)
+        if not_modified:
+            return not_modified
+
+    activities = repository.get_by_athlete(ml_analyzer.athlete_id)
     if not activities:
         raise HTTPException(status_code=404, detail="No activities found")
     
-    hybrid_analyzer = HybridAnalyzer(ml_analyzer, llm_analyzer)
-    analysis = await hybrid_analyzer.analyze_activities(activities)
+    frame = ActivityFrame.from_records(activities)
+    hybrid_analyzer = HybridAnalyzer(
+        ml_analyzer, llm_analyzer, percentile_store=_percentile_store_for(ml_analyzer.athlete_id, frame)
+    )
+    run = hybrid_analyzer.start(frame)
+    if not defer_llm:
+        return await run.result()
+
+    analysis = await run.partial()
+    analysis["analysis_id"] = _register_pending_analysis(run)
+    return analysis
+
+@app.get("/analysis/hybrid/stream")
+async def stream_hybrid_analysis(
+    request: Request,
+    ml_analyzer: MLAnalyzer = Depends(get_ml_analyzer),
+    llm_analyzer: LLMAnalyzer = Depends(get_llm_analyzer),
+    repository: ActivityRepository = Depends(get_activity_repository)
+):
+    """Stream the hybrid analysis as server-sent events, one event per finished stage"""
+    activities = repository.get_by_athlete(ml_analyzer.athlete_id)
+    if not activities:
+        raise HTTPException(status_code=404, detail="No activities found")
+
+    frame = ActivityFrame.from_records(activities)
+    run = HybridAnalyzer(
+        ml_analyzer, llm_analyzer, percentile_store=_percentile_store_for(ml_analyzer.athlete_id, frame)
+    ).start(frame)
+
+    async def event_stream():
+        try:
+            async for stage, payload in run.stages():
+                if await request.is_disconnected():
+                    logger.info("Client disconnected, cancelling hybrid analysis")
+                    break
+                yield sse_event(payload, event=stage)
+        finally:
+            run.cancel()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.get("/analysis/hybrid/{analysis_id}")
+async def get_pending_hybrid_analysis(analysis_id: str):
+    """Get a deferred hybrid analysis, complete once its LLM stage has finished"""
+    run = pending_analyses.get(analysis_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    if not run.llm_done:
+        return {"analysis_id": analysis_id, "status": "pending"}
+
+    try:
+        analysis = await run.result()
+    except Exception as e:
+        logger.error(f"Error in deferred hybrid analysis: {str(e)}")
+        raise HTTPException(status_code=500, detail={"status": "error", "message": str(e)})
+    analysis["analysis_id"] = analysis_id
     return analysis
 
+def _percentile_store_for(athlete_id: Optional[str], activities: ActivityFrame) -> PercentileStore:
+    """Shared percentile store, loaded with the athlete's stored history on first use"""
+    store = get_percentile_store()
+    if not store.has_athlete(athlete_id):
+        store.add(activities, athlete_id)
+    return store
+
+def _register_pending_analysis(run: HybridAnalysisRun) -> str:
+    analysis_id = uuid.uuid4().hex
+    pending_analyses[analysis_id] = run
+    # Descarta as análises mais antigas além do limite, cancelando o LLM que ainda estiver rodando
+    while len(pending_analyses) > PENDING_ANALYSES_MAX:
+        _, evicted = pending_analyses.popitem(last=False)
+        evicted.cancel()
+    return analysis_id
+
+@app.get("/records")
+async def get_personal_records(
+    athlete_id: Optional[str] = None,
+    window_days: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """Get all-time (or rolling-window) best efforts, keyed as <curve>:<distance or seconds>"""
+    try:
+        return BestEffortsService(BestEffortRepository(db)).records(athlete_id, window_days)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/activities/{activity_id}/best-efforts")
+async def get_activity_best_efforts(activity_id: str, db: Session = Depends(get_db)):
+    """Get the stored mean-maximal curves of one activity"""
+    record = BestEffortRepository(db).get(activity_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Best efforts not computed for this activity")
+    return {"activity_id": record.activity_id, "start_time": record.start_time.isoformat(), "curves": record.curves}
+
+@app.post("/jobs/reports")
+async def start_batch_reports(
+    athlete_ids: Optional[List[str]] = None,
+    run_id: Optional[str] = None,
+    resume: bool = True,
+    llm_concurrency: int = 4
+):
+    """Start a batch coaching-report run in the background.
+
+    Reusing the run_id of an interrupted run resumes it, skipping athletes
+    that already have a report checkpoint.
+    """
+    run_id = run_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+    _check_run_id(run_id)
+    if run_id in batch_runs and batch_runs[run_id].progress.get("status") == "running":
+        raise HTTPException(status_code=409, detail=f"Run {run_id} is already running")
+
+    runner = BatchReportRunner(output_dir=BATCH_REPORTS_DIR, llm_concurrency=llm_concurrency)
+    batch_runs[run_id] = runner
+    # Mantém referência à task para que não seja coletada antes de terminar
+    task = asyncio.create_task(runner.run(athlete_ids=athlete_ids, run_id=run_id, resume=resume))
+    batch_tasks.add(task)
+    task.add_done_callback(batch_tasks.discard)
+    task.add_done_callback(lambda done: _record_batch_failure(runner, run_id, done))
+    return {"run_id": run_id, "status": "started"}
+
+def _check_run_id(run_id: str) -> None:
+    try:
+        validate_run_id(run_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _record_batch_failure(runner: BatchReportRunner, run_id: str, task: asyncio.Task) -> None:
+    """Marks a run whose task died (e.g. listing athletes failed) as failed instead of running forever"""
+    if task.cancelled():
+        runner.progress.update({"run_id": run_id, "status": "cancelled"})
+        return
+    error = task.exception()
+    if error is not None:
+        logger.error(f"Batch run {run_id} failed: {str(error)}")
+        runner.progress.update({"run_id": run_id, "status": "failed", "error": str(error)})
+
+@app.get("/jobs/reports/{run_id}")
+async def get_batch_reports_status(run_id: str):
+    """Get progress and stage timings of a batch report run"""
+    _check_run_id(run_id)
+    if run_id in batch_runs:
+        return batch_runs[run_id].progress
+
+    run_file = os.path.join(BATCH_REPORTS_DIR, run_id, RUN_FILE)
+    if not os.path.exists(run_file):
+        raise HTTPException(status_code=404, detail="Run not found")
+    with open(run_file) as f:
+        return json.load(f)
+
 @app.get("/analysis/preview")
 async def preview_analysis(
+    request: Request,
+    response: Response,
+    limit: int = 10,
     db: Session = Depends(get_db),
-    garmin_connector: GarminConnector = Depends(get_garmin_connector)
+    garmin: GarminSession = Depends(garmin_session)
 ):
     """Preview the analysis prompt without sending to GPT-4"""
     try:
-        activities = await garmin_connector.get_activities(limit=10)
-        print("activities")
-        print(activities[0].dict())
-        running_activities = [a for a in activities if a.activity_type.lower() == "running"]
-        running_activities = running_activities[:10]
-        
+        not_modified = conditional(request, response, await garmin_validators(garmin, "preview", limit))
+        if not_modified:
+            return not_modified
+        activities = await (await garmin.connector()).get_activities(limit=limit)
+        logger.debug("Preview of %d activities", len(activities))
         llm_analyzer = LLMAnalyzer()
+        running_activities = llm_analyzer._select_running_activities(activities)
         context = llm_analyzer._prepare_activity_context(running_activities)
-        
-        system_message = """You are an experienced running coach specializing in training data analysis and periodization. 
-        Focus on practical insights and detailed analysis of running metrics including pace, heart rate, cadence, 
-        and training effect. Consider the relationship between these metrics and their impact on performance and recovery. This data is from Garmin device."""
-        
-        user_message = f"""
-        Analyze the last {len(running_activities)} running activities and provide:
-        
-        1. Progress:
-           - Pace evolution and consistency
-           - Distance progression
-           - Heart rate trends and zones
-           - Cadence analysis
-        
-        2. Training Load:
-           - Weekly volume and intensity
-           - Training effect and recovery needs
-           - VO2 Max trends
-           - Signs of fatigue or overload
-        
-        3. Technical Analysis:
-           - Pace distribution within runs
-           - Cadence optimization
-           - Heart rate response to pace changes
-           - Impact of environmental factors
-        
-        4. Recommendations:
-           - Volume/intensity adjustments
-           - Recovery strategies
-           - Technical improvements
-           - Suggested next goals
-        
-        Data from running activities:
-        {context}
-        
-        Please provide a detailed but practical analysis focusing on actionable insights.
-        """
+        system_message, user_message = llm_analyzer._build_messages(running_activities)
         analysis_send = {
             "system_message": system_message,
             "user_message": user_message,
@@ -274,9 +649,9 @@ async def preview_analysis(
                 }
             }
         }
-        print("analysis_send")
-        print(analysis_send)
         return analysis_send
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -0,0 +1,38 @@
+from typing import Any, AsyncIterator, Iterable, Optional
+from fastapi import Request, Response
+import json
+import orjson
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Evita que proxies (nginx) acumulem o stream em buffer
+    "X-Accel-Buffering": "no"
+}
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def sse_event(data: Any, event: Optional[str] = None) -> str:
+    """Formats one server-sent event frame with a JSON payload"""
+    frame = f"event: {event}\n" if event else ""
+    return f"{frame}data: {json.dumps(data, default=str)}\n\n"
+
+def json_bytes(data: Any) -> bytes:
+    """orjson encoding: datetimes as ISO 8601, NumPy values natively, anything else via str()"""
+    return orjson.dumps(data, default=str, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+def json_response(data: Any, status_code: int = 200) -> Response:
+    """Response encoded with orjson, skipping FastAPI's jsonable_encoder walk"""
+    return Response(content=json_bytes(data), status_code=status_code, media_type="application/json")
+
+def wants_ndjson(request: Request, format: Optional[str] = None) -> bool:
+    """True for ?format=ndjson or an Accept header asking for NDJSON"""
+    if format:
+        return format.lower() == "ndjson"
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+async def ndjson_chunks(pages: AsyncIterator[Iterable[Any]]) -> AsyncIterator[bytes]:
+    """One JSON document per line, one chunk per page so each page is flushed as soon as it is encoded"""
+    async for page in pages:
+        chunk = b"".join(json_bytes(item) + b"\n" for item in page)
+        if chunk:
+            yield chunk
@@ -0,0 +1,38 @@
+import sys
+import os
+import argparse
+import asyncio
+import json
+import logging
+
+# Adiciona o diretório raiz ao PYTHONPATH
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from application.services.batch_report_runner import BatchReportRunner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate hybrid coaching reports for many athletes")
+    parser.add_argument("--athletes", nargs="*", help="Athlete ids to process (default: every athlete in the database)")
+    parser.add_argument("--run-id", help="Run id; reuse it to resume an interrupted run")
+    parser.add_argument("--no-resume", action="store_true", help="Regenerate reports that already have a checkpoint")
+    parser.add_argument("--llm-concurrency", type=int, default=int(os.getenv("BATCH_LLM_CONCURRENCY", 4)))
+    parser.add_argument("--ml-workers", type=int, default=None, help="ML worker processes (default: CPU count)")
+    parser.add_argument("--athlete-concurrency", type=int, default=None,
+                        help="Athletes processed at once (default: ML workers + LLM concurrency)")
+    parser.add_argument("--output-dir", default=os.getenv("BATCH_REPORTS_DIR", "reports"))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    runner = BatchReportRunner(
+        output_dir=args.output_dir,
+        llm_concurrency=args.llm_concurrency,
+        ml_workers=args.ml_workers,
+        athlete_concurrency=args.athlete_concurrency
+    )
+    summary = asyncio.run(runner.run(athlete_ids=args.athletes, run_id=args.run_id, resume=not args.no_resume))
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
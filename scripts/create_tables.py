@@ -5,12 +5,17 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from sqlalchemy import create_engine
 from sqlalchemy.exc import SQLAlchemyError
 from infrastructure.database import Base, DATABASE_URL
+from infrastructure.database_init import migrate_database
 from domain.models.activity import Activity  # Importa o modelo para registrá-lo
+from domain.models.athlete_summary import AthleteSummary
+from domain.models.best_effort import ActivityBestEfforts
 
 def create_tables():
     try:
         engine = create_engine(DATABASE_URL)
         Base.metadata.create_all(bind=engine)
+        # Bancos criados antes de activities.athlete_id recebem a coluna
+        migrate_database(engine)
         print("Tabelas criadas com sucesso!")
     except SQLAlchemyError as e:
         print(f"Erro ao criar tabelas: {str(e)}")
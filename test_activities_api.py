@@ -0,0 +1,153 @@
+import asyncio
+import os
+from collections import OrderedDict
+from datetime import datetime
+import orjson
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi import Request
+from fastapi.testclient import TestClient
+from infrastructure.garmin.activity_converter import GarminActivityConverter
+from infrastructure.garmin import garmin_connector
+from infrastructure.garmin.garmin_connector import GarminConnector
+from interfaces.api.garmin_session import garmin_session
+from interfaces.api.main import app
+from interfaces.api.streaming import NDJSON_MEDIA_TYPE, json_response, ndjson_chunks, wants_ndjson
+
+class FakeGarminClient:
+    """Lista de atividades do Garmin em memória, paginada como a API"""
+
+    def __init__(self, count):
+        self.activities = [
+            {
+                "activityId": count - i,
+                "startTimeLocal": f"2024-03-{28 - i:02d} 07:00:00",
+                "activityType": {"typeKey": "cycling" if i % 3 == 2 else "running"},
+                "duration": 1800.0,
+                "distance": 6000.0
+            }
+            for i in range(count)
+        ]
+        self.requests = []
+
+    def get_activities(self, start, limit):
+        self.requests.append((start, limit))
+        return self.activities[start:start + limit]
+
+    def get_activity_details(self, activity_id):
+        self.requests.append(("details", activity_id))
+        return {
+            "metricDescriptors": [{"key": "directTimestamp", "metricsIndex": 0}, {"key": "directHeartRate", "metricsIndex": 1}],
+            "activityDetailMetrics": [{"metrics": [1000.0 * i, 140.0 + i]} for i in range(3)]
+        }
+
+def fake_connector(count):
+    # Sem __init__: não exige credenciais nem altera o singleton
+    connector = object.__new__(GarminConnector)
+    connector.client = FakeGarminClient(count)
+    connector.converter = GarminActivityConverter()
+    connector._auth_lock = asyncio.Lock()
+    connector._last_login = datetime.now()
+    connector._streams_cache = OrderedDict()
+    return connector
+
+class FakeSession:
+    def __init__(self, connector):
+        self._connector = connector
+
+    async def connector(self):
+        return self._connector
+
+def _request(accept=""):
+    return Request({"type": "http", "headers": [(b"accept", accept.encode())]})
+
+def test_json_response_and_wants_ndjson():
+    response = json_response({"when": datetime(2024, 3, 1, 7), 1: 2.5}, status_code=201)
+    assert response.status_code == 201 and response.media_type == "application/json"
+    assert orjson.loads(response.body) == {"when": "2024-03-01T07:00:00", "1": 2.5}
+
+    assert wants_ndjson(_request(NDJSON_MEDIA_TYPE))
+    assert not wants_ndjson(_request("application/json"))
+    # ?format= tem precedência sobre o Accept
+    assert not wants_ndjson(_request(NDJSON_MEDIA_TYPE), "json")
+    assert wants_ndjson(_request(), "NDJSON")
+
+def test_ndjson_chunks_one_chunk_per_non_empty_page():
+    async def pages():
+        yield [{"id": 1}, {"id": 2}]
+        yield []
+        yield [{"id": 3}]
+
+    async def collect():
+        return [chunk async for chunk in ndjson_chunks(pages())]
+
+    assert asyncio.run(collect()) == [b'{"id":1}\n{"id":2}\n', b'{"id":3}\n']
+
+def test_iter_activities_pages_until_limit():
+    connector = fake_connector(12)
+
+    async def collect():
+        return [[a.id for a in page] async for page in connector.iter_activities(limit=10, page_size=4)]
+
+    assert asyncio.run(collect()) == [[12, 11, 10, 9], [8, 7, 6, 5], [4, 3]]
+    assert connector.client.requests == [(0, 4), (4, 4), (8, 2)]
+
+def test_streams_cache_is_lru_bounded():
+    connector = fake_connector(0)
+
+    async def fetch(*activity_ids):
+        for activity_id in activity_ids:
+            await connector.get_activity_streams(activity_id)
+
+    size = garmin_connector.STREAMS_CACHE_SIZE
+    garmin_connector.STREAMS_CACHE_SIZE = 2
+    try:
+        asyncio.run(fetch(1, 2, 1, 3, 1))
+    finally:
+        garmin_connector.STREAMS_CACHE_SIZE = size
+    assert list(connector._streams_cache) == [3, 1]
+    assert [r[1] for r in connector.client.requests] == [1, 2, 3]
+    assert list(connector._streams_cache[1]["heart_rate"]) == [140.0, 141.0, 142.0]
+
+def test_activities_json_and_ndjson_match():
+    app.dependency_overrides[garmin_session] = lambda: FakeSession(fake_connector(8))
+    try:
+        client = TestClient(app)
+        as_json = client.get("/activities", params={"limit": 8})
+        as_ndjson = client.get("/activities", params={"limit": 8}, headers={"Accept": NDJSON_MEDIA_TYPE})
+        empty = client.get("/activities", params={"limit": 0, "format": "ndjson"})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert as_json.status_code == 200 and as_json.headers["content-type"] == "application/json"
+    activities = as_json.json()
+    assert [a["id"] for a in activities] == [8, 7, 5, 4, 2, 1]
+    assert activities[0]["start_time"] == "2024-03-28T07:00:00"
+
+    assert as_ndjson.status_code == 200 and as_ndjson.headers["content-type"] == NDJSON_MEDIA_TYPE
+    assert "Accept" in as_ndjson.headers["vary"] and as_ndjson.headers["etag"] != as_json.headers["etag"]
+    assert [orjson.loads(line) for line in as_ndjson.text.splitlines()] == activities
+
+    assert empty.status_code == 200 and empty.text == ""
+
+def test_unknown_routing_is_rejected_before_garmin():
+    connector = fake_connector(3)
+    app.dependency_overrides[garmin_session] = lambda: FakeSession(connector)
+    try:
+        client = TestClient(app)
+        for path in ("/analysis/smart", "/analysis/incremental"):
+            response = client.get(path, params={"routing": "fastest"})
+            assert response.status_code == 400 and "fastest" in response.json()["detail"]
+    finally:
+        app.dependency_overrides.clear()
+    assert connector.client.requests == []
+
+if __name__ == "__main__":
+    test_json_response_and_wants_ndjson()
+    test_ndjson_chunks_one_chunk_per_non_empty_page()
+    test_iter_activities_pages_until_limit()
+    test_streams_cache_is_lru_bounded()
+    test_activities_json_and_ndjson_match()
+    test_unknown_routing_is_rejected_before_garmin()
+    print("OK")
@@ -0,0 +1,26 @@
+from datetime import datetime
+import numpy as np
+from application.services.activity_analyzer import ActivityAnalyzer
+from benchmarks.synthetic_activities import generate_activities
+
+def test_analyze_many_scores_against_history():
+    activities = generate_activities(400, start=datetime(2023, 1, 1))
+    analyzer = ActivityAnalyzer()
+    analyzer.add_historical_data(activities[:300])
+    results = analyzer.analyze_many(activities[300:])
+
+    assert len(results) == 100
+    paces = np.array([a.duration / (a.distance / 1000) for a in activities[:300] if a.activity_type == "running"])
+    fastest = min(range(100), key=lambda i: activities[300 + i].duration / activities[300 + i].distance)
+    expected = (paces > activities[300 + fastest].duration / (activities[300 + fastest].distance / 1000)).mean() * 100
+    assert abs(results[fastest]["comparison_to_usual"]["pace_percentile"] - expected) < 1
+    assert all(0 <= r["fatigue_score"] <= 100 for r in results)
+    assert "pace_comparison" in results[0]["comparison_to_usual"]
+
+    # Uma atividade isolada usa os mesmos baselines
+    single = analyzer.analyze_activity(activities[-1])
+    assert single["comparison_to_usual"] == results[-1]["comparison_to_usual"]
+
+if __name__ == "__main__":
+    test_analyze_many_scores_against_history()
+    print("OK")
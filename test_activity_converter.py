@@ -0,0 +1,54 @@
+from datetime import datetime
+from infrastructure.garmin.activity_converter import GarminActivityConverter
+
+def _payload(activity_id, start="2024-03-01 07:00:00", **extra):
+    payload = {
+        "activityId": activity_id,
+        "startTimeLocal": start,
+        "activityType": {"typeKey": "Running"},
+        "duration": 1800.0,
+        "distance": 6000.0,
+        "averageHR": 150,
+        "splitSummaries": [
+            {"splitType": "RWD_RUN", "distance": 3000.0, "duration": 900.0, "totalAscent": 10.0},
+            {"splitType": "INTERVAL_ACTIVE", "distance": 3000.0, "duration": 900.0}
+        ]
+    }
+    payload.update(extra)
+    return payload
+
+def test_convert_page_maps_fields_and_counts_failures():
+    page = [_payload(1), _payload(2, start="not a date"), "garbage", _payload(3, activityType=None, distance=None)]
+    result = GarminActivityConverter().convert_page(page)
+    assert [a.id for a in result.activities] == [1, 3]
+    first = result.activities[0]
+    assert first.start_time == datetime(2024, 3, 1, 7)
+    assert first.activity_type == "running" and first.heart_rate_avg == 150 and first.calories == 0
+    assert first.splits == [{"distance": 3000.0, "duration": 900.0, "pace": 0, "elevation_gain": 10.0, "max_speed": 0}]
+    assert first.intensity_minutes == {"moderate": 0, "vigorous": 0}
+    assert result.activities[1].activity_type == "unknown" and result.activities[1].distance is None
+    assert result.summary() == {"total": 4, "converted": 2, "failures": {"not_an_object": 1, "invalid_start_time": 1}}
+
+def test_to_frame_skips_objects_and_drops_bad_rows():
+    pages = [
+        [_payload(1), _payload(2, start="2024-03-03 07:00:00"), _payload(4, start="not a date", activityType=None)],
+        [_payload(3, start=None), "garbage", _payload(5, start="2024-03-02 07:00:00", activityType=None)]
+    ]
+    frame = GarminActivityConverter().to_frame(pages)
+    assert list(frame.ids) == [1, 5, 2]
+    assert frame.total("distance") == 18000.0
+    assert frame.types == ("running", "unknown")
+
+def test_convert_page_drops_items_without_start_time():
+    page = [_payload(1), _payload(2, start=None), _payload(3, start="")]
+    result = GarminActivityConverter().convert_page(page)
+    assert [a.id for a in result.activities] == [1]
+    assert result.summary() == {"total": 3, "converted": 1, "failures": {"missing_start_time": 2}}
+    # Um payload isolado (detalhes da atividade) continua aceito sem data
+    assert GarminActivityConverter().convert_one(_payload(4, start=None)).start_time is None
+
+if __name__ == "__main__":
+    test_convert_page_maps_fields_and_counts_failures()
+    test_to_frame_skips_objects_and_drops_bad_rows()
+    test_convert_page_drops_items_without_start_time()
+    print("OK")
@@ -0,0 +1,33 @@
+import pickle
+from datetime import datetime
+from domain.entities.activity import Activity
+
+def _activity(**overrides):
+    fields = dict(
+        id=1, start_time=datetime(2024, 1, 1, 7), duration=1500.0, distance=5000.0, average_speed=3.33,
+        calories=300.0, activity_type="running", heart_rate_avg=150.0, splits=[{"distance": 1000.0}]
+    )
+    fields.update(overrides)
+    return Activity(**fields)
+
+def test_dict_keeps_keys_and_order():
+    data = _activity().dict()
+    assert list(data) == [
+        "id", "start_time", "duration", "distance", "average_speed", "heart_rate_avg", "calories",
+        "activity_type", "intensity_minutes", "splits", "pace", "pace_formatted"
+    ]
+    assert data["start_time"] == "2024-01-01T07:00:00"
+    assert data["pace_formatted"] == "05:00 min/km"
+
+def test_cached_pace_follows_changes_and_pickles():
+    activity = _activity()
+    assert activity.pace == 5.0
+    activity.distance = 6000.0
+    assert activity.pace_formatted == "04:10 min/km"
+    assert _activity(distance=0.0).pace == 0
+    assert pickle.loads(pickle.dumps(activity)).dict() == activity.dict()
+
+if __name__ == "__main__":
+    test_dict_keeps_keys_and_order()
+    test_cached_pace_follows_changes_and_pickles()
+    print("OK")
@@ -0,0 +1,50 @@
+from datetime import datetime
+import numpy as np
+from domain.entities.activity_frame import ActivityFrame
+from application.services.hybrid_analyzer import HybridAnalyzer
+from benchmarks.synthetic_activities import generate_activities
+
+def test_frame_columns_and_zero_copy_windows():
+    activities = generate_activities(500, start=datetime(2023, 1, 1))
+    shuffled = activities[::-1]
+    frame = ActivityFrame.from_records(shuffled)
+
+    assert np.all(np.diff(frame.start_seconds) >= 0)
+    assert np.isclose(frame.total("distance"), sum(a.distance for a in activities))
+    assert not frame.mask("power_avg").any()
+
+    start, end = activities[100].start_time, activities[200].start_time
+    window = frame.window(start, end)
+    assert len(window) == 100
+    assert np.shares_memory(window["distance"], frame["distance"])
+    assert window.start_time(0) == start.replace(microsecond=0)
+
+    running = frame.of_type("running")
+    assert len(running) == sum(a.activity_type == "running" for a in activities)
+
+def test_frame_from_garmin_pages():
+    page = [
+        {"activityId": 2, "startTimeLocal": "2024-03-02 07:00:00", "duration": 1800.0, "distance": 5000.0,
+         "averageHR": 150.0, "activityType": {"typeKey": "running"}},
+        {"activityId": 1, "startTimeLocal": "2024-03-01 18:30:15", "duration": 3600.0, "distance": 20000.0,
+         "activityType": {"typeKey": "cycling"}},
+    ]
+    frame = ActivityFrame.from_garmin([page])
+    assert list(frame.ids) == [1, 2]
+    assert frame.start_time(0) == datetime(2024, 3, 1, 18, 30, 15)
+    assert list(frame.activity_type) == ["cycling", "running"]
+    assert np.isnan(frame["heart_rate_avg"][0]) and frame.mean("heart_rate_avg") == 150.0
+
+def test_hybrid_metrics_same_for_frame_and_list():
+    activities = generate_activities(300, start=datetime(2023, 1, 1))
+    analyzer = HybridAnalyzer(ml_analyzer=None, llm_analyzer=None)
+    from_list = analyzer._compute_metrics(activities)
+    from_frame = analyzer._compute_metrics(ActivityFrame.from_records(activities))
+    assert from_list == from_frame
+    assert np.isclose(from_list["summary"]["total_distance"], sum(a.distance for a in activities))
+
+if __name__ == "__main__":
+    test_frame_columns_and_zero_copy_windows()
+    test_frame_from_garmin_pages()
+    test_hybrid_metrics_same_for_frame_and_list()
+    print("OK")
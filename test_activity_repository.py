@@ -0,0 +1,31 @@
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from infrastructure.database import Base
+from infrastructure.repositories.activity_repository import ActivityRepository
+from domain.models.activity import Activity
+
+def _repository():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    repository = ActivityRepository(sessionmaker(bind=engine)())
+    repository.save_many([
+        Activity(activity_id=str(i), athlete_id=athlete_id, start_time=datetime(2024, 1, i + 1), duration=1800, distance=5000)
+        for i, athlete_id in enumerate([None, None, "ana", "bruno"])
+    ])
+    return repository
+
+def test_default_athlete_only_sees_activities_without_athlete():
+    repository = _repository()
+    assert sorted(a.activity_id for a in repository.get_by_athlete(None)) == ["0", "1"]
+    assert [a.activity_id for a in repository.get_by_athlete("ana")] == ["2"]
+    assert repository.get_version(None)[0] == 2
+    assert repository.get_version("bruno")[0] == 1
+    # "default" explícito é o mesmo atleta padrão que os modelos e caches usam
+    assert sorted(a.activity_id for a in repository.get_by_athlete("default")) == ["0", "1"]
+    assert repository.get_version("default") == repository.get_version(None)
+    assert repository.stored_athlete_id("default") is None and repository.stored_athlete_id("ana") == "ana"
+
+if __name__ == "__main__":
+    test_default_athlete_only_sees_activities_without_athlete()
+    print("OK")
@@ -0,0 +1,38 @@
+import asyncio
+import json
+import os
+import tempfile
+from application.services.batch_report_runner import RUN_FILE, BatchReportRunner
+
+class TrackingRunner(BatchReportRunner):
+    """Substitui o pipeline por atleta e registra quantos rodam ao mesmo tempo"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.running = 0
+        self.peak = 0
+        self.processed = []
+
+    async def _process_athlete(self, athlete_id, run_id, pool, loop, semaphore):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        self.processed.append(athlete_id)
+        return {"load": 0.0}
+
+def test_athletes_are_processed_by_a_bounded_set_of_workers():
+    output_dir = tempfile.mkdtemp()
+    runner = TrackingRunner(output_dir=output_dir, ml_workers=1, athlete_concurrency=3)
+    athletes = [f"athlete-{i}" for i in range(20)]
+
+    summary = asyncio.run(runner.run(athlete_ids=athletes, run_id="bounded"))
+    assert runner.peak == 3
+    assert sorted(runner.processed) == sorted(athletes)
+    assert summary["completed"] == 20
+    with open(os.path.join(output_dir, "bounded", RUN_FILE)) as f:
+        assert json.load(f)["status"] == "finished"
+
+if __name__ == "__main__":
+    test_athletes_are_processed_by_a_bounded_set_of_workers()
+    print("OK")
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from infrastructure.database import Base
+from infrastructure.repositories.best_effort_repository import BestEffortRepository
+from application.services.best_efforts import BestEffortsEngine, BestEffortsService, PersonalRecordIndex
+
+def test_curves_of_constant_speed_run_with_fast_kilometer():
+    # 6 km a 4 m/s, com o terceiro km a 5 m/s
+    speed = np.full(1500, 4.0)
+    speed[500:700] = 5.0
+    timestamps = np.arange(len(speed), dtype=np.float64)
+    distance = np.concatenate(([0.0], np.cumsum(speed[:-1])))
+    power = np.where(speed > 4, 300.0, 200.0)
+
+    curves = BestEffortsEngine().curves({"timestamp": timestamps, "distance": distance, "power": power})
+    assert curves["distance_s"]["1km"] == 200.0
+    assert curves["distance_s"]["5km"] == 1200.0
+    assert "10km" not in curves["distance_s"]
+    assert curves["power_w"]["60"] == 300.0
+    assert curves["power_w"]["300"] == round((200 * 300 + 100 * 200) / 300, 1)
+
+def test_duration_efforts_match_brute_force():
+    rng = np.random.default_rng(3)
+    values = rng.normal(250, 40, size=900)
+    efforts = BestEffortsEngine(durations=(30, 300)).duration_efforts(np.arange(900.0), values)
+    for window in (30, 300):
+        expected = max(values[i:i + window].mean() for i in range(900 - window + 1))
+        assert np.isclose(efforts[str(window)], expected, atol=0.05)
+
+def test_rolling_window_records_match_brute_force():
+    rng = np.random.default_rng(7)
+    index = PersonalRecordIndex(windows_days=(30,))
+    history = []
+    start = datetime(2024, 1, 1)
+    for day in range(200):
+        start_time = start + timedelta(days=day)
+        power = float(rng.normal(250, 30))
+        index.add(str(day), start_time, {"power_w": {"1200": power}})
+        history.append((start_time, power))
+
+        now = start_time + timedelta(hours=1)
+        in_window = [p for t, p in history if t >= now - timedelta(days=30)]
+        assert index.records(30, now=now)["power_w:1200"]["value"] == max(in_window)
+    assert index.records()["power_w:1200"]["value"] == max(p for _, p in history)
+
+def test_out_of_order_adds_match_brute_force():
+    rng = np.random.default_rng(11)
+    index = PersonalRecordIndex(windows_days=(30,))
+    start = datetime(2024, 1, 1)
+    history = []
+    # Potências inteiras geram empates; a ordem de chegada é aleatória
+    for day in rng.permutation(120).tolist():
+        start_time = start + timedelta(days=day)
+        power = float(rng.integers(200, 260))
+        index.add(str(day), start_time, {"power_w": {"1200": power}})
+        history.append((start_time, power))
+
+    for day in range(0, 120, 5):
+        now = start + timedelta(days=day)
+        in_window = [p for t, p in history if t >= now - timedelta(days=30)]
+        assert index.records(30, now=now)["power_w:1200"]["value"] == max(in_window)
+
+    best = max(p for _, p in history)
+    record = index.records()["power_w:1200"]
+    assert record["value"] == best
+    assert record["start_time"] == min(t for t, p in history if p == best).isoformat()
+
+def test_service_stores_curves_and_indexes_out_of_order_ingest():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    service = BestEffortsService(BestEffortRepository(db), indexes={}, windows_days=(90,))
+
+    def streams(speed):
+        return {"timestamp": np.arange(400.0), "distance": np.arange(400.0) * speed}
+
+    service.ingest(1, datetime(2024, 3, 1), streams(3.0), athlete_id="a1")
+    service.ingest(2, datetime(2024, 3, 5), streams(3.5), athlete_id="a1")
+    service.ingest(3, datetime(2024, 2, 1), streams(4.0), athlete_id="a1")
+
+    records = service.records("a1")
+    assert records["distance_s:1km"]["activity_id"] == "3"
+    # Um novo serviço reconstrói o índice a partir das curvas salvas
+    fresh = BestEffortsService(BestEffortRepository(db), indexes={}, windows_days=(90,))
+    assert fresh.records("a1") == records
+
+if __name__ == "__main__":
+    test_curves_of_constant_speed_run_with_fast_kilometer()
+    test_duration_efforts_match_brute_force()
+    test_rolling_window_records_match_brute_force()
+    test_out_of_order_adds_match_brute_force()
+    test_service_stores_curves_and_indexes_out_of_order_ingest()
+    print("OK")
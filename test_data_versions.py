@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+from application.services.data_versions import DataVersionRegistry
+from interfaces.api.conditional import Validators
+
+class FakeRepository:
+    def __init__(self):
+        self.marker = (3, 10, "2024-03-01")
+        self.reads = 0
+
+    def get_version(self, athlete_id):
+        self.reads += 1
+        return self.marker
+
+def test_stored_version_is_cached_until_invalidated():
+    repository = FakeRepository()
+    registry = DataVersionRegistry(ttl=60)
+    first = registry.stored("a", repository)
+    assert registry.stored("a", repository) is first and repository.reads == 1
+
+    registry.invalidate("a")
+    assert registry.stored("a", repository).changed_at == first.changed_at   # mesmo marcador, mesma data
+    repository.marker = (4, 11, "2024-03-02")
+    registry.invalidate("a")
+    assert registry.stored("a", repository).marker == (4, 11, "2024-03-02") and repository.reads == 3
+
+def test_validators_match_conditional_headers():
+    validators = Validators([(3, 10), "splits"], last_modified=None)
+    request = lambda **headers: SimpleNamespace(headers=headers)
+    assert validators.matches(request(**{"if-none-match": f'W/{validators.etag}, "other"'}))
+    assert not validators.matches(request(**{"if-none-match": '"other"'}))
+    assert not validators.matches(request())
+    assert Validators([(4, 11), "splits"]).etag != validators.etag
+
+def test_day_dependent_validators_change_with_the_day():
+    from datetime import date, datetime, timezone
+    from unittest import mock
+    import interfaces.api.conditional as conditional
+    from application.services.data_versions import DataVersion
+
+    version = DataVersion((3, 10, "2024-03-01"), datetime(2024, 3, 1, tzinfo=timezone.utc), 0.0)
+    today = Validators.of(version, ["weekly-summary"], daily=True)
+    tomorrow_date = date.fromordinal(date.today().toordinal() + 1)
+    with mock.patch.object(conditional, "date", wraps=date) as conditional_date:
+        conditional_date.today.return_value = tomorrow_date
+        tomorrow = Validators.of(version, ["weekly-summary"], daily=True)
+    assert today.etag != tomorrow.etag
+    assert tomorrow.last_modified > today.last_modified > version.changed_at
+
+if __name__ == "__main__":
+    test_stored_version_is_cached_until_invalidated()
+    test_validators_match_conditional_headers()
+    test_day_dependent_validators_change_with_the_day()
+    print("OK")
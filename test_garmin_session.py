@@ -0,0 +1,37 @@
+import asyncio
+from fastapi import HTTPException
+from interfaces.api.garmin_session import GarminSession
+
+class FakeAuthService:
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = 0
+        self.connector = object()
+
+    async def ensure_authentication(self):
+        self.calls += 1
+        if self.error:
+            raise self.error
+
+def test_session_authenticates_once_on_first_use():
+    auth_service = FakeAuthService()
+    session = GarminSession(auth_service)
+    assert auth_service.calls == 0
+    connector = asyncio.run(session.connector())
+    assert connector is auth_service.connector
+    asyncio.run(session.connector())
+    assert auth_service.calls == 1
+
+def test_session_maps_garmin_errors():
+    for message, status in (("429 Too Many Requests", 429), ("bad credentials", 401)):
+        try:
+            asyncio.run(GarminSession(FakeAuthService(Exception(message))).connector())
+        except HTTPException as e:
+            assert e.status_code == status
+        else:
+            raise AssertionError("expected HTTPException")
+
+if __name__ == "__main__":
+    test_session_authenticates_once_on_first_use()
+    test_session_maps_garmin_errors()
+    print("OK")
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+import numpy as np
+from domain.entities.activity import Activity
+from application.services.hr_zones import HRZoneEngine, HRZoneModel, default_hr_zone_engine
+
+def create_activity(activity_id, heart_rate_avg, duration=1800.0):
+    return Activity(
+        id=activity_id, start_time=datetime(2024, 1, 1) + timedelta(days=activity_id), duration=duration,
+        distance=5000.0, average_speed=2.8, calories=400.0, activity_type="running", heart_rate_avg=heart_rate_avg
+    )
+
+def test_zone_models_boundaries():
+    assert np.allclose(HRZoneModel("max_hr", max_hr=200).boundaries(), [120, 140, 160, 180])
+    assert np.allclose(HRZoneModel("hrr", max_hr=200, rest_hr=50).boundaries(), [140, 155, 170, 185])
+    assert np.allclose(HRZoneModel("lthr", lthr=170).boundaries(), [144.5, 153, 161.5, 170])
+
+def test_time_in_zones_uses_sample_timestamps():
+    engine = HRZoneEngine(HRZoneModel("max_hr", max_hr=200))
+    heart_rate = np.array([110, 130, 150, 170, 190, np.nan, 0])
+    timestamps = np.array([0, 2, 4, 6, 8, 10, 12])
+    zones = engine.time_in_zones(heart_rate, timestamps)
+    assert zones.tolist() == [2, 2, 2, 2, 2]
+    # Pausa longa conta apenas até o limite entre amostras
+    zones = engine.time_in_zones(np.array([130, 130]), np.array([0, 600]))
+    assert zones[1] == 10 + 10
+
+def test_batch_matches_single_and_season_mixes_streams_and_estimates():
+    engine = HRZoneEngine(HRZoneModel("max_hr", max_hr=200))
+    rng = np.random.default_rng(1)
+    streams = {i: (rng.normal(150, 15, size=600), None) for i in range(5)}
+
+    batch = engine.batch_time_in_zones(list(streams.values()))
+    for i, (heart_rate, _) in streams.items():
+        assert np.allclose(batch[i], engine.time_in_zones(heart_rate))
+
+    activities = [create_activity(i, 150) for i in range(5)] + [create_activity(10, 185)]
+    season = engine.season_distribution(activities, streams)
+    assert season["activities_with_streams"] == 5
+    assert season["activities_estimated"] == 1
+    assert np.isclose(season["seconds"]["zone5"], batch[:, 4].sum() + 1800)
+
+def test_default_engine_is_shared_per_max_hr():
+    engine = default_hr_zone_engine(np.float64(190))
+    assert default_hr_zone_engine(190) is engine
+    assert default_hr_zone_engine(200) is not engine
+
+    engine.activity_zones("shared-1", np.full(60, 150.0))
+    # Outra requisição (outro analisador) reaproveita o cache da mesma engine
+    assert ("shared-1", engine.model.key) in default_hr_zone_engine(190.0)._cache
+
+if __name__ == "__main__":
+    test_zone_models_boundaries()
+    test_time_in_zones_uses_sample_timestamps()
+    test_batch_matches_single_and_season_mixes_streams_and_estimates()
+    test_default_engine_is_shared_per_max_hr()
+    print("OK")
@@ -1,4 +1,5 @@
 import asyncio
+import logging
 from datetime import datetime, timedelta
 from domain.entities.activity import Activity
 from application.services.hybrid_analyzer import HybridAnalyzer
@@ -94,5 +95,64 @@ async def test_hybrid_analysis():
     import json
     print(json.dumps(analysis, indent=2, default=str))
 
+class SlowLLMAnalyzer(MockLLMAnalyzer):
+    def __init__(self, delay):
+        self.delay = delay
+
+    async def analyze_activities(self, activities, ml_context=None):
+        await asyncio.sleep(self.delay)
+        return await super().analyze_activities(activities, ml_context)
+
+def test_partial_result_does_not_wait_for_llm():
+    async def run():
+        hybrid_analyzer = HybridAnalyzer(MockMLAnalyzer(), SlowLLMAnalyzer(delay=0.5))
+        analysis_run = hybrid_analyzer.start(create_mock_activities())
+
+        partial = await asyncio.wait_for(analysis_run.partial(), timeout=0.3)
+        assert partial["smart_insights"] == {"status": "pending"}
+        assert partial["ml_insights"]["anomalies"] == [3, 7]
+        assert partial["summary"]["total_activities"] == 10
+
+        stages = [stage async for stage, _ in analysis_run.stages()]
+        assert stages[-2:] == ["llm", "complete"]
+        assert set(stages[:2]) == {"ml", "metrics"}
+
+        full = await analysis_run.result()
+        assert full["smart_insights"]["key_findings"][0] == "Melhora de 5% no pace médio"
+        assert set(full["stage_timings_s"]) == {"ml", "metrics", "llm"}
+
+    asyncio.run(run())
+
+class FailingLLMAnalyzer(MockLLMAnalyzer):
+    async def analyze_activities(self, activities, ml_context=None):
+        raise RuntimeError("provider down")
+
+def test_unawaited_llm_failure_is_logged_and_cancel_stops_llm():
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    hybrid_logger = logging.getLogger("application.services.hybrid_analyzer")
+    hybrid_logger.addHandler(handler)
+
+    async def run():
+        # Ninguém aguarda o estágio de LLM; a falha é registrada pelo callback
+        failing = HybridAnalyzer(MockMLAnalyzer(), FailingLLMAnalyzer()).start(create_mock_activities())
+        await asyncio.wait([failing.llm_task])
+
+        slow = HybridAnalyzer(MockMLAnalyzer(), SlowLLMAnalyzer(delay=5)).start(create_mock_activities())
+        await slow.partial()
+        slow.cancel()
+        await asyncio.wait([slow.llm_task])
+        return slow
+
+    try:
+        slow = asyncio.run(run())
+    finally:
+        hybrid_logger.removeHandler(handler)
+    assert slow.llm_task.cancelled()
+    assert [r.getMessage() for r in records] == ["Hybrid analysis llm stage failed: provider down"]
+
 if __name__ == "__main__":
-    asyncio.run(test_hybrid_analysis()) 
\ No newline at end of file
+    asyncio.run(test_hybrid_analysis())
+    test_partial_result_does_not_wait_for_llm() 
+    test_unawaited_llm_failure_is_logged_and_cancel_stops_llm()
@@ -0,0 +1,258 @@
+import asyncio
+import time
+from application.services.llm_analyzer import LLMAnalyzer
+from infrastructure.llm.chat_providers import ChatProvider
+from infrastructure.cache.llm_cache import LLMResponseCache
+from infrastructure.llm.hedged_router import HedgedRouter
+from application.services.context_builder import CompactContextBuilder
+from benchmarks.synthetic_activities import generate_activities
+from test_hybrid_analyzer import create_mock_activities
+from application.services.incremental_summary import IncrementalSummaryService
+from infrastructure.repositories.athlete_summary_repository import AthleteSummaryRepository
+
+class FakeProvider(ChatProvider):
+    """Provider que responde após um atraso fixo, ou falha"""
+
+    def __init__(self, name, delay=0.0, fail=False, timeout=5.0):
+        super().__init__(model=f"{name}-model", temperature=0, timeout=timeout)
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    async def complete(self, messages):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.name} unavailable")
+        return {"content": f"analysis from {self.name}", "raw": {"provider": self.name}}
+
+    async def stream(self, messages):
+        self.calls += 1
+        for token in ["analysis ", "from ", self.name]:
+            await asyncio.sleep(self.delay)
+            yield token
+
+def test_providers_run_concurrently():
+    providers = {"xai": FakeProvider("xai", delay=0.2), "openai": FakeProvider("openai", delay=0.3)}
+    analyzer = LLMAnalyzer(providers=providers, cache=None)
+
+    start = time.perf_counter()
+    result = asyncio.run(analyzer.analyze_activities(create_mock_activities()))
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.45
+    assert result["analysis"] == "analysis from openai"
+    assert result["analysisXAI"] == {"provider": "xai"}
+    assert "errors" not in result
+
+def test_partial_result_when_one_provider_fails():
+    providers = {
+        "xai": FakeProvider("xai", delay=0.01),
+        "openai": FakeProvider("openai", delay=1.0, timeout=0.05)
+    }
+    result = asyncio.run(LLMAnalyzer(providers=providers, cache=None).analyze_activities(create_mock_activities()))
+
+    assert result["analysis"] == "analysis from xai"
+    assert "timed out" in result["errors"]["openai"]
+    assert result["providers"]["openai"]["status"] == "error"
+
+def test_all_providers_failing_raises():
+    providers = {"xai": FakeProvider("xai", fail=True), "openai": FakeProvider("openai", fail=True)}
+    try:
+        asyncio.run(LLMAnalyzer(providers=providers, cache=None).analyze_activities(create_mock_activities()))
+        assert False, "should raise when every provider fails"
+    except RuntimeError:
+        pass
+
+def test_cached_analysis_skips_providers():
+    providers = {"xai": FakeProvider("xai", delay=0.2), "openai": FakeProvider("openai", delay=0.2)}
+    analyzer = LLMAnalyzer(providers=providers, cache=LLMResponseCache(":memory:"))
+    activities = create_mock_activities()
+
+    first = asyncio.run(analyzer.analyze_activities(activities))
+    start = time.perf_counter()
+    second = asyncio.run(analyzer.analyze_activities(activities))
+
+    assert time.perf_counter() - start < 0.05
+    assert second["analysis"] == first["analysis"]
+    assert second["providers"]["openai"]["cached"]
+    assert providers["openai"].calls == 1
+
+    # Uma nova atividade muda o contexto e portanto a chave do cache
+    asyncio.run(analyzer.analyze_activities(create_mock_activities()[1:]))
+    assert providers["openai"].calls == 2
+
+def test_cache_ttl_and_lru_bound():
+    cache = LLMResponseCache(":memory:", ttl_seconds=60, max_entries=2, memory_entries=0)
+    for i in range(3):
+        cache.set(f"key{i}", {"content": str(i)})
+    assert cache.get("key0") is None
+    assert cache.get("key2") == {"content": "2"}
+
+    cache.ttl_seconds = 0
+    assert cache.get("key2") is None
+
+def test_cache_batches_access_times():
+    cache = LLMResponseCache(":memory:", max_entries=2, memory_entries=0, access_flush_size=100)
+
+    async def fill():
+        await cache.aset("key0", {"content": "0"})
+        await cache.aset("key1", {"content": "1"})
+        return await cache.aget("key0")
+
+    assert asyncio.run(fill()) == {"content": "0"}
+    # O acerto não escreve no SQLite; o acesso fica pendente até o próximo set
+    written = dict(cache._db.execute("SELECT key, last_access FROM llm_cache").fetchall())
+    assert written["key0"] <= written["key1"]
+    # O set grava os acessos antes do corte do LRU: key0 foi usada depois de key1
+    cache.set("key2", {"content": "2"})
+    assert cache.get("key1") is None
+    assert cache.get("key0") == {"content": "0"}
+
+def test_stream_analysis_yields_tokens_then_metadata():
+    providers = {"openai": FakeProvider("openai")}
+    analyzer = LLMAnalyzer(providers=providers, cache=LLMResponseCache(":memory:"))
+
+    async def collect():
+        return [event async for event in analyzer.stream_analysis(create_mock_activities())]
+
+    events = asyncio.run(collect())
+    assert [e["content"] for e in events if e["type"] == "token"] == ["analysis ", "from ", "openai"]
+    assert events[-1]["type"] == "done"
+    assert not events[-1]["metadata"]["cached"]
+
+    # A resposta completa foi para o cache e é reaproveitada pelo modo não-streaming
+    result = asyncio.run(analyzer.analyze_activities(create_mock_activities()))
+    assert result["analysis"] == "analysis from openai"
+    assert providers["openai"].calls == 1
+
+def test_context_builder_respects_token_budget():
+    activities = generate_activities(2000, with_splits=True)
+    builder = CompactContextBuilder(token_budget=1500, recent_full=10)
+    context = builder.build(activities)
+
+    assert builder.count_tokens(context) <= 1500
+    lines = context.splitlines()
+    weekly_start = next(i for i, line in enumerate(lines) if line.startswith("Earlier training"))
+    assert weekly_start == 11
+    assert lines[1].startswith(max(a.start_time for a in activities).strftime("%Y-%m-%d"))
+    assert lines[-1].endswith("older weeks omitted)")
+
+def test_hedged_routing_cancels_slow_primary():
+    providers = {"openai": FakeProvider("openai", delay=1.0), "xai": FakeProvider("xai", delay=0.02)}
+    router = HedgedRouter(providers, primary="openai", default_hedge_delay=0.05)
+    analyzer = LLMAnalyzer(providers=providers, cache=None, routing="hedged", router=router)
+
+    start = time.perf_counter()
+    result = asyncio.run(analyzer.analyze_activities(create_mock_activities()))
+
+    assert time.perf_counter() - start < 0.3
+    assert result["routed_to"] == "xai"
+    assert result["providers"]["xai"]["hedged"]
+    assert router.stats()["hedges_won"] == 1
+    assert router.histograms["openai"].count == 0
+
+def test_hedged_routing_uses_primary_when_fast():
+    providers = {"openai": FakeProvider("openai", delay=0.01), "xai": FakeProvider("xai")}
+    router = HedgedRouter(providers, primary="openai", default_hedge_delay=0.5)
+    result = asyncio.run(
+        LLMAnalyzer(providers=providers, cache=None, routing="hedged", router=router)
+        .analyze_activities(create_mock_activities())
+    )
+
+    assert result["routed_to"] == "openai"
+    assert providers["xai"].calls == 0
+    assert router.histograms["openai"].count == 1
+
+def test_hedged_routing_respects_deadline():
+    providers = {"openai": FakeProvider("openai", delay=1.0), "xai": FakeProvider("xai", delay=1.0)}
+    router = HedgedRouter(providers, primary="openai", default_hedge_delay=0.02, deadline=0.1)
+
+    start = time.perf_counter()
+    try:
+        asyncio.run(router.complete([{"role": "user", "content": "hi"}]))
+        assert False, "should time out"
+    except asyncio.TimeoutError:
+        pass
+    assert time.perf_counter() - start < 0.3
+
+def test_incremental_summary_sends_only_new_activities():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from infrastructure.database import Base
+    from domain.models.athlete_summary import AthleteSummary
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine, tables=[AthleteSummary.__table__])
+    repository = AthleteSummaryRepository(sessionmaker(bind=engine)())
+
+    prompts = []
+    class RecordingProvider(FakeProvider):
+        async def complete(self, messages):
+            prompts.append(messages[1]["content"])
+            return await super().complete(messages)
+
+    providers = {"openai": RecordingProvider("openai")}
+    service = IncrementalSummaryService(LLMAnalyzer(providers=providers, cache=None), repository)
+    activities = create_mock_activities()
+
+    first = asyncio.run(service.analyze(activities[:9], athlete_id="athlete-1"))
+    assert first["updated"] and first["new_activities"] == 9
+    assert first["state"]["runs"] == 9
+
+    second = asyncio.run(service.analyze(activities, athlete_id="athlete-1"))
+    assert second["new_activities"] == 1
+    assert second["state"]["runs"] == 10
+    assert "Previous summary" in prompts[-1]
+    assert prompts[-1].count("Corrida") == 1
+
+    third = asyncio.run(service.analyze(activities, athlete_id="athlete-1"))
+    assert not third["updated"] and not third["gap"]
+    assert len(prompts) == 2
+
+def test_incremental_summary_pages_back_to_last_summarized():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from infrastructure.database import Base
+    from domain.models.athlete_summary import AthleteSummary
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine, tables=[AthleteSummary.__table__])
+    repository = AthleteSummaryRepository(sessionmaker(bind=engine)())
+    service = IncrementalSummaryService(LLMAnalyzer(providers={"openai": FakeProvider("openai")}, cache=None), repository)
+    newest_first = create_mock_activities()[::-1]
+    asyncio.run(service.analyze(newest_first[-2:], athlete_id="athlete-1"))
+
+    fetched = []
+    async def pages():
+        for start in range(0, len(newest_first), 3):
+            fetched.append(start)
+            yield newest_first[start:start + 3]
+
+    # Oito corridas novas com páginas de 3: busca até a página que contém a última já resumida
+    result = asyncio.run(service.analyze_pages(pages(), athlete_id="athlete-1"))
+    assert fetched == [0, 3, 6]
+    assert result["new_activities"] == 8 and not result["gap"]
+    assert result["state"]["runs"] == 10
+
+    # Uma lista que não alcança a última resumida é reportada como lacuna
+    asyncio.run(service.analyze(newest_first[-1:], athlete_id="athlete-2"))
+    gap = asyncio.run(service.analyze(newest_first[:3], athlete_id="athlete-2"))
+    assert gap["gap"] and gap["new_activities"] == 3
+
+if __name__ == "__main__":
+    test_providers_run_concurrently()
+    test_partial_result_when_one_provider_fails()
+    test_all_providers_failing_raises()
+    test_cached_analysis_skips_providers()
+    test_cache_ttl_and_lru_bound()
+    test_cache_batches_access_times()
+    test_stream_analysis_yields_tokens_then_metadata()
+    test_context_builder_respects_token_budget()
+    test_hedged_routing_cancels_slow_primary()
+    test_hedged_routing_uses_primary_when_fast()
+    test_hedged_routing_respects_deadline()
+    test_incremental_summary_sends_only_new_activities()
+    test_incremental_summary_pages_back_to_last_summarized()
+    print("LLM analyzer tests passed")
@@ -0,0 +1,124 @@
+import os
+import tempfile
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+from sklearn.cluster import KMeans
+from sklearn.ensemble import IsolationForest
+from infrastructure.ml.model_artifacts import ArtifactError, average_path_length, compress_artifact, load_models, save_models
+from infrastructure.ml.model_registry import ModelRegistry
+
+def create_trained_models(max_features=1.0):
+    """Treina os três modelos do MLAnalyzer com dados aleatórios"""
+    rng = np.random.default_rng(42)
+    features = rng.normal(size=(500, 6)) * [600, 2000, 10, 12, 150, 40] + [3000, 8000, 150, 175, 600, 80]
+
+    scaler = StandardScaler()
+    scaled = scaler.fit_transform(features)
+    clustering = KMeans(n_clusters=5, n_init=10, random_state=0).fit(scaled)
+    anomaly_detector = IsolationForest(contamination=0.1, max_features=max_features, random_state=0).fit(scaled)
+
+    models = {"scaler": scaler, "clustering": clustering, "anomaly_detector": anomaly_detector}
+    return models, features
+
+def assert_same_predictions(models, loaded, features):
+    scaled = models["scaler"].transform(features)
+    np.testing.assert_allclose(loaded["scaler"].transform(features), scaled)
+    np.testing.assert_array_equal(loaded["clustering"].predict(scaled), models["clustering"].predict(scaled))
+    np.testing.assert_allclose(
+        loaded["anomaly_detector"].decision_function(scaled),
+        models["anomaly_detector"].decision_function(scaled)
+    )
+    np.testing.assert_array_equal(loaded["anomaly_detector"].predict(scaled), models["anomaly_detector"].predict(scaled))
+
+def test_mmap_artifact_matches_sklearn():
+    for max_features in (1.0, 0.5):
+        models, features = create_trained_models(max_features)
+        path = tempfile.mkdtemp()
+        save_models(path, models, feature_schema_version=1)
+
+        loaded = load_models(path, feature_schema_version=1)
+        assert isinstance(loaded["anomaly_detector"].threshold, np.memmap)
+        assert_same_predictions(models, loaded, features)
+
+def test_compressed_artifact_round_trip():
+    models, features = create_trained_models()
+    path = tempfile.mkdtemp()
+    save_models(path, models, feature_schema_version=1)
+    compress_artifact(path)
+
+    assert not any(name.endswith(".npy") for name in os.listdir(path))
+    assert_same_predictions(models, load_models(path, feature_schema_version=1), features)
+
+def test_scaler_options_and_path_length():
+    _, features = create_trained_models()
+    for with_mean, with_std in ((False, True), (True, False), (False, False)):
+        scaler = StandardScaler(with_mean=with_mean, with_std=with_std).fit(features)
+        path = tempfile.mkdtemp()
+        save_models(path, {"scaler": scaler}, feature_schema_version=1)
+        loaded = load_models(path, feature_schema_version=1)["scaler"]
+        np.testing.assert_allclose(loaded.transform(features), scaler.transform(features))
+
+    # c(n) da normalização do Isolation Forest: c(1) = 0, c(2) = 1, c(256) ≈ 10.24
+    np.testing.assert_allclose(average_path_length([1, 2, 256]), [0.0, 1.0, 10.244770920119917])
+
+def test_checksum_and_schema_are_verified():
+    models, _ = create_trained_models()
+    path = tempfile.mkdtemp()
+    save_models(path, models, feature_schema_version=1)
+
+    try:
+        load_models(path, feature_schema_version=2)
+        assert False, "schema mismatch should fail"
+    except ArtifactError:
+        pass
+
+    with open(os.path.join(path, "clustering.cluster_centers.npy"), "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        f.write(b"\x00")
+    try:
+        load_models(path, feature_schema_version=1)
+        assert False, "corrupted artifact should fail"
+    except ArtifactError:
+        pass
+
+def test_registry_versions_and_lru_eviction():
+    models, _ = create_trained_models()
+    registry = ModelRegistry(tempfile.mkdtemp(), max_bytes=1)
+
+    assert registry.save("athlete-1", models, 1) == 1
+    assert registry.save("athlete-1", models, 1) == 2
+    registry.save("athlete-2", models, 1)
+
+    assert registry.load("athlete-1", 1) is not None
+    assert registry.load("athlete-2", 1) is not None
+    stats = registry.stats()
+    assert stats["athletes_cached"] == 1
+    assert stats["evictions"] == 1
+
+    assert registry.archive_old_versions("athlete-1") == 1
+    assert registry.load("athlete-1", 2) is None
+
+def test_concurrent_saves_claim_distinct_versions():
+    from concurrent.futures import ThreadPoolExecutor
+    models, _ = create_trained_models()
+    base_path = tempfile.mkdtemp()
+    # Um diretório deixado por um treino interrompido não é reaproveitado
+    os.makedirs(os.path.join(base_path, "athlete-1", "v0001"))
+
+    # Registros distintos simulam a API e o batch treinando o mesmo atleta
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        versions = list(pool.map(lambda _: ModelRegistry(base_path).save("athlete-1", models, 1), range(4)))
+
+    assert sorted(versions) == [2, 3, 4, 5]
+    registry = ModelRegistry(base_path)
+    assert registry.latest_version("athlete-1") == 5
+    assert registry.load("athlete-1", 1) is not None
+
+if __name__ == "__main__":
+    test_mmap_artifact_matches_sklearn()
+    test_compressed_artifact_round_trip()
+    test_scaler_options_and_path_length()
+    test_checksum_and_schema_are_verified()
+    test_registry_versions_and_lru_eviction()
+    test_concurrent_saves_claim_distinct_versions()
+    print("Model artifact tests passed")
@@ -0,0 +1,44 @@
+from datetime import date, datetime
+import numpy as np
+from application.services.activity_analyzer import ActivityAnalyzer
+from application.services.percentile_store import PercentileStore, SortedSketch
+from benchmarks.synthetic_activities import generate_activities
+
+def test_sketch_rank_and_merge():
+    rng = np.random.default_rng(0)
+    first, second = rng.normal(300, 20, 500), rng.normal(320, 20, 300)
+    a, b = SortedSketch(), SortedSketch()
+    a.add(first)
+    b.add(second)
+    merged = SortedSketch.merge([a, b])
+
+    every = np.concatenate((first, second))
+    assert np.isclose(merged.rank(np.array([310.0]))[0], (every < 310).mean() * 100)
+    assert np.isclose(merged.quantile(0.5), np.median(every))
+
+def test_store_windows_and_analyzer_lookup():
+    activities = generate_activities(300, start=datetime(2023, 1, 1))
+    store = PercentileStore()
+    store.add(activities[:200], "athlete-1")
+    store.add(activities[200:], "athlete-1")
+
+    pace = np.array([a.duration / (a.distance / 1000) for a in activities if a.activity_type == "running"])
+    assert np.isclose(store.rank("athlete-1", "running", "pace", np.array([330.0]))[0], (pace < 330).mean() * 100)
+
+    # Janela de 2 meses: o mês atual e o anterior
+    today = activities[-1].start_time.date()
+    current_month = today.year * 12 + today.month - 1
+    recent = [a for a in activities
+              if a.activity_type == "running" and a.start_time.year * 12 + a.start_time.month - 1 >= current_month - 1]
+    assert len(store.sketch("athlete-1", "running", "pace", months=2, today=today)) == len(recent)
+
+    analyzer = ActivityAnalyzer(percentile_store=store, athlete_id="athlete-1")
+    analyzer.add_historical_data(activities)
+    result = analyzer.analyze_activity(activities[-1])
+    expected = 100 - store.rank("athlete-1", "running", "pace", np.array([activities[-1].duration / (activities[-1].distance / 1000)]))[0]
+    assert result["comparison_to_usual"]["pace_percentile"] == round(expected, 1)
+
+if __name__ == "__main__":
+    test_sketch_rank_and_merge()
+    test_store_windows_and_analyzer_lookup()
+    print("OK")
@@ -0,0 +1,33 @@
+from datetime import datetime
+import numpy as np
+from application.services.split_analytics import SplitAnalyticsEngine, SplitArrays
+from domain.entities.activity import Activity
+
+def _run(id, paces, climb=0.0):
+    splits = [{"distance": 1000.0, "duration": pace, "pace": 1000.0 / pace, "elevation_gain": climb} for pace in paces]
+    return Activity(
+        id=id, start_time=datetime(2024, 1, id + 1), duration=sum(paces), distance=1000.0 * len(paces),
+        average_speed=1000.0 * len(paces) / sum(paces), calories=0.0, activity_type="running", splits=splits
+    )
+
+def test_pacing_metrics_per_activity():
+    activities = [
+        _run(0, [300, 300, 300, 300]),
+        _run(1, [320, 310, 300, 290]),
+        _run(2, [300]),
+        _run(3, [300, 300], climb=50.0),
+    ]
+    metrics = SplitAnalyticsEngine().compute(SplitArrays.from_activities(activities))
+
+    assert np.allclose(metrics["pace_s_km"], [300, 305, 300, 300])
+    assert np.isclose(metrics["pace_fade_s_km"][0], 0) and np.isclose(metrics["pace_cv"][0], 0)
+    # Acelerando 10 s/km a cada km: split negativo
+    assert np.isclose(metrics["pace_fade_s_km"][1], -10)
+    assert np.isclose(metrics["negative_split_ratio"][1], 295 / 315)
+    assert np.isnan(metrics["negative_split_ratio"][2])
+    # Subida de 5%: o ritmo equivalente no plano é mais rápido
+    assert metrics["grade_adjusted_pace_s_km"][3] < 300
+
+if __name__ == "__main__":
+    test_pacing_metrics_per_activity()
+    print("OK")
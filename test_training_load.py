@@ -0,0 +1,54 @@
+from datetime import date, datetime, timedelta
+import numpy as np
+from domain.entities.activity import Activity
+from application.services.training_load import TrainingLoadEngine
+from benchmarks.synthetic_activities import generate_activities
+
+def test_trimp_and_decay_of_single_activity():
+    engine = TrainingLoadEngine(hr_rest=60, hr_max=190)
+    activity = Activity(
+        id=1, start_time=datetime(2024, 1, 1, 7), duration=3600.0, distance=10000.0,
+        average_speed=2.8, calories=700.0, activity_type="running", heart_rate_avg=151
+    )
+    series = engine.compute([activity], end=date(2024, 1, 8))
+
+    reserve = (151 - 60) / (190 - 60)
+    trimp = 60 * reserve * 0.64 * np.exp(1.92 * reserve)
+    assert np.isclose(series["daily_load"][0], trimp)
+    assert np.isclose(series["atl"][0], trimp * (1 - np.exp(-1 / 7)))
+    # Sete dias sem treino: a carga aguda decai por exp(-1)
+    assert np.isclose(series["atl"][7], series["atl"][0] * np.exp(-1))
+
+def test_incremental_update_matches_full_compute():
+    activities = generate_activities(400, start=datetime(2020, 1, 1))
+    engine = TrainingLoadEngine(hr_max=200)
+
+    state = engine.state(engine.compute(activities[:-10], end=activities[-11].start_time.date()))
+    for activity in activities[-10:]:
+        state = engine.update(state, activity)
+
+    full = engine.compute(activities, end=activities[-1].start_time.date())
+    assert np.isclose(state.atl, full["atl"][-1])
+    assert np.isclose(state.ctl, full["ctl"][-1])
+    assert np.isclose(state.acwr, full["acwr"][-1])
+
+def test_incremental_update_uses_history_hr_max():
+    activities = generate_activities(400, start=datetime(2020, 1, 1))
+    engine = TrainingLoadEngine()
+
+    state = engine.state(engine.compute(activities[:-10], end=activities[-11].start_time.date()))
+    # Sem FC máxima configurada, update() usa a máxima do histórico, não a de cada atividade
+    for activity in activities[-10:]:
+        activity.heart_rate_max = min(activity.heart_rate_max or state.hr_max, state.hr_max - 5)
+        state = engine.update(state, activity)
+
+    full = engine.compute(activities, end=activities[-1].start_time.date())
+    assert state.hr_max == full["hr_max"]
+    assert np.isclose(state.atl, full["atl"][-1])
+    assert np.isclose(state.ctl, full["ctl"][-1])
+
+if __name__ == "__main__":
+    test_trimp_and_decay_of_single_activity()
+    test_incremental_update_matches_full_compute()
+    test_incremental_update_uses_history_hr_max()
+    print("OK")
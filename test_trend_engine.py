@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+import numpy as np
+from application.services.trend_analyzer import TrendAnalyzer
+from application.services.trend_engine import TrendEngine, linear_trend
+from benchmarks.synthetic_activities import generate_activities
+
+def test_running_windows_match_brute_force():
+    activities = generate_activities(300, start=datetime(2023, 1, 1))
+    engine = TrendEngine()
+    state = engine.build_state(activities)
+    today = activities[-1].start_time.date() + timedelta(days=3)
+    engine.weekly_summary(state, today=today)
+
+    for days in (7, 28, 90):
+        since = today - timedelta(days=days - 1)
+        recent = [a for a in activities if a.start_time.date() >= since]
+        window = state.window(days)
+        assert np.isclose(window[0], sum(a.distance for a in recent) / 1000)
+        assert np.isclose(window[1], sum(a.duration for a in recent) / 3600)
+        assert window[3] == len(recent)
+
+def test_linear_trend_slope_and_significance():
+    weeks = np.arange(12, dtype=np.float64)
+    slope, t_stat = linear_trend(np.stack([10 + 2 * weeks, np.full(12, 5.0)]))
+    assert np.allclose(slope, [2.0, 0.0])
+    assert t_stat[1] == 0.0
+
+    summary = TrendAnalyzer().analyze_weekly_trends(generate_activities(200, start=datetime(2023, 1, 1)))
+    assert summary["volume_trend"]["trend"] in ("increasing", "decreasing", "stable")
+
+def test_add_many_matches_rebuild_and_rejects_old_activities():
+    activities = generate_activities(300, start=datetime(2023, 1, 1))
+    engine = TrendEngine()
+    state = engine.build_state(activities[:-20])
+    for activity in activities[-20:]:
+        activity.heart_rate_max = min(activity.heart_rate_max or 0, state.observed_hr_max) or None
+
+    # Chegam fora de ordem, como numa sincronização atrasada
+    assert state.add_many(activities[-20:][::-1])
+    rebuilt = engine.build_state(activities)
+    assert state.last_day == rebuilt.last_day
+    assert np.allclose(state.sums, rebuilt.sums)
+    assert np.allclose(state.daily(90), rebuilt.daily(90))
+
+    too_old = generate_activities(1, start=datetime(2020, 1, 1))
+    before = state.sums.copy()
+    assert not state.add_many(too_old)
+    assert np.array_equal(state.sums, before)
+
+if __name__ == "__main__":
+    test_running_windows_match_brute_force()
+    test_linear_trend_slope_and_significance()
+    test_add_many_matches_rebuild_and_rejects_old_activities()
+    print("OK")